@@ -1,4 +1,11 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.core.exceptions import ValidationError
+
+from .alertas import revisar as revisar_alertas
+from .asignacion import asignar
+from .catalogo import validar_nombre_unico
+from .forms import RutUnicoMixin
 from .models import (
     Donante,
     Beneficiario,
@@ -6,16 +13,53 @@ from .models import (
     Donacion,
     DetalleDonacion,
     Trazabilidad,
+    TrazabilidadArchivada,
     Entrega,
     DetalleEntrega,
+    AjusteStock,
+    UmbralStock,
+    AlertaStock,
+    Solicitud,
+    DetalleSolicitud,
 )
+from .rut import descomponer
+
+
+class BusquedaRutMixin:
+    """
+    Además de search_fields, busca el término como RUT sobre rut_cuerpo (la
+    columna entera indexada): "12.345.678-5" o "12345678" encuentran
+    "12345678-5".
+    """
+
+    def get_search_results(self, request, queryset, search_term):
+        resultados, duplicados = super().get_search_results(request, queryset, search_term)
+        cuerpos = set()
+        try:
+            cuerpos.add(descomponer(search_term)[0])
+        except ValidationError:
+            pass
+        solo_cuerpo = search_term.strip().replace('.', '')
+        if solo_cuerpo.isdigit():
+            cuerpos.add(int(solo_cuerpo))
+        if cuerpos:
+            resultados |= queryset.filter(rut_cuerpo__in=cuerpos)
+        return resultados, duplicados
 
 
 # ---------------------------------------------
 # DONANTE
 # ---------------------------------------------
+class DonanteAdminForm(RutUnicoMixin, forms.ModelForm):
+    class Meta:
+        model = Donante
+        fields = '__all__'
+
+
 @admin.register(Donante)
-class DonanteAdmin(admin.ModelAdmin):
+class DonanteAdmin(BusquedaRutMixin, admin.ModelAdmin):
+    # Un RUT repetido es un error del formulario, no un IntegrityError de rut_cuerpo
+    form = DonanteAdminForm
     list_display = ['rut', 'nombre', 'apellido', 'tipoDonante', 'total_donaciones']
     list_filter = ['tipoDonante']
     search_fields = ['rut', 'nombre', 'apellido']
@@ -30,8 +74,15 @@ class DonanteAdmin(admin.ModelAdmin):
 # ---------------------------------------------
 # BENEFICIARIO
 # ---------------------------------------------
+class BeneficiarioAdminForm(RutUnicoMixin, forms.ModelForm):
+    class Meta:
+        model = Beneficiario
+        fields = '__all__'
+
+
 @admin.register(Beneficiario)
-class BeneficiarioAdmin(admin.ModelAdmin):
+class BeneficiarioAdmin(BusquedaRutMixin, admin.ModelAdmin):
+    form = BeneficiarioAdminForm
     list_display = ['rut', 'nombre', 'direccion', 'telefono', 'email', 'total_entregas']
     search_fields = ['rut', 'nombre', 'direccion']
     ordering = ['nombre']
@@ -45,18 +96,85 @@ class BeneficiarioAdmin(admin.ModelAdmin):
 # ---------------------------------------------
 # ARTÍCULO DONADO
 # ---------------------------------------------
+class ArticuloDonadoAdminForm(forms.ModelForm):
+    class Meta:
+        model = ArticuloDonado
+        fields = '__all__'
+
+    def clean_nombreObjeto(self):
+        # "Arroz" y "ARROZ " comparten clave: error del formulario en vez de IntegrityError
+        return validar_nombre_unico(self.cleaned_data['nombreObjeto'], self.instance)
+
+
 @admin.register(ArticuloDonado)
 class ArticuloDonadoAdmin(admin.ModelAdmin):
+    form = ArticuloDonadoAdminForm
     list_display = ['nombreObjeto', 'cantidad', 'descripcion']
     search_fields = ['nombreObjeto', 'descripcion']
     ordering = ['nombreObjeto']
     list_editable = ['cantidad']
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Las correcciones manuales del stock quedan auditadas como las de conciliar_stock
+        if change and 'cantidad' in form.changed_data:
+            AjusteStock.objects.create(
+                articulo=obj,
+                cantidad_anterior=form.initial.get('cantidad') or 0,
+                cantidad_nueva=obj.cantidad,
+                motivo='ADMIN',
+                usuario=request.user.get_username(),
+            )
+            revisar_alertas(obj.id)
+
+
+@admin.register(AjusteStock)
+class AjusteStockAdmin(admin.ModelAdmin):
+    list_display = ['articulo', 'cantidad_anterior', 'cantidad_nueva', 'esperado', 'motivo', 'usuario', 'fecha']
+    list_filter = ['motivo']
+    search_fields = ['articulo__nombreObjeto']
+    list_select_related = ['articulo']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
 
 
 # ---------------------------------------------
 # DONACIÓN
 # ---------------------------------------------
+def accion_cambiar_estado(nuevo_estado):
+    """Crea una acción de admin que cambia el estado de las donaciones seleccionadas en lote"""
+    etiqueta = dict(Donacion.ESTADO_CHOICES)[nuevo_estado]
+
+    def accion(modeladmin, request, queryset):
+        resultados = Donacion.actualizar_estado_lote(
+            list(queryset.values_list('id', flat=True)),
+            nuevo_estado,
+            usuario=request.user.get_username(),
+        )
+        actualizadas = [r['id'] for r in resultados if r['resultado'] == 'ACTUALIZADA']
+        rechazadas = [r['id'] for r in resultados if r['resultado'] != 'ACTUALIZADA']
+
+        if actualizadas:
+            modeladmin.message_user(
+                request, f"{len(actualizadas)} donación(es) cambiadas a '{etiqueta}'.", messages.SUCCESS
+            )
+        if rechazadas:
+            modeladmin.message_user(
+                request,
+                f"Transición no permitida para las donaciones: {', '.join(f'#{i}' for i in rechazadas)}",
+                messages.WARNING,
+            )
+
+    accion.__name__ = f"marcar_{nuevo_estado.lower()}"
+    accion.short_description = f"Cambiar estado a '{etiqueta}'"
+    return accion
+
+
 @admin.register(Donacion)
 class DonacionAdmin(admin.ModelAdmin):
     list_display = ['id', 'donante_info', 'lista_articulos', 'total_cantidad', 'fechaDonacion', 'estado']
@@ -65,9 +183,14 @@ class DonacionAdmin(admin.ModelAdmin):
     date_hierarchy = 'fechaDonacion'
     ordering = ['-fechaDonacion']
     inlines = []
+    actions = [
+        accion_cambiar_estado(estado)
+        for estado, _ in Donacion.ESTADO_CHOICES
+        if estado != 'RECIBIDO'
+    ]
 
     def get_inlines(self, request, obj=None):
-        return [DetalleDonacionInline, TrazabilidadInline]
+        return [DetalleDonacionInline, TrazabilidadInline, TrazabilidadArchivadaInline]
 
     def donante_info(self, obj):
         return f"{obj.donante.nombre} {obj.donante.apellido or ''}"
@@ -98,6 +221,16 @@ class TrazabilidadInline(admin.TabularInline):
     readonly_fields = ['fecha', 'descripcion', 'estado', 'usuario']
 
 
+class TrazabilidadArchivadaInline(admin.TabularInline):
+    model = TrazabilidadArchivada
+    extra = 0
+    can_delete = False
+    readonly_fields = ['fecha', 'descripcion', 'estado', 'usuario', 'fecha_archivo']
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 # ---------------------------------------------
 # DETALLE DE ENTREGA - Inline
 # ---------------------------------------------
@@ -113,7 +246,7 @@ class DetalleEntregaInline(admin.TabularInline):
 @admin.register(Entrega)
 class EntregaAdmin(admin.ModelAdmin):
     list_display = ['id', 'beneficiario', 'nombreResponsable', 'fechaEntrega', 'total_articulos']
-    list_filter = ['fechaEntrega', 'beneficiario']
+    list_filter = ['fechaEntrega', 'estado', 'beneficiario']
     search_fields = ['beneficiario__nombre', 'beneficiario__rut', 'nombreResponsable']
     date_hierarchy = 'fechaEntrega'
     ordering = ['-fechaEntrega']
@@ -130,3 +263,63 @@ class EntregaAdmin(admin.ModelAdmin):
 admin.site.site_header = "Administración de Donaciones"
 admin.site.site_title = "Panel de Donaciones"
 admin.site.index_title = "Bienvenido al Sistema de Gestión de Donaciones"
+
+
+# ---------------------------------------------
+# ALERTAS DE STOCK
+# ---------------------------------------------
+@admin.register(UmbralStock)
+class UmbralStockAdmin(admin.ModelAdmin):
+    list_display = ['articulo', 'categoria', 'minimo']
+    list_filter = ['categoria']
+    search_fields = ['articulo__nombreObjeto']
+    autocomplete_fields = ['articulo']
+
+
+@admin.register(AlertaStock)
+class AlertaStockAdmin(admin.ModelAdmin):
+    list_display = ['articulo', 'cantidad', 'minimo', 'fecha', 'resuelta', 'notificada']
+    list_filter = ['resuelta', 'notificada']
+    search_fields = ['articulo__nombreObjeto']
+    list_select_related = ['articulo']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+# ---------------------------------------------
+# SOLICITUDES
+# ---------------------------------------------
+class DetalleSolicitudInline(admin.TabularInline):
+    model = DetalleSolicitud
+    extra = 1
+    autocomplete_fields = ['articulo']
+
+
+@admin.register(Solicitud)
+class SolicitudAdmin(admin.ModelAdmin):
+    list_display = ['id', 'beneficiario', 'prioridad', 'estado', 'fecha_creacion']
+    list_filter = ['estado', 'prioridad']
+    search_fields = ['beneficiario__nombre', 'beneficiario__rut']
+    list_select_related = ['beneficiario']
+    inlines = [DetalleSolicitudInline]
+    actions = ['asignar_stock']
+
+    @admin.action(description="Asignar stock y crear entregas borrador")
+    def asignar_stock(self, request, queryset):
+        asignaciones = asignar(
+            solicitudes=list(queryset.values_list('id', flat=True)),
+            responsable=request.user.get_username(),
+        )
+        if not asignaciones:
+            self.message_user(request, "No hay stock disponible para las solicitudes seleccionadas.", messages.WARNING)
+            return
+        completas = sum(1 for a in asignaciones if a.completa)
+        self.message_user(
+            request,
+            f"{len(asignaciones)} entrega(s) borrador creadas ({completas} solicitud(es) completas).",
+            messages.SUCCESS,
+        )
@@ -0,0 +1,132 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+# --------------------
+# Alertas de stock bajo
+# --------------------
+# Cada camino que modifica el stock (signals de detalles, edición por
+# diferencias, conciliación, admin) llama a revisar() con los artículos que
+# tocó. Dentro de una transacción los ids se acumulan y se evalúan juntos al
+# confirmarla, con una sola consulta: nunca se recorre el catálogo completo.
+# Un artículo en o bajo su mínimo abre una alerta si no tiene una abierta
+# (el índice único de articulo_abierto la deduplica incluso entre procesos);
+# al recuperarse, la alerta se cierra. Las alertas nuevas quedan en cola hasta
+# que el comando enviar_alertas_stock las notifica por correo. Los umbrales se
+# guardan en memoria por proceso y se recargan al cambiar su versión o pasados
+# STOCK_UMBRALES_TTL segundos.
+
+UMBRALES_VERSION_KEY = 'umbrales:version'
+
+
+def _nueva_version():
+    # Basada en el tiempo para no reutilizar claves antiguas si la versión se pierde
+    return int(time.time() * 1000)
+
+
+class _Umbrales:
+    def __init__(self):
+        self.por_articulo = {}
+        self.por_categoria = {}
+        self.version = None
+        self.cargado = 0.0
+        self.lock = threading.Lock()
+
+
+_umbrales = _Umbrales()
+
+
+def _cargar_umbrales():
+    from gestion_donaciones.models import UmbralStock
+
+    version = cache.get_or_set(UMBRALES_VERSION_KEY, _nueva_version, None)
+    vencido = time.monotonic() - _umbrales.cargado > getattr(settings, 'STOCK_UMBRALES_TTL', 300)
+    if _umbrales.version == version and not vencido:
+        return _umbrales
+    por_articulo, por_categoria = {}, {}
+    for articulo_id, categoria, minimo in UmbralStock.objects.values_list('articulo_id', 'categoria', 'minimo'):
+        if articulo_id:
+            por_articulo[articulo_id] = minimo
+        else:
+            por_categoria[categoria] = minimo
+    with _umbrales.lock:
+        _umbrales.por_articulo, _umbrales.por_categoria = por_articulo, por_categoria
+        _umbrales.version = version
+        _umbrales.cargado = time.monotonic()
+    return _umbrales
+
+
+def invalidar_umbrales():
+    cache.set(UMBRALES_VERSION_KEY, _nueva_version(), None)
+
+
+def minimo_de(articulo_id, categoria):
+    umbrales = _cargar_umbrales()
+    return umbrales.por_articulo.get(
+        articulo_id, umbrales.por_categoria.get(categoria, getattr(settings, 'STOCK_ALERTA_MINIMO', 10))
+    )
+
+
+def evaluar(articulo_ids):
+    """Abre o cierra las alertas de los artículos indicados; retorna (abiertas, cerradas)"""
+    from gestion_donaciones.models import AlertaStock, ArticuloDonado
+
+    if not articulo_ids:
+        return 0, 0
+    filas = ArticuloDonado.objects.filter(id__in=articulo_ids).annotate(
+        abierta=Exists(AlertaStock.objects.filter(articulo_abierto=OuterRef('pk')))
+    ).values_list('id', 'categoria', 'cantidad', 'abierta')
+
+    nuevas, recuperados = [], []
+    for id_, categoria, cantidad, abierta in filas:
+        minimo = minimo_de(id_, categoria)
+        if cantidad <= minimo and not abierta:
+            nuevas.append(AlertaStock(articulo_id=id_, articulo_abierto=id_, cantidad=cantidad, minimo=minimo))
+        elif cantidad > minimo and abierta:
+            recuperados.append(id_)
+
+    if nuevas:
+        AlertaStock.objects.bulk_create(nuevas, ignore_conflicts=True)
+    cerradas = 0
+    if recuperados:
+        cerradas = AlertaStock.objects.filter(articulo_abierto__in=recuperados).update(
+            articulo_abierto=None, resuelta=timezone.now()
+        )
+    return len(nuevas), cerradas
+
+
+class _Pendientes:
+    """Artículos por evaluar al confirmar la transacción en curso"""
+
+    def __init__(self):
+        self.ids = set()
+        self.evaluado = False
+
+    def __call__(self):
+        self.evaluado = True
+        evaluar(self.ids)
+
+
+def revisar(*articulo_ids):
+    """Evalúa los artículos al confirmar la transacción (de inmediato si no hay una en curso)"""
+    if not getattr(settings, 'STOCK_ALERTAS_ACTIVAS', True) or not articulo_ids:
+        return
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        evaluar(set(articulo_ids))
+        return
+    # Un solo callback por transacción; si un rollback lo descartó se agenda otro
+    pendientes = getattr(connection, '_alertas_pendientes', None)
+    if (
+        pendientes is None
+        or pendientes.evaluado
+        or not any(func is pendientes for _, func, _ in connection.run_on_commit)
+    ):
+        pendientes = connection._alertas_pendientes = _Pendientes()
+        transaction.on_commit(pendientes)
+    pendientes.ids.update(articulo_ids)
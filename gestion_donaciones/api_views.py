@@ -1,8 +1,26 @@
+from datetime import date
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, HttpResponseNotAllowed
+from django.utils.encoding import force_str
 from rest_framework import viewsets, status
-from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes, throttle_classes
+from rest_framework.exceptions import APIException, AuthenticationFailed, NotAuthenticated, NotFound, ValidationError
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.request import Request
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from django.shortcuts import get_object_or_404
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, extend_schema
+
+from gestion_donaciones.db_router import LecturaReplicaMixin, solo_lectura
+from gestion_donaciones.filtro_uuid import descartar_uuid_desconocido, puede_existir
+from gestion_donaciones.historico import stock_al, totales_al
+from gestion_donaciones.limites import SeguimientoThrottle, limitar_tasa
+from gestion_donaciones.presupuestos import presupuesto_consultas
+from gestion_donaciones.pronostico import pronostico
+from gestion_donaciones.renderers import JSONRapidoRenderer
 
 from gestion_donaciones.models import (
     Donacion,
@@ -23,47 +41,71 @@ from gestion_donaciones.serializers import (
     EntregaSerializer,
     DetalleEntregaSerializer,
     DetalleDonacionSerializer,
+    TransicionDonacionesSerializer,
+    StockHistoricoSerializer,
+    PronosticoSerializer,
 )
 
 
+def _parametro_categoria(descripcion):
+    return OpenApiParameter(
+        'categoria', OpenApiTypes.STR, enum=[c for c, _ in ArticuloDonado.CATEGORIA_CHOICES], description=descripcion
+    )
+
+
 # -----------------------
 # ViewSets para admin/uso interno (requieren auth)
 # -----------------------
-class DonanteViewSet(viewsets.ModelViewSet):
+class DonanteViewSet(LecturaReplicaMixin, viewsets.ModelViewSet):
     queryset = Donante.objects.all().order_by('nombre')
     serializer_class = DonanteSerializer
     permission_classes = [IsAuthenticated]
+    presupuestos_consultas = {'list': 3, 'retrieve': 3}
 
 
-class BeneficiarioViewSet(viewsets.ModelViewSet):
+class BeneficiarioViewSet(LecturaReplicaMixin, viewsets.ModelViewSet):
     queryset = Beneficiario.objects.all().order_by('nombre')
     serializer_class = BeneficiarioSerializer
     permission_classes = [IsAuthenticated]
+    presupuestos_consultas = {'list': 3, 'retrieve': 3}
 
 
-class ArticuloViewSet(viewsets.ModelViewSet):
+class ArticuloViewSet(LecturaReplicaMixin, viewsets.ModelViewSet):
     queryset = ArticuloDonado.objects.all().order_by('nombreObjeto')
     serializer_class = ArticuloDonadoSerializer
     permission_classes = [IsAuthenticated]
+    presupuestos_consultas = {'list': 3, 'retrieve': 3}
 
 
-class EntregaViewSet(viewsets.ModelViewSet):
-    queryset = Entrega.objects.all().order_by('-fechaEntrega')
+class EntregaViewSet(LecturaReplicaMixin, viewsets.ModelViewSet):
+    queryset = (
+        Entrega.objects.select_related('beneficiario')
+        .prefetch_related('detalles__articulo', 'detalles__detalle_donacion__articulo')
+        .order_by('-fechaEntrega')
+    )
     serializer_class = EntregaSerializer
     permission_classes = [IsAuthenticated]
+    presupuestos_consultas = {'list': 5, 'retrieve': 6}
 
 
-class DetalleEntregaViewSet(viewsets.ModelViewSet):
-    queryset = DetalleEntrega.objects.all()
+class DetalleEntregaViewSet(LecturaReplicaMixin, viewsets.ModelViewSet):
+    queryset = DetalleEntrega.objects.select_related('articulo', 'detalle_donacion__articulo').order_by('id')
     serializer_class = DetalleEntregaSerializer
     permission_classes = [IsAuthenticated]
+    presupuestos_consultas = {'list': 3, 'retrieve': 3}
 
 
 # Donacion: lista, crear, recuperar por id; acciones extra: cambiar estado, agregar trazabilidad
-class DonacionViewSet(viewsets.ModelViewSet):
-    queryset = Donacion.objects.all().order_by('-fechaDonacion')
+class DonacionViewSet(LecturaReplicaMixin, viewsets.ModelViewSet):
+    queryset = (
+        Donacion.objects.select_related('donante')
+        .prefetch_related('detalles__articulo', 'trazabilidad', 'trazabilidad_archivada')
+        .order_by('-fechaDonacion')
+    )
     serializer_class = DonacionSerializer
     permission_classes = [IsAuthenticated]
+    # publico_uuid incluye las 2 consultas del filtro de UUIDs si se construye en frío
+    presupuestos_consultas = {'list': 7, 'retrieve': 8, 'publico_uuid': 9}
 
     def create(self, request, *args, **kwargs):
         detalles_data = request.data.get('detalles', [])
@@ -145,10 +187,34 @@ class DonacionViewSet(viewsets.ModelViewSet):
             return Response(TrazabilidadSerializer(donacion.trazabilidad.last()).data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=['post'], url_path='transicion')
+    def transicion(self, request):
+        """
+        POST /api/donaciones/transicion/
+        { "ids": [1, 2, 3], "estado": "EN_ENTREGA", "descripcion": "..." }
+        """
+        serializer = TransicionDonacionesSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        nuevo_estado = serializer.validated_data['estado']
+        resultados = Donacion.actualizar_estado_lote(
+            serializer.validated_data['ids'],
+            nuevo_estado,
+            descripcion=serializer.validated_data['descripcion'],
+            usuario=request.user.get_username(),
+        )
+        actualizadas = sum(1 for r in resultados if r['resultado'] == 'ACTUALIZADA')
+        return Response({
+            'estado': nuevo_estado,
+            'actualizadas': actualizadas,
+            'resultados': resultados,
+        })
+
     @action(
         detail=False,
         methods=['get'],
         permission_classes=[AllowAny],
+        throttle_classes=[SeguimientoThrottle],
         url_path='publico/uuid/(?P<uuid_seguimiento>[^/.]+)',
     )
     def publico_uuid(self, request, uuid_seguimiento=None):
@@ -156,26 +222,163 @@ class DonacionViewSet(viewsets.ModelViewSet):
         Endpoint publico por UUID: /api/donaciones/publico/uuid/{uuid}/
         (retorna JSON con trazabilidad)
         """
-        donacion = get_object_or_404(Donacion, uuid_seguimiento=uuid_seguimiento)
+        if not puede_existir(uuid_seguimiento):
+            raise NotFound()
+        donacion = get_object_or_404(self.get_queryset(), uuid_seguimiento=uuid_seguimiento)
         serializer = DonacionSerializer(donacion)
         return Response(serializer.data)
 
 
 # Vista publica adicional: busqueda directa por UUID (simple)
+@presupuesto_consultas(8)
+@solo_lectura
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@throttle_classes([SeguimientoThrottle])
 def api_seguimiento_donacion(request, uuid_seguimiento):
-    donacion = get_object_or_404(Donacion, uuid_seguimiento=uuid_seguimiento)
+    if not puede_existir(uuid_seguimiento):
+        raise NotFound()
+    donacion = get_object_or_404(
+        Donacion.objects.select_related('donante').prefetch_related(
+            'detalles__articulo', 'trazabilidad', 'trazabilidad_archivada'
+        ),
+        uuid_seguimiento=uuid_seguimiento,
+    )
     serializer = DonacionSerializer(donacion)
     return Response(serializer.data)
 
 
-# Endpoint público de seguimiento (JSON)
+# Stock histórico: /api/stock/historico/?fecha=AAAA-MM-DD[&categoria=MEDICAMENTOS]
+@presupuesto_consultas(8)
+@solo_lectura
+@extend_schema(
+    parameters=[
+        OpenApiParameter('fecha', OpenApiTypes.DATE, required=True, description="Día cuyo cierre se consulta."),
+        _parametro_categoria("Detalla el stock de cada artículo de la categoría."),
+    ],
+    responses=StockHistoricoSerializer,
+)
 @api_view(['GET'])
-@permission_classes([AllowAny])
-def api_seguimiento_publico(request, uuid_seguimiento):
-    donacion = get_object_or_404(
-        Donacion.objects.prefetch_related('detalles__articulo', 'trazabilidad', 'donante'),
-        uuid_seguimiento=uuid_seguimiento
-    )
-    return Response(DonacionSerializer(donacion).data)
+@permission_classes([IsAuthenticated])
+def api_stock_historico(request):
+    try:
+        fecha = date.fromisoformat(request.query_params.get('fecha', ''))
+    except ValueError:
+        raise ValidationError({'fecha': "Indique una fecha con el formato AAAA-MM-DD."})
+    categoria = request.query_params.get('categoria') or None
+    if categoria and categoria not in dict(ArticuloDonado.CATEGORIA_CHOICES):
+        raise ValidationError({'categoria': "Categoría desconocida."})
+
+    if not categoria:
+        base, totales = totales_al(fecha)
+        return Response({'fecha': fecha, 'foto': base, 'categorias': dict(sorted(totales.items()))})
+
+    # Con categoría se detalla cada artículo; el total sale de la misma consulta
+    base, cantidades = stock_al(fecha, categoria)
+    nombres = dict(ArticuloDonado.objects.filter(id__in=cantidades).values_list('id', 'nombreObjeto'))
+    datos = {
+        'fecha': fecha,
+        'foto': base,
+        'categorias': {categoria: sum(cantidades.values())},
+        'articulos': [
+            {'id': id_, 'nombreObjeto': nombres.get(id_), 'cantidad': cantidad}
+            for id_, cantidad in sorted(cantidades.items())
+        ],
+    }
+    return Response(datos)
+
+
+# Pronóstico de demanda: /api/stock/pronostico/[?categoria=ALIMENTOS]
+@presupuesto_consultas(6)
+@solo_lectura
+@extend_schema(
+    parameters=[_parametro_categoria("Limita artículos y categorías a una categoría.")],
+    responses=PronosticoSerializer,
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def api_stock_pronostico(request):
+    categoria = request.query_params.get('categoria') or None
+    if categoria and categoria not in dict(ArticuloDonado.CATEGORIA_CHOICES):
+        raise ValidationError({'categoria': "Categoría desconocida."})
+    return Response(pronostico(categoria))
+
+
+# -----------------------
+# Endpoints asíncronos (ASGI)
+# -----------------------
+# Vistas Django async (DRF no soporta vistas asíncronas) que responden el mismo
+# JSON que sus equivalentes DRF. Usan el ORM asíncrono, así bajo un servidor
+# ASGI un proceso atiende muchas consultas concurrentes sin bloquear un worker
+# por cada una. El serializer corre en el hilo de la petición (sync_to_async)
+# para no detener el event loop con listas grandes.
+def _respuesta_json(datos, status=200):
+    return HttpResponse(JSONRapidoRenderer().render(datos), status=status, content_type='application/json')
+
+
+# Endpoint público de seguimiento (JSON). El presupuesto incluye las 2
+# consultas del filtro de UUIDs si se construye en frío
+@presupuesto_consultas(9)
+@limitar_tasa('seguimiento')
+@descartar_uuid_desconocido('json')
+@solo_lectura
+async def api_seguimiento_publico(request, uuid_seguimiento):
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET', 'HEAD'])
+
+    donacion = await Donacion.objects.select_related('donante').prefetch_related(
+        'detalles__articulo', 'trazabilidad', 'trazabilidad_archivada'
+    ).filter(uuid_seguimiento=uuid_seguimiento).afirst()
+    if donacion is None:
+        return _respuesta_json({'detail': force_str(NotFound.default_detail)}, status=404)
+    return _respuesta_json(DonacionSerializer(donacion).data)
+
+
+def _autenticar(request):
+    """
+    Autentica con DEFAULT_AUTHENTICATION_CLASSES de DRF (sesión, Basic...),
+    igual que los ViewSets; retorna None o la respuesta de error.
+    """
+    autenticadores = [clase() for clase in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    drf_request = Request(request, authenticators=autenticadores)
+    try:
+        autenticado = drf_request.user.is_authenticated
+    except APIException as exc:
+        error = exc
+    else:
+        if autenticado:
+            return None
+        error = NotAuthenticated()
+
+    # Como APIView.permission_denied: 401 si el primer autenticador define WWW-Authenticate
+    encabezado = autenticadores[0].authenticate_header(drf_request) if autenticadores else None
+    if isinstance(error, (AuthenticationFailed, NotAuthenticated)):
+        error.status_code = status.HTTP_401_UNAUTHORIZED if encabezado else status.HTTP_403_FORBIDDEN
+    response = _respuesta_json({'detail': force_str(error.detail)}, status=error.status_code)
+    if encabezado and error.status_code == status.HTTP_401_UNAUTHORIZED:
+        response['WWW-Authenticate'] = encabezado
+    return response
+
+
+def _lista_asincrona(viewset):
+    """Versión async (solo lectura) del listado de un ViewSet, con su queryset, serializer y presupuesto"""
+    @presupuesto_consultas(viewset.presupuestos_consultas['list'])
+    @solo_lectura
+    async def vista(request):
+        if request.method not in ('GET', 'HEAD'):
+            return HttpResponseNotAllowed(['GET', 'HEAD'])
+
+        error = await sync_to_async(_autenticar)(request)
+        if error is not None:
+            return error
+
+        objetos = [obj async for obj in viewset.queryset.all()]
+        datos = await sync_to_async(lambda: viewset.serializer_class(objetos, many=True).data)()
+        return _respuesta_json(datos)
+
+    return vista
+
+
+api_lectura_donaciones = _lista_asincrona(DonacionViewSet)
+api_lectura_entregas = _lista_asincrona(EntregaViewSet)
+api_lectura_articulos = _lista_asincrona(ArticuloViewSet)
@@ -5,4 +5,5 @@ class GestionDonacionesConfig(AppConfig):
     name = 'gestion_donaciones'
 
     def ready(self):
+        import gestion_donaciones.checks
         import gestion_donaciones.signals
@@ -0,0 +1,224 @@
+import heapq
+from collections import defaultdict, namedtuple
+
+from django.db import transaction
+from django.db.models import Sum
+
+from gestion_donaciones.edicion import aplicar_stock
+from gestion_donaciones.filtro_uuid import agregar as agregar_uuids
+from gestion_donaciones.models import ArticuloDonado, DetalleEntrega, DetalleSolicitud, Entrega, Solicitud
+from gestion_donaciones.signals import ajustes_de_stock_manuales
+
+# --------------------
+# Asignación de stock a solicitudes
+# --------------------
+# Las solicitudes abiertas (PENDIENTE o PARCIAL) y lo que les falta se cargan
+# con tres consultas: cabeceras, detalles pedidos y lo ya asignado (detalles
+# de las entregas enlazadas, agrupados). El stock de los artículos pedidos se
+# lee y bloquea una vez. Las solicitudes entran a un heap ordenado por
+# (prioridad, fecha, id) y se atienden de a una, cada línea con lo que quede
+# del artículo; cuando el stock pedido se agota se deja de sacar del heap sin
+# recorrer el resto. Cada solicitud atendida recibe una entrega en estado
+# PENDIENTE (borrador) creada con bulk_create por lotes, y cada artículo un
+# único UPDATE con el total reservado. Los borradores descuentan el stock como
+# cualquier entrega: eliminarlos lo devuelve, libera la asignación y la
+# solicitud vuelve a PENDIENTE o PARCIAL (ver revisar_solicitudes).
+
+LOTE = 1000
+RESPONSABLE = 'Asignación automática'
+
+# lineas: {articulo_id: cantidad asignada en esta corrida}
+Asignacion = namedtuple('Asignacion', ['solicitud_id', 'beneficiario_id', 'lineas', 'completa'])
+
+
+def _asignado_y_faltantes(solicitudes):
+    """Retorna ({(solicitud_id, articulo_id): asignado}, {solicitud_id: {articulo_id: faltante}})"""
+    asignado = {
+        (solicitud_id, articulo_id): total
+        for solicitud_id, articulo_id, total in DetalleEntrega.objects.filter(entrega__solicitud__in=solicitudes)
+        .order_by()
+        .values('entrega__solicitud_id', 'articulo_id')
+        .annotate(total=Sum('cantidad'))
+        .values_list('entrega__solicitud_id', 'articulo_id', 'total')
+    }
+    faltantes = {}
+    pedidos = DetalleSolicitud.objects.filter(solicitud__in=solicitudes).values_list(
+        'solicitud_id', 'articulo_id', 'cantidad'
+    )
+    for solicitud_id, articulo_id, cantidad in pedidos:
+        falta = cantidad - asignado.get((solicitud_id, articulo_id), 0)
+        if falta > 0:
+            faltantes.setdefault(solicitud_id, {})[articulo_id] = falta
+    return asignado, faltantes
+
+
+def _pendientes(solicitudes=None):
+    """Retorna ({solicitud_id: (prioridad, fecha, beneficiario_id)}, {solicitud_id: {articulo_id: faltante}})"""
+    abiertas = Solicitud.objects.filter(estado__in=['PENDIENTE', 'PARCIAL'])
+    if solicitudes is not None:
+        abiertas = abiertas.filter(id__in=solicitudes)
+    cabeceras = {
+        id_: (prioridad, fecha, beneficiario_id)
+        for id_, prioridad, fecha, beneficiario_id in abiertas.order_by().values_list(
+            'id', 'prioridad', 'fecha_creacion', 'beneficiario_id'
+        )
+    }
+    if not cabeceras:
+        return {}, {}
+    return cabeceras, _asignado_y_faltantes(abiertas)[1]
+
+
+def _repartir(cabeceras, faltantes, stock):
+    """Asigna 'stock' ({articulo_id: disponible}, se modifica) por prioridad; retorna la lista de Asignacion"""
+    heap = [(prioridad, fecha, id_) for id_, (prioridad, fecha, _) in cabeceras.items() if id_ in faltantes]
+    heapq.heapify(heap)
+    restante = sum(stock.values())
+    asignaciones = []
+    while heap and restante:
+        _, _, id_ = heapq.heappop(heap)
+        lineas = {}
+        for articulo_id, falta in faltantes[id_].items():
+            cantidad = min(falta, stock.get(articulo_id, 0))
+            if cantidad:
+                lineas[articulo_id] = cantidad
+                stock[articulo_id] -= cantidad
+                restante -= cantidad
+        if lineas:
+            asignaciones.append(Asignacion(id_, cabeceras[id_][2], lineas, lineas == faltantes[id_]))
+    return asignaciones
+
+
+def _crear_borradores(asignaciones, responsable, lote):
+    delta = defaultdict(int)
+    for inicio in range(0, len(asignaciones), lote):
+        bloque = asignaciones[inicio:inicio + lote]
+        entregas = [
+            Entrega(
+                beneficiario_id=asignacion.beneficiario_id,
+                nombreResponsable=responsable,
+                estado='PENDIENTE',
+                solicitud_id=asignacion.solicitud_id,
+                notas=f"Borrador generado para la solicitud #{asignacion.solicitud_id}",
+            )
+            for asignacion in bloque
+        ]
+        Entrega.objects.bulk_create(entregas)
+        agregar_uuids(*(entrega.uuid_seguimiento for entrega in entregas))
+        if any(entrega.pk is None for entrega in entregas):
+            # MySQL no retorna los ids del bulk_create: se recuperan por uuid_seguimiento
+            ids = dict(
+                Entrega.objects.filter(uuid_seguimiento__in=[e.uuid_seguimiento for e in entregas])
+                .values_list('uuid_seguimiento', 'id')
+            )
+            for entrega in entregas:
+                entrega.pk = ids[entrega.uuid_seguimiento]
+
+        detalles = []
+        for entrega, asignacion in zip(entregas, bloque):
+            for articulo_id, cantidad in asignacion.lineas.items():
+                detalles.append(DetalleEntrega(entrega_id=entrega.pk, articulo_id=articulo_id, cantidad=cantidad))
+                delta[articulo_id] -= cantidad
+        with ajustes_de_stock_manuales():
+            DetalleEntrega.objects.bulk_create(detalles, batch_size=lote)
+    aplicar_stock(dict(delta))
+
+
+def _marcar(ids, nuevo_estado, lote, **filtros):
+    ids = list(ids)
+    for inicio in range(0, len(ids), lote):
+        Solicitud.objects.filter(id__in=ids[inicio:inicio + lote], **filtros).update(estado=nuevo_estado)
+
+
+def asignar(solicitudes=None, responsable=RESPONSABLE, simular=False, lote=LOTE):
+    """
+    Reparte el stock disponible entre las solicitudes abiertas (o solo entre
+    los ids de 'solicitudes') y crea una entrega borrador por cada solicitud
+    atendida; retorna la lista de Asignacion. Con simular=True solo calcula.
+    """
+    with transaction.atomic():
+        cabeceras, faltantes = _pendientes(solicitudes)
+        articulos = {articulo_id for lineas in faltantes.values() for articulo_id in lineas}
+        stock = {}
+        if articulos:
+            stock = dict(
+                ArticuloDonado.objects.select_for_update()
+                .filter(id__in=articulos, cantidad__gt=0)
+                .values_list('id', 'cantidad')
+            )
+        asignaciones = _repartir(cabeceras, faltantes, stock)
+        if simular:
+            return asignaciones
+
+        _crear_borradores(asignaciones, responsable, lote)
+        # Las abiertas sin faltantes ya estaban cubiertas por entregas anteriores
+        completas = [a.solicitud_id for a in asignaciones if a.completa] + list(cabeceras.keys() - faltantes.keys())
+        _marcar(completas, 'ASIGNADA', lote)
+        _marcar((a.solicitud_id for a in asignaciones if not a.completa), 'PARCIAL', lote, estado='PENDIENTE')
+    return asignaciones
+
+
+# --------------------
+# Estado de las solicitudes al cambiar sus entregas
+# --------------------
+# Eliminar un borrador o reducir sus cantidades devuelve stock y vuelve a
+# dejar faltantes: la solicitud debe salir de ASIGNADA (o de PARCIAL si ya no
+# le queda nada asignado) para que la próxima corrida la atienda. Los signals
+# de Entrega / DetalleEntrega y la edición por diferencias llaman a
+# revisar_solicitudes(); como las alertas, los ids se acumulan y se recalculan
+# juntos al confirmar la transacción.
+
+
+def recalcular_estados(solicitudes=(), entregas=()):
+    """Pone las solicitudes (o las de esas entregas) en PENDIENTE, PARCIAL o ASIGNADA según lo asignado"""
+    ids = set(solicitudes)
+    if entregas:
+        ids.update(
+            Entrega.objects.filter(id__in=entregas, solicitud__isnull=False).values_list('solicitud_id', flat=True)
+        )
+    if not ids:
+        return
+    # Las canceladas no cambian
+    revisadas = Solicitud.objects.filter(id__in=ids, estado__in=['PENDIENTE', 'PARCIAL', 'ASIGNADA'])
+    asignado, faltantes = _asignado_y_faltantes(revisadas)
+    con_asignado = {solicitud_id for solicitud_id, _ in asignado}
+    estados = defaultdict(list)
+    for id_ in revisadas.values_list('id', flat=True):
+        if id_ not in faltantes:
+            estados['ASIGNADA'].append(id_)
+        else:
+            estados['PARCIAL' if id_ in con_asignado else 'PENDIENTE'].append(id_)
+    for estado, ids_estado in estados.items():
+        revisadas.filter(id__in=ids_estado).exclude(estado=estado).update(estado=estado)
+
+
+class _PorRecalcular:
+    """Solicitudes y entregas por recalcular al confirmar la transacción en curso"""
+
+    def __init__(self):
+        self.solicitudes = set()
+        self.entregas = set()
+        self.evaluado = False
+
+    def __call__(self):
+        self.evaluado = True
+        recalcular_estados(self.solicitudes, self.entregas)
+
+
+def revisar_solicitudes(solicitudes=(), entregas=()):
+    """Recalcula el estado al confirmar la transacción (de inmediato si no hay una en curso)"""
+    if not solicitudes and not entregas:
+        return
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        recalcular_estados(solicitudes, entregas)
+        return
+    pendientes = getattr(connection, '_solicitudes_por_recalcular', None)
+    if (
+        pendientes is None
+        or pendientes.evaluado
+        or not any(func is pendientes for _, func, _ in connection.run_on_commit)
+    ):
+        pendientes = connection._solicitudes_por_recalcular = _PorRecalcular()
+        transaction.on_commit(pendientes)
+    pendientes.solicitudes.update(solicitudes)
+    pendientes.entregas.update(entregas)
@@ -0,0 +1,117 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from gestion_donaciones.models import BorradorFormulario
+
+logger = logging.getLogger(__name__)
+
+# --------------------
+# Borradores de formularios
+# --------------------
+# Los datos de un formulario solo se guardan cuando la validación falla, para
+# poder volver a mostrarlos. Se almacenan en la caché con expiración y, si la
+# caché no está disponible (o BORRADORES_BACKEND = 'db'), en BorradorFormulario.
+# La caché solo sirve si es compartida: el GET que muestra el borrador puede
+# llegar a otro worker. Sin caché compartida se usa la base por defecto; una
+# marca en la sesión indica qué formularios tienen borrador en la base, así
+# mostrar o completar un formulario sin borrador no cuesta consultas.
+# El camino exitoso no escribe nada: solo borra la clave.
+
+
+def _usa_db():
+    por_defecto = 'cache' if getattr(settings, 'CACHE_COMPARTIDA', False) else 'db'
+    return getattr(settings, 'BORRADORES_BACKEND', por_defecto) == 'db'
+
+
+def _ttl():
+    return getattr(settings, 'BORRADORES_TTL', 60 * 60 * 2)
+
+
+def _clave(request, formulario, crear_sesion=False):
+    """Clave por usuario y formulario; los anónimos usan su sesión."""
+    if request.user.is_authenticated:
+        return f'borrador:{formulario}:u{request.user.pk}'
+
+    session = getattr(request, 'session', None)
+    if session is None:
+        return None
+    if session.session_key is None:
+        if not crear_sesion:
+            return None
+        session.save()
+    return f'borrador:{formulario}:s{session.session_key}'
+
+
+def _marca(formulario):
+    return f'_borrador_db:{formulario}'
+
+
+def _guardar_db(clave, datos):
+    ahora = timezone.now()
+    BorradorFormulario.objects.filter(expira__lte=ahora).delete()
+    BorradorFormulario.objects.update_or_create(
+        clave=clave,
+        defaults={'datos': datos, 'expira': ahora + timedelta(seconds=_ttl())},
+    )
+
+
+def _obtener_db(clave):
+    borrador = BorradorFormulario.objects.filter(clave=clave, expira__gt=timezone.now()).first()
+    return borrador.datos if borrador else {}
+
+
+def guardar_borrador(request, formulario, datos):
+    """Guarda los datos del formulario para mostrarlos al volver a la página"""
+    clave = _clave(request, formulario, crear_sesion=True)
+    if clave is None:
+        return
+
+    if not _usa_db():
+        try:
+            cache.set(clave, datos, _ttl())
+            return
+        except Exception:  # noqa: BLE001
+            logger.warning("No se pudo guardar el borrador '%s' en caché; se usa la base de datos", clave)
+
+    _guardar_db(clave, datos)
+    request.session[_marca(formulario)] = True
+
+
+def obtener_borrador(request, formulario):
+    """Recupera el borrador del formulario, o {} si no existe"""
+    clave = _clave(request, formulario)
+    if clave is None:
+        return {}
+
+    if not _usa_db():
+        try:
+            datos = cache.get(clave)
+        except Exception:  # noqa: BLE001
+            logger.warning("No se pudo leer el borrador '%s' desde caché", clave)
+        else:
+            return datos or {}
+
+    if not request.session.get(_marca(formulario)):
+        return {}
+    return _obtener_db(clave)
+
+
+def eliminar_borrador(request, formulario):
+    """Descarta el borrador tras un envío exitoso"""
+    clave = _clave(request, formulario)
+    if clave is None:
+        return
+
+    if not _usa_db():
+        try:
+            cache.delete(clave)
+            return
+        except Exception:  # noqa: BLE001
+            logger.warning("No se pudo eliminar el borrador '%s' de caché", clave)
+
+    if request.session.pop(_marca(formulario), None):
+        BorradorFormulario.objects.filter(clave=clave).delete()
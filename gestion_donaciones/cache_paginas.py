@@ -0,0 +1,149 @@
+import hashlib
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.urls import reverse
+from django.utils.translation import get_language
+
+# --------------------
+# Caché de páginas completas para visitantes anónimos
+# --------------------
+# Las páginas públicas marcadas con @cache_pagina_publica('nombre') se guardan
+# renderizadas en la caché compartida. Cada ruta ocupa una sola clave cuyo valor
+# es un diccionario {idioma: respuesta}, así purgar una ruta borra todas sus
+# variantes de idioma. Nunca se cachean peticiones con cookie de sesión (los
+# usuarios autenticados), con query string, ni respuestas que usen el token
+# CSRF o asignen cookies. Los TTL se configuran por página en CACHE_PAGINAS_TTL.
+# Requiere caché compartida (CACHE_PAGINAS_ACTIVA sigue a CACHE_COMPARTIDA):
+# una purga en la LocMem de un worker no llega a los demás.
+
+TTL_POR_DEFECTO = 300
+METODOS_CACHEABLES = ('GET', 'HEAD')
+
+
+def _ttl(nombre):
+    return getattr(settings, 'CACHE_PAGINAS_TTL', {}).get(nombre, TTL_POR_DEFECTO)
+
+
+def _clave_version(nombre):
+    return f'pagina:version:{nombre}'
+
+
+def _nueva_version():
+    # Basada en el tiempo para no reutilizar claves antiguas si la versión se pierde
+    return int(time.time() * 1000)
+
+
+def _formato_clave(nombre, version, path):
+    digest = hashlib.md5(path.encode('utf-8')).hexdigest()
+    return f'pagina:{nombre}:{version}:{digest}'
+
+
+def _clave(nombre, path):
+    version = cache.get_or_set(_clave_version(nombre), _nueva_version, None)
+    return _formato_clave(nombre, version, path)
+
+
+async def _aclave(nombre, path):
+    version = await cache.aget_or_set(_clave_version(nombre), _nueva_version, None)
+    return _formato_clave(nombre, version, path)
+
+
+def _cacheable(request):
+    return (
+        getattr(settings, 'CACHE_PAGINAS_ACTIVA', False)
+        and request.method in METODOS_CACHEABLES
+        and not request.GET
+        # Con cookie de sesión puede haber un usuario autenticado; se omite la caché
+        # sin cargar la sesión, que costaría dos consultas por visita
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+    )
+
+
+def _almacenable(request, response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+        and not request.META.get('CSRF_COOKIE_USED')
+    )
+
+
+def _guardar_variante(request, response, variantes, idioma):
+    """Prepara la respuesta recién generada; retorna True si debe guardarse en la caché"""
+    if hasattr(response, 'render') and callable(response.render):
+        response.render()
+    almacenar = _almacenable(request, response)
+    if almacenar:
+        variantes[idioma] = response
+    return almacenar
+
+
+def _marcar(response, estado):
+    response['X-Cache-Pagina'] = estado
+    return response
+
+
+def cache_pagina_publica(nombre):
+    """Cachea la página completa para visitantes anónimos, con el TTL configurado para 'nombre'"""
+    def decorador(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def wrapper_async(request, *args, **kwargs):
+                if not _cacheable(request):
+                    return await view_func(request, *args, **kwargs)
+
+                clave = await _aclave(nombre, request.path)
+                idioma = get_language()
+                variantes = await cache.aget(clave) or {}
+                if idioma in variantes:
+                    return _marcar(variantes[idioma], 'HIT')
+
+                response = await view_func(request, *args, **kwargs)
+                if _guardar_variante(request, response, variantes, idioma):
+                    await cache.aset(clave, variantes, _ttl(nombre))
+                return _marcar(response, 'MISS')
+
+            return wrapper_async
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not _cacheable(request):
+                return view_func(request, *args, **kwargs)
+
+            clave = _clave(nombre, request.path)
+            idioma = get_language()
+            variantes = cache.get(clave) or {}
+            if idioma in variantes:
+                return _marcar(variantes[idioma], 'HIT')
+
+            response = view_func(request, *args, **kwargs)
+            if _guardar_variante(request, response, variantes, idioma):
+                cache.set(clave, variantes, _ttl(nombre))
+            return _marcar(response, 'MISS')
+
+        return wrapper
+
+    return decorador
+
+
+def purgar_pagina(nombre, path):
+    """Elimina de la caché una ruta (todas sus variantes de idioma)"""
+    cache.delete(_clave(nombre, path))
+
+
+def purgar_paginas(nombre):
+    """Invalida todas las rutas cacheadas de una página"""
+    cache.set(_clave_version(nombre), _nueva_version(), None)
+
+
+def purgar_seguimiento(*uuids):
+    """Purga la página pública de seguimiento de las donaciones indicadas al confirmar la transacción"""
+    paths = [reverse('seguimiento_publico', args=[u]) for u in uuids if u]
+    if paths:
+        transaction.on_commit(lambda: [purgar_pagina('seguimiento', path) for path in paths])
@@ -0,0 +1,45 @@
+import uuid
+
+from django.db import models
+
+# --------------------
+# Campos de modelo propios
+# --------------------
+# UUIDBinarioField guarda el UUID como binary(16) en MySQL, donde UUIDField de
+# Django usa char(32): la columna y su índice único ocupan la mitad y las
+# comparaciones son de bytes, no de texto con collation. En las bases con tipo
+# UUID nativo (PostgreSQL) o en SQLite se comporta igual que UUIDField.
+
+
+class UUIDBinarioField(models.UUIDField):
+    description = "UUID (binary(16) en MySQL)"
+
+    def get_internal_type(self):
+        # Tipo propio para que MySQL no aplique su conversor de UUIDs en texto
+        return 'UUIDBinarioField'
+
+    def db_type(self, connection):
+        if connection.vendor == 'mysql':
+            return 'binary(16)'
+        return connection.data_types['UUIDField']
+
+    def cast_db_type(self, connection):
+        return self.db_type(connection)
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if value is None:
+            return None
+        if not isinstance(value, uuid.UUID):
+            value = self.to_python(value)
+        if connection.vendor == 'mysql':
+            return value.bytes
+        if connection.features.has_native_uuid_field:
+            return value
+        return value.hex
+
+    def from_db_value(self, value, expression, connection):
+        if value is None or isinstance(value, uuid.UUID):
+            return value
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return uuid.UUID(bytes=bytes(value))
+        return uuid.UUID(value)
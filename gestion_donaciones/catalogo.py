@@ -0,0 +1,213 @@
+import re
+import threading
+import time
+import unicodedata
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from gestion_donaciones.alertas import invalidar_umbrales, revisar as revisar_alertas
+
+# --------------------
+# Catálogo de artículos
+# --------------------
+# Cada artículo tiene una clave normalizada de su nombre (sin mayúsculas,
+# tildes ni espacios repetidos) con índice único: "Arroz", "arroz " y "ARROZ"
+# son el mismo artículo. Cada proceso guarda el catálogo completo
+# (clave -> id, unidad, categoría) en memoria, así resolver un artículo en
+# registrar_donacion no cuesta consultas si ya existe; los nuevos de una
+# donación se crean juntos con un INSERT y un SELECT por clave. El catálogo se
+# recarga cuando cambia la versión guardada en la caché compartida (al editar,
+# fusionar o eliminar artículos) o pasados CATALOGO_TTL segundos.
+
+CATALOGO_VERSION_KEY = 'catalogo:version'
+
+EntradaCatalogo = namedtuple('EntradaCatalogo', ['id', 'unidad_medida', 'categoria'])
+
+
+def clave_articulo(nombre):
+    """'  Azúcar   Rubia ' -> 'azucar rubia'"""
+    texto = unicodedata.normalize('NFKD', nombre or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return re.sub(r'\s+', ' ', texto).strip().casefold()
+
+
+def _nueva_version():
+    # Basada en el tiempo para no reutilizar claves antiguas si la versión se pierde
+    return int(time.time() * 1000)
+
+
+class _CatalogoLocal:
+    def __init__(self):
+        self.entradas = None
+        self.version = None
+        self.cargado = 0.0
+        self.lock = threading.Lock()
+
+
+_local = _CatalogoLocal()
+
+
+def _cargar(version):
+    from gestion_donaciones.models import ArticuloDonado
+
+    entradas = {
+        clave: EntradaCatalogo(id_, unidad, categoria)
+        for id_, clave, unidad, categoria in ArticuloDonado.objects.values_list(
+            'id', 'clave', 'unidad_medida', 'categoria'
+        ).iterator(chunk_size=5000)
+    }
+    with _local.lock:
+        _local.entradas = entradas
+        _local.version = version
+        _local.cargado = time.monotonic()
+    return entradas
+
+
+def catalogo():
+    """Catálogo del proceso (clave -> EntradaCatalogo), recargado si cambió la versión"""
+    version = cache.get_or_set(CATALOGO_VERSION_KEY, _nueva_version, None)
+    vencido = time.monotonic() - _local.cargado > getattr(settings, 'CATALOGO_TTL', 300)
+    if _local.entradas is None or _local.version != version or vencido:
+        return _cargar(version)
+    return _local.entradas
+
+
+def resolver_articulo(nombre, defaults=None):
+    """
+    Retorna la EntradaCatalogo del artículo 'nombre', creándolo con 'defaults'
+    si no existe. Sin consultas si ya está en el catálogo del proceso.
+    """
+    return resolver_articulos([(nombre, defaults)])[0]
+
+
+def resolver_articulos(pedidos):
+    """
+    Resuelve una lista de (nombre, defaults) y retorna sus EntradaCatalogo en
+    el mismo orden. Los que faltan en el catálogo se crean con un solo
+    bulk_create (ignorando las claves que ya existen, p. ej. creadas por otro
+    proceso con el catálogo desactualizado) y se leen con una consulta.
+    """
+    from gestion_donaciones.models import ArticuloDonado
+
+    entradas = catalogo()
+    claves = [clave_articulo(nombre) for nombre, _ in pedidos]
+    nuevos = {}
+    for clave, (nombre, defaults) in zip(claves, pedidos):
+        if clave not in entradas and clave not in nuevos:
+            nuevos[clave] = ArticuloDonado(nombreObjeto=nombre.strip(), clave=clave, **(defaults or {}))
+    if nuevos:
+        ArticuloDonado.objects.bulk_create(nuevos.values(), ignore_conflicts=True)
+        creados = {
+            clave: EntradaCatalogo(id_, unidad, categoria)
+            for id_, clave, unidad, categoria in ArticuloDonado.objects.filter(clave__in=nuevos).values_list(
+                'id', 'clave', 'unidad_medida', 'categoria'
+            )
+        }
+        with _local.lock:
+            entradas.update(creados)
+    return [entradas[clave] for clave in claves]
+
+
+def invalidar_catalogo():
+    """Obliga a todos los procesos a recargar el catálogo"""
+    cache.set(CATALOGO_VERSION_KEY, _nueva_version(), None)
+    descartar_catalogo_local()
+
+
+def descartar_catalogo_local():
+    """Recarga solo el catálogo de este proceso (p. ej. tras revertir artículos recién creados)"""
+    with _local.lock:
+        _local.entradas = None
+
+
+def validar_nombre_unico(nombre, instancia=None):
+    """Rechaza un nombre cuya clave ya usa otro artículo (formularios y API)"""
+    from gestion_donaciones.models import ArticuloDonado
+
+    otros = ArticuloDonado.objects.filter(clave=clave_articulo(nombre))
+    if instancia is not None and instancia.pk:
+        otros = otros.exclude(pk=instancia.pk)
+    existente = otros.first()
+    if existente is not None:
+        raise ValidationError(
+            "Ya existe el artículo %(nombre)s", code='unique', params={'nombre': existente.nombreObjeto}
+        )
+    return nombre.strip()
+
+
+# --------------------
+# Fusión de artículos duplicados
+# --------------------
+def fusionar_articulos(Articulo, conservado, duplicados):
+    """
+    Fusiona los artículos 'duplicados' en 'conservado': suma su stock, reasigna
+    los detalles de donación / entrega (sumando cantidades cuando la misma
+    donación o entrega ya tiene el artículo conservado), deja un solo umbral,
+    cierra las alertas abiertas de los duplicados y los elimina.
+    """
+    duplicados = [d for d in duplicados if d != conservado]
+    if not duplicados:
+        return 0
+
+    with transaction.atomic():
+        # El stock se lee antes de tocar los detalles: sus signals lo modifican
+        stock = Articulo.objects.filter(id__in=duplicados).aggregate(total=Sum('cantidad'))['total'] or 0
+        alertas = False
+
+        for rel in Articulo._meta.related_objects:
+            if not rel.field.concrete or rel.many_to_many:
+                continue
+            Detalle, campo = rel.related_model, rel.field.attname
+            if rel.field.one_to_one:
+                # Umbral propio (uno por artículo): se mantiene el del conservado o,
+                # si no tiene, el mayor mínimo de los duplicados; el resto cae en cascada
+                if not Detalle.objects.filter(**{campo: conservado}).exists():
+                    umbral = Detalle.objects.filter(**{f'{campo}__in': duplicados}).order_by('-minimo').first()
+                    if umbral is not None:
+                        Detalle.objects.filter(pk=umbral.pk).update(**{campo: conservado})
+                        # Como el signal de UmbralStock, y otra vez al confirmar para los demás procesos
+                        invalidar_umbrales()
+                        transaction.on_commit(invalidar_umbrales)
+                continue
+            if any(f.name == 'articulo_abierto' for f in Detalle._meta.fields):
+                # Alertas: se cierran las abiertas de los duplicados para que articulo_abierto
+                # no quede con un id eliminado; el conservado se evalúa con el stock sumado
+                Detalle.objects.filter(articulo_abierto__in=duplicados).update(
+                    articulo_abierto=None, resuelta=timezone.now()
+                )
+                alertas = True
+            padres = [
+                next(c for c in unicos if c != rel.field.name)
+                for unicos in Detalle._meta.unique_together
+                if rel.field.name in unicos and len(unicos) == 2
+            ]
+            if not padres:
+                Detalle.objects.filter(**{f'{campo}__in': duplicados}).update(**{campo: conservado})
+                continue
+
+            padre = Detalle._meta.get_field(padres[0]).attname
+            existentes = dict(Detalle.objects.filter(**{campo: conservado}).values_list(padre, 'id'))
+            reasignar, eliminar = [], []
+            for detalle in Detalle.objects.filter(**{f'{campo}__in': duplicados}).values('id', padre, 'cantidad'):
+                destino = existentes.get(detalle[padre])
+                if destino is None:
+                    existentes[detalle[padre]] = detalle['id']
+                    reasignar.append(detalle['id'])
+                else:
+                    Detalle.objects.filter(id=destino).update(cantidad=F('cantidad') + detalle['cantidad'])
+                    eliminar.append(detalle['id'])
+            Detalle.objects.filter(id__in=reasignar).update(**{campo: conservado})
+            Detalle.objects.filter(id__in=eliminar).delete()
+
+        Articulo.objects.filter(id=conservado).update(cantidad=F('cantidad') + stock)
+        Articulo.objects.filter(id__in=duplicados).delete()
+        transaction.on_commit(invalidar_catalogo)
+        if alertas:
+            revisar_alertas(conservado)
+    return len(duplicados)
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+
+@register(Tags.caches, deploy=True)
+def verificar_cache_compartida(app_configs, **kwargs):
+    """En producción la caché debe ser compartida: las invalidaciones tienen que llegar a todos los workers"""
+    if getattr(settings, 'CACHE_COMPARTIDA', False):
+        return []
+    # Aviso por defecto para no romper los despliegues existentes sin CACHE_URL
+    obligatoria = getattr(settings, 'CACHE_COMPARTIDA_OBLIGATORIA', False)
+    Mensaje = Error if obligatoria else Warning
+    return [
+        Mensaje(
+            "La caché por defecto es local a cada proceso.",
+            hint=(
+                "Configure CACHE_URL con Redis (redis://...) o con la tabla de la base "
+                "(dbcache://cache_compartida y createcachetable)."
+            ),
+            id='gestion_donaciones.E001' if obligatoria else 'gestion_donaciones.W001',
+        )
+    ]
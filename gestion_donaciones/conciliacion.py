@@ -0,0 +1,103 @@
+from collections import namedtuple
+
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from gestion_donaciones.alertas import revisar as revisar_alertas
+from gestion_donaciones.models import AjusteStock, ArticuloDonado, DetalleDonacion, DetalleEntrega
+
+# --------------------
+# Conciliación de stock
+# --------------------
+# El stock de cada artículo se mantiene con signals que nunca bajan de cero y
+# puede editarse a mano en el admin, así que con el tiempo se separa de lo
+# registrado. El stock esperado es lo donado menos lo entregado según los
+# detalles: se obtiene con dos consultas agrupadas por artículo y se compara
+# recorriendo los artículos con un iterador. Esa búsqueda no es una foto
+# consistente: un movimiento registrado entre las consultas agrupadas y la
+# lectura del artículo parece un desvío. Por eso la reparación, por lotes y en
+# una transacción, bloquea los artículos del lote (select_for_update), vuelve a
+# calcular sus totales donados y entregados y corrige solo los que siguen
+# desviados, dejando un AjusteStock por cada uno. Los movimientos concurrentes
+# esperan el bloqueo del artículo y se aplican sobre el valor corregido.
+
+LOTE = 1000
+
+Diferencia = namedtuple('Diferencia', ['id', 'nombre', 'actual', 'esperado'])
+
+
+def _totales(Detalle, articulos=None):
+    detalles = Detalle.objects.order_by()
+    if articulos is not None:
+        detalles = detalles.filter(articulo_id__in=articulos)
+    return dict(detalles.values('articulo_id').annotate(total=Sum('cantidad')).values_list('articulo_id', 'total'))
+
+
+def stock_esperado(articulos=None):
+    """{articulo_id: donado - entregado} para los artículos con algún detalle (o solo los de 'articulos')"""
+    esperado = _totales(DetalleDonacion, articulos)
+    for articulo_id, entregado in _totales(DetalleEntrega, articulos).items():
+        esperado[articulo_id] = esperado.get(articulo_id, 0) - entregado
+    return esperado
+
+
+def buscar_diferencias(lote=LOTE):
+    """Genera una Diferencia por cada artículo cuyo stock no coincide con el esperado (mínimo cero)"""
+    esperado = stock_esperado()
+    articulos = ArticuloDonado.objects.order_by('id').values_list('id', 'nombreObjeto', 'cantidad')
+    for id_, nombre, actual in articulos.iterator(chunk_size=lote):
+        total = esperado.get(id_, 0)
+        if actual != max(total, 0):
+            yield Diferencia(id_, nombre, actual, total)
+
+
+def reparar(diferencias, usuario=None, lote=LOTE):
+    """
+    Corrige el stock de una lista de diferencias por lotes; retorna la cantidad
+    de artículos corregidos (los que siguen desviados al volver a leerlos).
+    Recibe una lista, no el generador: escribir mientras el cursor de
+    buscar_diferencias sigue abierto no es seguro en todos los motores.
+    """
+    corregidos = 0
+    for inicio in range(0, len(diferencias), lote):
+        corregidos += _reparar_lote([d.id for d in diferencias[inicio:inicio + lote]], usuario)
+    return corregidos
+
+
+def _reparar_lote(ids, usuario):
+    ahora = timezone.now()
+    with transaction.atomic():
+        # El bloqueo va primero: los totales se leen después, con los movimientos ya confirmados
+        actuales = dict(
+            ArticuloDonado.objects.select_for_update().filter(id__in=ids).order_by('id').values_list('id', 'cantidad')
+        )
+        esperado = stock_esperado(actuales)
+        desviados = [
+            Diferencia(id_, None, actual, esperado.get(id_, 0))
+            for id_, actual in actuales.items()
+            if actual != max(esperado.get(id_, 0), 0)
+        ]
+        if not desviados:
+            return 0
+
+        ArticuloDonado.objects.bulk_update(
+            [
+                ArticuloDonado(id=diferencia.id, cantidad=max(diferencia.esperado, 0), fecha_actualizacion=ahora)
+                for diferencia in desviados
+            ],
+            ['cantidad', 'fecha_actualizacion'],
+        )
+        AjusteStock.objects.bulk_create([
+            AjusteStock(
+                articulo_id=diferencia.id,
+                cantidad_anterior=diferencia.actual,
+                cantidad_nueva=max(diferencia.esperado, 0),
+                esperado=diferencia.esperado,
+                motivo='CONCILIACION',
+                usuario=usuario,
+            )
+            for diferencia in desviados
+        ])
+        revisar_alertas(*(diferencia.id for diferencia in desviados))
+    return len(desviados)
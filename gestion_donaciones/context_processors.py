@@ -0,0 +1,8 @@
+from django.utils.functional import SimpleLazyObject
+
+from gestion_donaciones.roles import obtener_roles
+
+
+def roles(request):
+    """Expone los roles del usuario como {{ roles }}; solo se resuelven si la plantilla los usa"""
+    return {'roles': SimpleLazyObject(lambda: obtener_roles(request.user))}
@@ -0,0 +1,253 @@
+import random
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from gestion_donaciones.catalogo import clave_articulo
+from gestion_donaciones.filtro_uuid import agregar as agregar_uuids
+from gestion_donaciones.rut import digito_verificador, formatear
+from gestion_donaciones.models import (
+    Donante,
+    Beneficiario,
+    ArticuloDonado,
+    Donacion,
+    DetalleDonacion,
+    Trazabilidad,
+    Entrega,
+    DetalleEntrega,
+)
+
+# --------------------
+# Generación de datos sintéticos
+# --------------------
+# Inserta datos realistas con bulk_create (sin signals), calculando el stock de
+# cada artículo como donado - entregado. Usado por los comandos generar_datos
+# y benchmark. Como bulk_create no emite signals, los UUIDs de seguimiento se
+# agregan a mano al filtro de UUIDs.
+
+NOMBRES = [
+    'María', 'José', 'Ana', 'Juan', 'Camila', 'Pedro', 'Valentina', 'Diego',
+    'Francisca', 'Matías', 'Javiera', 'Sebastián', 'Constanza', 'Felipe',
+]
+APELLIDOS = [
+    'González', 'Muñoz', 'Rojas', 'Díaz', 'Pérez', 'Soto', 'Contreras',
+    'Silva', 'Martínez', 'Sepúlveda', 'Morales', 'Rodríguez', 'López',
+]
+ARTICULOS_POR_CATEGORIA = {
+    'ALIMENTOS': ['Arroz', 'Fideos', 'Aceite', 'Leche', 'Azúcar', 'Legumbres', 'Harina'],
+    'ROPA': ['Polera', 'Pantalón', 'Chaqueta', 'Zapatos', 'Calcetines'],
+    'HIGIENE': ['Jabón', 'Shampoo', 'Pasta dental', 'Pañales', 'Toallas higiénicas'],
+    'MEDICAMENTOS': ['Paracetamol', 'Ibuprofeno', 'Alcohol gel', 'Vendas'],
+    'EDUCACION': ['Cuadernos', 'Lápices', 'Mochila', 'Libros'],
+    'ELECTRODOMESTICOS': ['Hervidor', 'Estufa', 'Microondas'],
+    'MUEBLES': ['Silla', 'Mesa', 'Colchón'],
+    'JUGUETES': ['Pelota', 'Muñeca', 'Puzzle'],
+    'OTROS': ['Frazada', 'Linterna', 'Pilas'],
+}
+UNIDADES = [valor for valor, _ in ArticuloDonado.UNIDAD_CHOICES]
+ESTADOS_DONACION = [valor for valor, _ in Donacion.ESTADO_CHOICES]
+DIAS_HISTORIA = 730
+
+
+def _rut(cuerpo):
+    """Campos de RUT ya normalizados (bulk_create no pasa por save())"""
+    dv = digito_verificador(cuerpo)
+    return {'rut': formatear(cuerpo, dv), 'rut_cuerpo': cuerpo, 'rut_dv': dv}
+
+
+def _siguiente_id(model):
+    return (model.objects.aggregate(m=Max('id'))['m'] or 0) + 1
+
+
+def _en_lotes(total, lote):
+    for inicio in range(0, total, lote):
+        yield inicio, min(lote, total - inicio)
+
+
+def escala(donaciones):
+    """Cantidades proporcionales para un número de donaciones"""
+    return {
+        'donantes': max(1, donaciones // 5),
+        'beneficiarios': max(1, donaciones // 10),
+        'articulos': max(10, min(donaciones // 10, 5000)),
+        'donaciones': donaciones,
+        'detalles_por_donacion': 3,
+        'entregas': donaciones // 2,
+        'detalles_por_entrega': 2,
+        'trazabilidad_por_donacion': 2,
+    }
+
+
+def generar(donantes, beneficiarios, articulos, donaciones, detalles_por_donacion=3,
+            entregas=0, detalles_por_entrega=2, trazabilidad_por_donacion=2,
+            lote=5000, semilla=None, log=None):
+    """Genera el conjunto de datos y retorna la cantidad de filas por modelo"""
+    rnd = random.Random(semilla)
+    ahora = timezone.now()
+    log = log or (lambda mensaje: None)
+    creados = {}
+
+    def fecha_aleatoria():
+        return ahora - timedelta(days=rnd.randrange(DIAS_HISTORIA), minutes=rnd.randrange(1440))
+
+    # Donantes y beneficiarios
+    base_rut = max(
+        10_000_000,
+        Donante.objects.aggregate(m=Max('rut_cuerpo'))['m'] or 0,
+        Beneficiario.objects.aggregate(m=Max('rut_cuerpo'))['m'] or 0,
+    ) + 1
+    for inicio, n in _en_lotes(donantes, lote):
+        Donante.objects.bulk_create([
+            Donante(
+                **_rut(base_rut + inicio + i),
+                nombre=rnd.choice(NOMBRES),
+                apellido=rnd.choice(APELLIDOS),
+                tipoDonante=rnd.choice(['INDIVIDUAL', 'INDIVIDUAL', 'EMPRESA', 'ORGANIZACION']),
+                email=f"donante{base_rut + inicio + i}@example.com",
+            )
+            for i in range(n)
+        ])
+    creados['donantes'] = donantes
+    log(f"Donantes: {donantes}")
+
+    base_rut += donantes
+    for inicio, n in _en_lotes(beneficiarios, lote):
+        Beneficiario.objects.bulk_create([
+            Beneficiario(
+                **_rut(base_rut + inicio + i),
+                nombre=f"{rnd.choice(NOMBRES)} {rnd.choice(APELLIDOS)}",
+                direccion=f"Calle {rnd.randrange(1, 500)} #{rnd.randrange(1, 9999)}",
+            )
+            for i in range(n)
+        ])
+    creados['beneficiarios'] = beneficiarios
+    log(f"Beneficiarios: {beneficiarios}")
+
+    # Artículos (el stock se calcula al final)
+    primer_articulo = _siguiente_id(ArticuloDonado)
+    catalogo = [
+        (categoria, nombre)
+        for categoria, nombres in ARTICULOS_POR_CATEGORIA.items()
+        for nombre in nombres
+    ]
+    # Los nombres se numeran desde el id para no repetirse entre ejecuciones
+    def nombre_articulo(id_):
+        return f"{catalogo[id_ % len(catalogo)][1]} {id_ // len(catalogo) + 1}"
+
+    ArticuloDonado.objects.bulk_create([
+        ArticuloDonado(
+            id=primer_articulo + i,
+            nombreObjeto=nombre_articulo(primer_articulo + i),
+            clave=clave_articulo(nombre_articulo(primer_articulo + i)),
+            categoria=catalogo[(primer_articulo + i) % len(catalogo)][0],
+            unidad_medida=rnd.choice(UNIDADES),
+            cantidad=0,
+        )
+        for i in range(articulos)
+    ], batch_size=lote)
+    articulo_ids = list(range(primer_articulo, primer_articulo + articulos))
+    creados['articulos'] = articulos
+    log(f"Artículos: {articulos}")
+
+    donante_ids = list(Donante.objects.order_by('-id').values_list('id', flat=True)[:donantes])
+    beneficiario_ids = list(Beneficiario.objects.order_by('-id').values_list('id', flat=True)[:beneficiarios])
+    stock = dict.fromkeys(articulo_ids, 0)
+
+    # Donaciones con detalles y trazabilidad
+    siguiente_donacion = _siguiente_id(Donacion)
+    siguiente_traza = _siguiente_id(Trazabilidad)
+    detalles_por_donacion = min(detalles_por_donacion, articulos)
+    total_detalles = total_trazas = 0
+    for inicio, n in _en_lotes(donaciones, lote):
+        with transaction.atomic():
+            cabeceras = [
+                Donacion(
+                    id=siguiente_donacion + inicio + i,
+                    donante_id=rnd.choice(donante_ids),
+                    estado=rnd.choice(ESTADOS_DONACION),
+                )
+                for i in range(n)
+            ]
+            Donacion.objects.bulk_create(cabeceras)
+            agregar_uuids(*(donacion.uuid_seguimiento for donacion in cabeceras))
+            # fechaDonacion es auto_now_add: se reasigna después de insertar
+            fechas = {}
+            for donacion in cabeceras:
+                fechas[donacion.id] = fecha_aleatoria()
+                donacion.fechaDonacion = fechas[donacion.id].date()
+            Donacion.objects.bulk_update(cabeceras, ['fechaDonacion'], batch_size=1000)
+
+            detalles = []
+            trazas = []
+            for donacion in cabeceras:
+                for articulo_id in rnd.sample(articulo_ids, detalles_por_donacion):
+                    cantidad = rnd.randint(1, 50)
+                    stock[articulo_id] += cantidad
+                    detalles.append(DetalleDonacion(
+                        donacion_id=donacion.id, articulo_id=articulo_id, cantidad=cantidad
+                    ))
+                for j in range(trazabilidad_por_donacion):
+                    trazas.append(Trazabilidad(
+                        id=siguiente_traza + total_trazas + len(trazas),
+                        donacion_id=donacion.id,
+                        estado=donacion.estado if j else 'RECIBIDO',
+                        descripcion="Registro generado",
+                    ))
+            DetalleDonacion.objects.bulk_create(detalles, batch_size=lote)
+            # fecha también es auto_now_add; los ids explícitos permiten el bulk_update
+            Trazabilidad.objects.bulk_create(trazas, batch_size=lote)
+            for j, traza in enumerate(trazas):
+                traza.fecha = fechas[traza.donacion_id] + timedelta(hours=j % trazabilidad_por_donacion)
+            Trazabilidad.objects.bulk_update(trazas, ['fecha'], batch_size=1000)
+            total_detalles += len(detalles)
+            total_trazas += len(trazas)
+        log(f"Donaciones: {inicio + n}/{donaciones}")
+
+    creados['donaciones'] = donaciones
+    creados['detalles_donacion'] = total_detalles
+    creados['trazabilidad'] = total_trazas
+
+    # Entregas con detalles
+    siguiente_entrega = _siguiente_id(Entrega)
+    detalles_por_entrega = min(detalles_por_entrega, articulos)
+    total_detalles_entrega = 0
+    for inicio, n in _en_lotes(entregas, lote):
+        with transaction.atomic():
+            cabeceras = [
+                Entrega(
+                    id=siguiente_entrega + inicio + i,
+                    beneficiario_id=rnd.choice(beneficiario_ids),
+                    nombreResponsable=rnd.choice(NOMBRES),
+                )
+                for i in range(n)
+            ]
+            Entrega.objects.bulk_create(cabeceras)
+            agregar_uuids(*(entrega.uuid_seguimiento for entrega in cabeceras))
+            for entrega in cabeceras:
+                entrega.fechaEntrega = fecha_aleatoria().date()
+            Entrega.objects.bulk_update(cabeceras, ['fechaEntrega'], batch_size=1000)
+
+            detalles = []
+            for entrega in cabeceras:
+                for articulo_id in rnd.sample(articulo_ids, detalles_por_entrega):
+                    cantidad = min(stock[articulo_id], rnd.randint(1, 5))
+                    if cantidad <= 0:
+                        continue
+                    stock[articulo_id] -= cantidad
+                    detalles.append(DetalleEntrega(
+                        entrega_id=entrega.id, articulo_id=articulo_id, cantidad=cantidad
+                    ))
+            DetalleEntrega.objects.bulk_create(detalles, batch_size=lote)
+            total_detalles_entrega += len(detalles)
+        log(f"Entregas: {inicio + n}/{entregas}")
+    creados['entregas'] = entregas
+    creados['detalles_entrega'] = total_detalles_entrega
+
+    # Stock final = donado - entregado
+    articulos_obj = [ArticuloDonado(id=articulo_id, cantidad=cantidad) for articulo_id, cantidad in stock.items()]
+    ArticuloDonado.objects.bulk_update(articulos_obj, ['cantidad'], batch_size=1000)
+    log("Stock actualizado")
+
+    return creados
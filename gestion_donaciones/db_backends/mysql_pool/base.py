@@ -0,0 +1,28 @@
+from functools import partial
+
+from django.db.backends.mysql import base as mysql_base
+
+from gestion_donaciones.db_pool import obtener_pool
+
+
+class DatabaseWrapper(mysql_base.DatabaseWrapper):
+    """
+    Backend MySQL que reutiliza conexiones desde un pool por proceso.
+    Opciones en DATABASES[alias]['POOL']: MAX_SIZE, MAX_AGE y TIMEOUT.
+    """
+
+    def _pool(self):
+        return obtener_pool(self.alias, self.settings_dict.get('POOL', {}))
+
+    def get_new_connection(self, conn_params):
+        crear = partial(super().get_new_connection, conn_params)
+        conexion, self._pool_creada = self._pool().obtener(crear)
+        return conexion
+
+    def _close(self):
+        if self.connection is None:
+            return
+        # Una conexión con errores o con una transacción abierta no vuelve al pool
+        reutilizable = not self.errors_occurred and not self.in_atomic_block and self.autocommit
+        with self.wrap_database_errors:
+            self._pool().devolver(self.connection, self._pool_creada, reutilizable)
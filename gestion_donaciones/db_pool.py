@@ -0,0 +1,132 @@
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# --------------------
+# Pool de conexiones por proceso
+# --------------------
+# Usado por el backend gestion_donaciones.db_backends.mysql_pool. Cada worker
+# de gunicorn mantiene sus conexiones abiertas entre peticiones, evitando el
+# costo de TCP + TLS + autenticación contra el MySQL remoto en cada una.
+
+
+class PoolAgotado(Exception):
+    """No se liberó ninguna conexión dentro del tiempo de espera"""
+
+
+class PoolConexiones:
+    def __init__(self, max_conexiones=5, max_edad=300, timeout=10):
+        self.max_conexiones = max_conexiones
+        self.max_edad = max_edad
+        self.timeout = timeout
+        self._libres = deque()
+        self._cupos = threading.BoundedSemaphore(max_conexiones)
+        self._lock = threading.Lock()
+        self._stats = {
+            'creadas': 0,
+            'reutilizadas': 0,
+            'descartadas': 0,
+            'fallos_ping': 0,
+            'esperas_agotadas': 0,
+            'en_uso': 0,
+        }
+
+    def _contar(self, clave, delta=1):
+        with self._lock:
+            self._stats[clave] += delta
+
+    def _descartar(self, conexion):
+        self._contar('descartadas')
+        try:
+            conexion.close()
+        except Exception:  # noqa: BLE001
+            pass
+
+    def _esta_viva(self, conexion):
+        """Pre-ping antes de entregar una conexión reutilizada"""
+        try:
+            conexion.ping()
+            return True
+        except Exception:  # noqa: BLE001
+            self._contar('fallos_ping')
+            return False
+
+    def obtener(self, crear_conexion):
+        """Entrega una conexión libre y sana, o crea una nueva si hay cupo"""
+        if not self._cupos.acquire(timeout=self.timeout):
+            self._contar('esperas_agotadas')
+            raise PoolAgotado(
+                f"Sin conexiones disponibles tras {self.timeout}s (máximo {self.max_conexiones})"
+            )
+
+        try:
+            ahora = time.monotonic()
+            while True:
+                with self._lock:
+                    if not self._libres:
+                        break
+                    # LIFO: la más reciente tiene menos probabilidad de estar cortada
+                    conexion, creada = self._libres.pop()
+
+                if ahora - creada > self.max_edad or not self._esta_viva(conexion):
+                    self._descartar(conexion)
+                    continue
+
+                self._contar('reutilizadas')
+                self._contar('en_uso')
+                return conexion, creada
+
+            conexion = crear_conexion()
+            self._contar('creadas')
+            self._contar('en_uso')
+            return conexion, time.monotonic()
+        except BaseException:
+            self._cupos.release()
+            raise
+
+    def devolver(self, conexion, creada, reutilizable=True):
+        """Devuelve la conexión al pool (o la cierra si no es reutilizable)"""
+        try:
+            if reutilizable and time.monotonic() - creada <= self.max_edad:
+                with self._lock:
+                    self._libres.append((conexion, creada))
+            else:
+                self._descartar(conexion)
+        finally:
+            self._contar('en_uso', -1)
+            self._cupos.release()
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                **self._stats,
+                'libres': len(self._libres),
+                'max_conexiones': self.max_conexiones,
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def obtener_pool(alias, opciones):
+    """Pool del proceso para un alias de base de datos"""
+    with _pools_lock:
+        pool = _pools.get(alias)
+        if pool is None:
+            pool = PoolConexiones(
+                max_conexiones=opciones.get('MAX_SIZE', 5),
+                max_edad=opciones.get('MAX_AGE', 300),
+                timeout=opciones.get('TIMEOUT', 10),
+            )
+            _pools[alias] = pool
+        return pool
+
+
+def estadisticas_pools():
+    """Métricas de todos los pools del proceso actual"""
+    with _pools_lock:
+        return {alias: pool.estadisticas() for alias, pool in _pools.items()}
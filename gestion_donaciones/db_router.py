@@ -0,0 +1,175 @@
+import random
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# --------------------
+# Enrutamiento de lecturas a réplicas
+# --------------------
+# Solo las vistas marcadas con @solo_lectura (o con LecturaReplicaMixin) leen
+# desde las réplicas, y solo en métodos seguros (GET/HEAD/OPTIONS). Todo lo
+# demás, las escrituras y las lecturas dentro de transacciones van a 'default'.
+# Después de que un cliente escribe, sus lecturas se fijan al primario durante
+# REPLICA_PIN_SEGUNDOS para no mostrarle datos con retraso de replicación.
+
+METODOS_SEGUROS = ('GET', 'HEAD', 'OPTIONS')
+COOKIE_PIN = 'replica_pin'
+
+
+class EstadoReplica:
+    """Estado de enrutamiento de la petición en curso"""
+
+    def __init__(self, fijado_primario=False):
+        self.fijado_primario = fijado_primario
+        self.solo_lectura = False
+        self.escritura = False
+
+
+_estado = ContextVar('estado_replica', default=None)
+
+
+def _replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def _segundos_pin():
+    return getattr(settings, 'REPLICA_PIN_SEGUNDOS', 5)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        estado = _estado.get()
+        if estado is None or not estado.solo_lectura or estado.fijado_primario:
+            return None
+
+        replicas = _replicas()
+        if not replicas or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        estado = _estado.get()
+        if estado is not None:
+            # El resto de la petición (y las siguientes, vía cookie) lee del primario
+            estado.escritura = True
+            estado.fijado_primario = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        bases = {DEFAULT_DB_ALIAS, *_replicas()}
+        if obj1._state.db in bases and obj2._state.db in bases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in _replicas():
+            return False
+        return None
+
+
+class ReplicaMiddleware:
+    """Crea el estado de enrutamiento por petición y gestiona la fijación al primario"""
+
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        estado = self._estado_inicial(request)
+        token = _estado.set(estado)
+        try:
+            response = self.get_response(request)
+        finally:
+            _estado.reset(token)
+        return self._fijar_primario(estado, response)
+
+    async def __acall__(self, request):
+        estado = self._estado_inicial(request)
+        token = _estado.set(estado)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _estado.reset(token)
+        return self._fijar_primario(estado, response)
+
+    def _estado_inicial(self, request):
+        try:
+            fijado_hasta = float(request.COOKIES.get(COOKIE_PIN, 0))
+        except ValueError:
+            fijado_hasta = 0
+        return EstadoReplica(fijado_primario=fijado_hasta > time.time())
+
+    def _fijar_primario(self, estado, response):
+        if estado.escritura and _replicas():
+            segundos = _segundos_pin()
+            response.set_cookie(
+                COOKIE_PIN,
+                str(time.time() + segundos),
+                max_age=segundos,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+
+class _lectura_replica:
+    """Activa la lectura desde réplicas durante una petición segura"""
+
+    def __init__(self, request):
+        self.activo = request.method in METODOS_SEGUROS
+        self.token = None
+
+    def __enter__(self):
+        if not self.activo:
+            return
+        estado = _estado.get()
+        if estado is None:
+            estado = EstadoReplica()
+            self.token = _estado.set(estado)
+        self.anterior = estado.solo_lectura
+        self.estado = estado
+        estado.solo_lectura = True
+
+    def __exit__(self, *exc):
+        if not self.activo:
+            return
+        self.estado.solo_lectura = self.anterior
+        if self.token is not None:
+            _estado.reset(self.token)
+
+
+def solo_lectura(view_func):
+    """Marca una vista para que sus lecturas en métodos seguros usen las réplicas"""
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def wrapper_async(request, *args, **kwargs):
+            with _lectura_replica(request):
+                return await view_func(request, *args, **kwargs)
+
+        return wrapper_async
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        with _lectura_replica(request):
+            return view_func(request, *args, **kwargs)
+
+    return wrapper
+
+
+class LecturaReplicaMixin:
+    """Equivalente a @solo_lectura para los ViewSets de DRF"""
+
+    def dispatch(self, request, *args, **kwargs):
+        with _lectura_replica(request):
+            return super().dispatch(request, *args, **kwargs)
@@ -0,0 +1,177 @@
+import re
+import unicodedata
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, When
+
+from gestion_donaciones.cache_paginas import purgar_paginas
+from gestion_donaciones.models import Beneficiario, Donante
+
+# --------------------
+# Detección y fusión de donantes / beneficiarios duplicados
+# --------------------
+# En vez de comparar todos contra todos (cuadrático), cada registro genera
+# claves de bloqueo: variantes del RUT normalizado, una clave fonética del
+# nombre y el email. Solo se comparan los registros que comparten alguna clave,
+# y un par se considera duplicado si coincide en al menos dos de las tres
+# señales (RUT, nombre, email). Los pares se agrupan con union-find y cada
+# grupo se fusiona en su registro más antiguo: las FK de donaciones / entregas
+# se reasignan con un UPDATE por relación y los duplicados se eliminan.
+
+SENALES_MINIMAS = 2
+MAX_BLOQUE = 50
+LOTE = 500
+
+CAMPOS = {
+    Donante: ['id', 'rut', 'rut_cuerpo', 'rut_dv', 'nombre', 'apellido', 'email', 'telefono'],
+    Beneficiario: ['id', 'rut', 'rut_cuerpo', 'rut_dv', 'nombre', 'email', 'telefono', 'direccion'],
+}
+# Campos que el registro conservado toma de sus duplicados si los tiene vacíos
+COMPLETAR = {
+    Donante: ['apellido', 'email', 'telefono'],
+    Beneficiario: ['email', 'telefono', 'direccion'],
+}
+
+_FONETICA = [
+    (r'[^a-zñ ]', ''),
+    (r'ch', 'ç'),
+    (r'h', ''),
+    (r'qu', 'k'),
+    (r'c([ei])', r's\1'),
+    (r'g([ei])', r'j\1'),
+    (r'gu([ei])', r'g\1'),
+    (r'll', 'y'),
+    (r'[cq]', 'k'),
+    (r'v', 'b'),
+    (r'\bx', 'j'),
+    (r'[zx]', 's'),
+    (r'ñ', 'n'),
+    (r'w', 'gu'),
+    (r'y\b', 'i'),
+    (r'(.)\1+', r'\1'),
+]
+
+
+def clave_fonetica(nombre):
+    """Clave fonética aproximada para nombres en español: 'Ximena Gonzales' ~ 'jimena gonzalez'"""
+    texto = unicodedata.normalize('NFKD', (nombre or '').lower().replace('ñ', '\0'))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).replace('\0', 'ñ')
+    for patron, reemplazo in _FONETICA:
+        texto = re.sub(patron, reemplazo, texto)
+    return ' '.join(sorted(texto.split()))
+
+
+def _nombre_completo(fila):
+    return f"{fila['nombre']} {fila.get('apellido', '')}".strip()
+
+
+def claves_bloqueo(fila):
+    """Claves (señal, valor) de un registro; dos registros son candidatos si comparten alguna"""
+    claves = set()
+    if fila['rut_cuerpo']:
+        # El cuerpo con y sin el dígito verificador también empareja un RUT
+        # ingresado sin guion ni dígito ("12345678" leído como 1234567-8)
+        claves.add(('rut', str(fila['rut_cuerpo'])))
+        claves.add(('rut', f"{fila['rut_cuerpo']}{fila['rut_dv']}"))
+    nombre = clave_fonetica(_nombre_completo(fila))
+    if nombre:
+        claves.add(('nombre', nombre))
+    email = (fila['email'] or '').strip().lower()
+    if email:
+        claves.add(('email', email))
+    return claves
+
+
+class _UnionFind:
+    def __init__(self):
+        self.padre = {}
+
+    def raiz(self, x):
+        self.padre.setdefault(x, x)
+        while self.padre[x] != x:
+            self.padre[x] = self.padre[self.padre[x]]
+            x = self.padre[x]
+        return x
+
+    def unir(self, a, b):
+        ra, rb = self.raiz(a), self.raiz(b)
+        if ra != rb:
+            # La raíz es siempre el id menor: el registro más antiguo
+            self.padre[max(ra, rb)] = min(ra, rb)
+
+
+def buscar_duplicados(modelo, max_bloque=MAX_BLOQUE):
+    """
+    Retorna una lista de grupos [(id_conservado, [ids_duplicados], [filas])].
+    Los bloques con más de max_bloque registros (nombres muy comunes) se
+    ignoran para mantener el costo casi lineal.
+    """
+    consulta = modelo.objects.order_by('id').values(*CAMPOS[modelo])
+    filas = {fila['id']: fila for fila in consulta.iterator(chunk_size=2000)}
+    bloques = defaultdict(list)
+    claves = {}
+    for id_, fila in filas.items():
+        claves[id_] = claves_bloqueo(fila)
+        for clave in claves[id_]:
+            bloques[clave].append(id_)
+
+    uf = _UnionFind()
+    evaluados = set()
+    for ids in bloques.values():
+        if len(ids) < 2 or len(ids) > max_bloque:
+            continue
+        # Los ids de cada bloque están en orden ascendente: (a, b) con a < b
+        for i, a in enumerate(ids):
+            for b in ids[i + 1:]:
+                if (a, b) in evaluados:
+                    continue
+                evaluados.add((a, b))
+                senales = {senal for senal, _ in claves[a] & claves[b]}
+                if len(senales) >= SENALES_MINIMAS:
+                    uf.unir(a, b)
+
+    grupos = defaultdict(list)
+    for id_ in uf.padre:
+        grupos[uf.raiz(id_)].append(id_)
+    return [
+        (raiz, sorted(i for i in ids if i != raiz), [filas[i] for i in sorted(ids)])
+        for raiz, ids in sorted(grupos.items())
+        if len(ids) > 1
+    ]
+
+
+def fusionar(modelo, grupos):
+    """Fusiona cada grupo en su registro conservado; retorna la cantidad de duplicados eliminados"""
+    destino = {dup: conservado for conservado, duplicados, _ in grupos for dup in duplicados}
+    if not destino:
+        return 0
+    relaciones = [rel for rel in modelo._meta.related_objects if rel.field.concrete and not rel.many_to_many]
+
+    with transaction.atomic():
+        duplicados = list(destino)
+        for inicio in range(0, len(duplicados), LOTE):
+            lote = duplicados[inicio:inicio + LOTE]
+            for rel in relaciones:
+                columna = rel.field.attname
+                reasignar = Case(*(When(**{columna: dup}, then=destino[dup]) for dup in lote))
+                rel.related_model.objects.filter(**{f'{columna}__in': lote}).update(**{columna: reasignar})
+
+        # Completar campos vacíos del conservado antes de borrar los duplicados
+        conservados = []
+        for conservado, _, filas in grupos:
+            principal = next(f for f in filas if f['id'] == conservado)
+            cambios = {
+                campo: next((f[campo] for f in filas if f[campo]), principal[campo])
+                for campo in COMPLETAR[modelo]
+                if not principal[campo]
+            }
+            if cambios:
+                conservados.append(modelo(**{**principal, **cambios}))
+        modelo.objects.filter(id__in=duplicados).delete()
+        if conservados:
+            modelo.objects.bulk_update(conservados, COMPLETAR[modelo], batch_size=LOTE)
+
+        # Las páginas de seguimiento muestran el nombre del donante
+        transaction.on_commit(lambda: purgar_paginas('seguimiento'))
+    return len(duplicados)
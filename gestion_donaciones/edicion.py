@@ -0,0 +1,134 @@
+from collections import defaultdict, namedtuple
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from gestion_donaciones.alertas import revisar as revisar_alertas
+from gestion_donaciones.cache_paginas import purgar_seguimiento
+from gestion_donaciones.models import ArticuloDonado, DetalleDonacion, DetalleEntrega, Donacion
+from gestion_donaciones.signals import ajustes_de_stock_manuales
+
+# --------------------
+# Edición de detalles por diferencias
+# --------------------
+# Al editar una donación o una entrega se comparan las líneas enviadas
+# (artículo -> cantidad y demás campos) con los detalles existentes y solo se
+# insertan, actualizan o eliminan los que cambiaron: los detalles conservan su
+# id (las entregas enlazan detalle_donacion) y cada artículo recibe un único
+# UPDATE de stock con el cambio neto, en vez de devolver y volver a descontar
+# el stock línea por línea. Todo ocurre en una transacción: si el stock no
+# alcanza no se aplica ningún cambio.
+
+Cambios = namedtuple('Cambios', ['creados', 'actualizados', 'eliminados'])
+
+# Campo que une cada detalle con su donación / entrega
+_PADRE = {DetalleDonacion: 'donacion', DetalleEntrega: 'entrega'}
+
+
+def _diferencias(padre, Detalle, lineas):
+    """Retorna (crear, actualizar, campos, eliminar, delta por artículo) sin escribir nada"""
+    existentes = {
+        detalle.articulo_id: detalle
+        for detalle in Detalle.objects.select_for_update().filter(**{_PADRE[Detalle]: padre})
+    }
+    crear, actualizar, eliminar = [], [], []
+    campos = set()
+    delta = defaultdict(int)
+
+    for articulo_id, valores in lineas.items():
+        detalle = existentes.pop(articulo_id, None)
+        if detalle is None:
+            crear.append(Detalle(**{_PADRE[Detalle]: padre}, articulo_id=articulo_id, **valores))
+            delta[articulo_id] += valores['cantidad']
+            continue
+        cambiados = {campo: valor for campo, valor in valores.items() if getattr(detalle, campo) != valor}
+        if not cambiados:
+            continue
+        delta[articulo_id] += valores['cantidad'] - detalle.cantidad
+        for campo, valor in cambiados.items():
+            setattr(detalle, campo, valor)
+        campos.update(cambiados)
+        actualizar.append(detalle)
+
+    for detalle in existentes.values():
+        delta[detalle.articulo_id] -= detalle.cantidad
+        eliminar.append(detalle.id)
+
+    return crear, actualizar, sorted(campos), eliminar, {a: d for a, d in delta.items() if d}
+
+
+def aplicar_stock(delta):
+    """Aplica el delta neto de cada artículo en un solo UPDATE; ValidationError si alguno queda negativo"""
+    if not delta:
+        return
+    stock = ArticuloDonado.objects.select_for_update().filter(id__in=delta).values_list(
+        'id', 'nombreObjeto', 'cantidad'
+    )
+    errores = [
+        f"{nombre}: stock insuficiente (disponible: {cantidad}, solicitado: {-delta[id_]})"
+        for id_, nombre, cantidad in stock
+        if cantidad + delta[id_] < 0
+    ]
+    if errores:
+        raise ValidationError(errores)
+
+    ArticuloDonado.objects.filter(id__in=delta).update(
+        cantidad=F('cantidad') + Case(
+            *(When(id=id_, then=Value(d)) for id_, d in delta.items()),
+            output_field=IntegerField(),
+        ),
+        fecha_actualizacion=timezone.now(),
+    )
+    revisar_alertas(*delta)
+
+
+def _editar(padre, Detalle, lineas, signo):
+    with transaction.atomic():
+        crear, actualizar, campos, eliminar, delta = _diferencias(padre, Detalle, lineas)
+        aplicar_stock({articulo_id: signo * d for articulo_id, d in delta.items()})
+        with ajustes_de_stock_manuales():
+            if eliminar:
+                Detalle.objects.filter(id__in=eliminar).delete()
+            if actualizar:
+                Detalle.objects.bulk_update(actualizar, campos)
+            if crear:
+                Detalle.objects.bulk_create(crear)
+    return Cambios(crear, actualizar, eliminar)
+
+
+def editar_detalles_donacion(donacion, lineas):
+    """
+    lineas: {articulo_id: cantidad}. Las líneas que faltan se eliminan.
+    El stock sube o baja según la diferencia con lo donado antes.
+    """
+    cambios = _editar(donacion, DetalleDonacion, {a: {'cantidad': c} for a, c in lineas.items()}, 1)
+    if any(cambios):
+        purgar_seguimiento(donacion.uuid_seguimiento)
+    return cambios
+
+
+def editar_detalles_entrega(entrega, lineas):
+    """
+    lineas: {articulo_id: {'cantidad': n, 'detalle_donacion_id': id o None}}.
+    El stock baja o sube según la diferencia con lo entregado antes y, si es
+    un borrador de una solicitud, su estado se recalcula.
+    """
+    with transaction.atomic():
+        cambios = _editar(entrega, DetalleEntrega, lineas, -1)
+        enlazadas = {
+            detalle.detalle_donacion_id
+            for detalle in [*cambios.creados, *cambios.actualizados]
+            if detalle.detalle_donacion_id
+        }
+        if enlazadas:
+            # Misma verificación que DetalleEntrega.save, una vez por donación
+            for donacion in Donacion.objects.filter(detalles__id__in=enlazadas, entregado=False).distinct():
+                donacion.verificar_entrega_completa(entrega.beneficiario.nombre)
+        if entrega.solicitud_id and any(cambios):
+            # Los detalles en bloque no disparan signals. Import diferido: asignacion importa este módulo
+            from gestion_donaciones.asignacion import revisar_solicitudes
+
+            revisar_solicitudes(solicitudes=[entrega.solicitud_id])
+    return cambios
@@ -0,0 +1,156 @@
+import gzip
+import mimetypes
+import os
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin él solo se generan variantes gzip
+    brotli = None
+
+# --------------------
+# Archivos estáticos precomprimidos
+# --------------------
+# collectstatic guarda cada archivo con un hash de su contenido en el nombre
+# (estilos.3f2a1c.css) y genera variantes .gz y .br de los compresibles.
+# EstaticosMiddleware los sirve desde STATIC_ROOT eligiendo la variante según
+# Accept-Encoding; los nombres con hash se cachean un año como immutable, ya que
+# un cambio de contenido produce un nombre nuevo.
+
+EXTENSIONES_COMPRIMIBLES = ('.css', '.js', '.svg', '.json', '.map', '.txt', '.html', '.xml', '.ico')
+TAMANO_MINIMO = 512
+CACHE_INMUTABLE = 'public, max-age=31536000, immutable'
+CACHE_SIN_HASH = 'public, max-age=3600'
+
+
+def _comprimible(nombre):
+    return nombre.endswith(EXTENSIONES_COMPRIMIBLES)
+
+
+class EstaticosComprimidos(ManifestStaticFilesStorage):
+    """Manifest con hash de contenido + variantes gzip/brotli generadas en collectstatic"""
+
+    manifest_strict = False
+
+    def stored_name(self, name):
+        # Sin manifiesto (collectstatic no ejecutado, p. ej. en tests) se usan los nombres originales
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        procesados = set()
+        for original, procesado, fue_procesado in super().post_process(paths, dry_run, **options):
+            if not isinstance(fue_procesado, Exception) and procesado:
+                procesados.update((original, procesado))
+            yield original, procesado, fue_procesado
+
+        if dry_run:
+            return
+        for nombre in sorted(procesados):
+            if _comprimible(nombre):
+                self._comprimir(nombre)
+
+    def _comprimir(self, nombre):
+        ruta = self.path(nombre)
+        with open(ruta, 'rb') as archivo:
+            contenido = archivo.read()
+        if len(contenido) < TAMANO_MINIMO:
+            return
+
+        variantes = [('.gz', gzip.compress(contenido, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variantes.append(('.br', brotli.compress(contenido, quality=11)))
+        for sufijo, comprimido in variantes:
+            # Solo vale la pena si la variante es realmente más chica
+            if len(comprimido) < len(contenido):
+                with open(ruta + sufijo, 'wb') as destino:
+                    destino.write(comprimido)
+
+
+def _nombres_con_hash():
+    hashed = getattr(staticfiles_storage, 'hashed_files', None) or {}
+    return set(hashed.values())
+
+
+class EstaticosMiddleware:
+    """Sirve STATIC_ROOT con variantes precomprimidas y caché de largo plazo"""
+
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefijo = settings.STATIC_URL if settings.STATIC_URL.startswith('/') else '/' + settings.STATIC_URL
+        self.raiz = settings.STATIC_ROOT
+        self.con_hash = _nombres_con_hash()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self._estatico(request)
+        if response is None:
+            response = self.get_response(request)
+        return response
+
+    async def __acall__(self, request):
+        response = self._estatico(request)
+        if response is None:
+            response = await self.get_response(request)
+        return response
+
+    def _estatico(self, request):
+        if (
+            self.raiz
+            and request.method in ('GET', 'HEAD')
+            and request.path.startswith(self.prefijo)
+        ):
+            return self._servir(request, request.path[len(self.prefijo):])
+        return None
+
+    def _servir(self, request, nombre):
+        try:
+            ruta = safe_join(self.raiz, nombre)
+        except (SuspiciousFileOperation, ValueError):
+            return None
+        if not os.path.isfile(ruta):
+            return None
+
+        stat = os.stat(ruta)
+        cache_control = CACHE_INMUTABLE if nombre in self.con_hash else CACHE_SIN_HASH
+        if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime):
+            response = HttpResponseNotModified()
+            response['Cache-Control'] = cache_control
+            return response
+
+        tipo, _ = mimetypes.guess_type(ruta)
+        aceptadas = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        servido, codificacion = ruta, None
+        for sufijo, nombre_codificacion in (('.br', 'br'), ('.gz', 'gzip')):
+            if nombre_codificacion in aceptadas and os.path.isfile(ruta + sufijo):
+                servido, codificacion = ruta + sufijo, nombre_codificacion
+                break
+
+        response = FileResponse(
+            open(servido, 'rb'),
+            content_type=tipo or 'application/octet-stream',
+            filename=os.path.basename(ruta),
+        )
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        response['Cache-Control'] = cache_control
+        if codificacion:
+            response['Content-Encoding'] = codificacion
+        if _comprimible(nombre):
+            patch_vary_headers(response, ('Accept-Encoding',))
+        return response
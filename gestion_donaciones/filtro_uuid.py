@@ -0,0 +1,267 @@
+import logging
+import math
+import threading
+import time
+import uuid
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, transaction
+from django.http import HttpResponse, HttpResponseNotFound
+from django.template.loader import render_to_string
+from django.utils.encoding import force_str
+from rest_framework.exceptions import NotFound
+
+from gestion_donaciones.renderers import JSONRapidoRenderer
+
+logger = logging.getLogger(__name__)
+
+# --------------------
+# Filtro de UUIDs de seguimiento desconocidos
+# --------------------
+# Filtro de Bloom en memoria con los uuid_seguimiento de Donacion y Entrega.
+# Si el filtro dice que un UUID no existe, es seguro: la vista responde un 404
+# prearmado sin tocar la base de datos (los escáneres de UUIDs aleatorios no
+# cuestan consultas). Si dice que puede existir, se consulta normalmente.
+#
+# Se construye al iniciar cada proceso (wsgi.py / asgi.py, o en la primera
+# consulta) y se actualiza con los inserts del propio proceso vía signals. Los
+# de otros workers se detectan con una versión en la caché compartida que cada
+# insert cambia al confirmar: si no cambió desde la última carga, el UUID se
+# descarta sin consultas. Si cambió (o no hay caché compartida para saberlo),
+# antes de descartar se cargan los registros con id mayor al último conocido,
+# a lo sumo cada FILTRO_UUID_REFRESCO segundos; entre recargas el UUID no se
+# descarta y la vista lo busca en la base.
+# Los ids se asignan al insertar pero las transacciones confirman en otro orden:
+# un id menor puede aparecer después de leer uno mayor. Por eso cada recarga
+# vuelve a leer las últimas FILTRO_UUID_VENTANA filas ya vistas; los UUIDs que
+# el filtro ya contiene no se cuentan de nuevo.
+
+CAPACIDAD_MINIMA = 10000
+FILTRO_VERSION_KEY = 'filtro_uuid:version'
+
+
+class FiltroBloom:
+    def __init__(self, capacidad, tasa_error):
+        self.capacidad = capacidad
+        self.bits = max(8, math.ceil(-capacidad * math.log(tasa_error) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.bits / capacidad * math.log(2)))
+        self.arreglo = bytearray((self.bits + 7) // 8)
+        self.elementos = 0
+
+    def _posiciones(self, valor):
+        # Los UUID ya son aleatorios: sus dos mitades sirven de hashes (doble hashing)
+        h1 = int.from_bytes(valor.bytes[:8], 'little')
+        h2 = int.from_bytes(valor.bytes[8:], 'little') | 1
+        return ((h1 + i * h2) % self.bits for i in range(self.hashes))
+
+    def agregar(self, valor):
+        for pos in self._posiciones(valor):
+            self.arreglo[pos >> 3] |= 1 << (pos & 7)
+        self.elementos += 1
+
+    def __contains__(self, valor):
+        return all(self.arreglo[pos >> 3] & (1 << (pos & 7)) for pos in self._posiciones(valor))
+
+
+class _EstadoFiltro:
+    def __init__(self):
+        self.filtro = None
+        self.ultimo_id = {}
+        self.version = None
+        self.refrescado = 0.0
+        self.lock = threading.Lock()
+
+
+_estado = _EstadoFiltro()
+
+
+def _modelos():
+    from gestion_donaciones.models import Donacion, Entrega
+    return (Donacion, Entrega)
+
+
+def _activo():
+    return getattr(settings, 'FILTRO_UUID_ACTIVO', True)
+
+
+def _nueva_version():
+    return time.time_ns()
+
+
+def _version():
+    # Se lee antes que las filas: un insert confirmado después la cambia otra vez
+    return cache.get_or_set(FILTRO_VERSION_KEY, _nueva_version, None)
+
+
+def _marcar_insert():
+    cache.set(FILTRO_VERSION_KEY, _nueva_version(), None)
+
+
+def _leer(ultimo_id, ventana=0):
+    """
+    Retorna los UUIDs con id mayor al último conocido de cada modelo menos
+    'ventana', como bytes contiguos de 16 en 16 (compacto para millones de
+    filas); actualiza ultimo_id.
+    """
+    leidos = bytearray()
+    for modelo in _modelos():
+        desde = ultimo_id.get(modelo.__name__, 0)
+        filas = (
+            modelo.objects.filter(id__gt=max(0, desde - ventana))
+            .order_by('id')
+            .values_list('id', 'uuid_seguimiento')
+            .iterator(chunk_size=5000)
+        )
+        for id_, uuid_seguimiento in filas:
+            leidos += uuid_seguimiento.bytes
+            desde = max(desde, id_)
+        ultimo_id[modelo.__name__] = desde
+    return leidos
+
+
+def _volcar(filtro, leidos):
+    for inicio in range(0, len(leidos), 16):
+        valor = uuid.UUID(bytes=bytes(leidos[inicio:inicio + 16]))
+        # Las filas releídas por la ventana no deben contar dos veces
+        if valor not in filtro:
+            filtro.agregar(valor)
+
+
+def _cargar(filtro, ultimo_id):
+    """Agrega al filtro los UUIDs nuevos, releyendo la ventana de los últimos ids vistos"""
+    _volcar(filtro, _leer(ultimo_id, getattr(settings, 'FILTRO_UUID_VENTANA', 1000)))
+
+
+def construir():
+    """
+    Reconstruye el filtro completo desde la base de datos. Los UUIDs se leen
+    antes de dimensionarlo: una consulta por modelo, sin contar las filas
+    aparte (en frío la construcción cae dentro de la primera petición).
+    """
+    version = _version()
+    ultimo_id = {}
+    leidos = _leer(ultimo_id)
+    filtro = FiltroBloom(
+        max(CAPACIDAD_MINIMA, len(leidos) // 16 * 2), getattr(settings, 'FILTRO_UUID_TASA_ERROR', 0.001)
+    )
+    _volcar(filtro, leidos)
+    with _estado.lock:
+        _estado.filtro = filtro
+        _estado.ultimo_id = ultimo_id
+        _estado.version = version
+        _estado.refrescado = time.monotonic()
+    logger.info("filtro de UUIDs construido: %s elementos, %s bits", filtro.elementos, filtro.bits)
+
+
+def precargar():
+    """Construye el filtro al iniciar el proceso; si la base no responde se hará en la primera consulta"""
+    if not _activo():
+        return
+    try:
+        construir()
+    except DatabaseError:
+        logger.warning("no se pudo construir el filtro de UUIDs al iniciar", exc_info=True)
+
+
+def _refrescar():
+    version = _version()
+    with _estado.lock:
+        _cargar(_estado.filtro, _estado.ultimo_id)
+        _estado.version = version
+        _estado.refrescado = time.monotonic()
+        lleno = _estado.filtro.elementos > _estado.filtro.capacidad
+    if lleno:
+        # Sobre la capacidad la tasa de falsos positivos crece: se reconstruye al doble
+        construir()
+
+
+def agregar(*valores):
+    """Registra UUIDs recién insertados (signals post_save, o a mano tras un bulk_create)"""
+    filtro = _estado.filtro
+    if filtro is not None:
+        with _estado.lock:
+            for valor in valores:
+                filtro.agregar(valor)
+    # Los demás workers recargan al ver la versión nueva
+    transaction.on_commit(_marcar_insert)
+
+
+def puede_existir(valor):
+    """
+    False solo si el UUID no está en el filtro y ningún worker insertó desde
+    la última carga (o el filtro se acaba de recargar); ante la duda, True.
+    """
+    if not _activo():
+        return True
+    if not isinstance(valor, uuid.UUID):
+        try:
+            valor = uuid.UUID(str(valor))
+        except ValueError:
+            return False
+
+    try:
+        if _estado.filtro is None:
+            construir()
+        if valor in _estado.filtro:
+            return True
+        compartida = getattr(settings, 'CACHE_COMPARTIDA', False)
+        if compartida and cache.get(FILTRO_VERSION_KEY) == _estado.version:
+            return False
+        if time.monotonic() - _estado.refrescado < getattr(settings, 'FILTRO_UUID_REFRESCO', 2):
+            # Puede ser un insert de otro worker aún no cargado: lo decide la base
+            return True
+        _refrescar()
+    except DatabaseError:
+        logger.warning("filtro de UUIDs no disponible", exc_info=True)
+        return True
+    return valor in _estado.filtro
+
+
+# --------------------
+# Respuestas 404 prearmadas
+# --------------------
+_respuestas = {}
+
+
+def _contenido_404(formato):
+    contenido = _respuestas.get(formato)
+    if contenido is None:
+        if formato == 'json':
+            contenido = JSONRapidoRenderer().render({'detail': force_str(NotFound.default_detail)})
+        else:
+            contenido = render_to_string('DonacionesApp/seguimiento/seguimiento.html', {'donacion': None})
+        _respuestas[formato] = contenido
+    return contenido
+
+
+def respuesta_no_encontrada(formato='html'):
+    """404 de seguimiento renderizado una sola vez por proceso"""
+    if formato == 'json':
+        return HttpResponse(_contenido_404('json'), status=404, content_type='application/json')
+    return HttpResponseNotFound(_contenido_404('html'))
+
+
+def descartar_uuid_desconocido(formato='html'):
+    """Responde 404 sin consultar la base si el uuid_seguimiento de la URL seguro no existe"""
+    def decorador(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def wrapper_async(request, *args, **kwargs):
+                if not await sync_to_async(puede_existir)(kwargs.get('uuid_seguimiento')):
+                    return respuesta_no_encontrada(formato)
+                return await view_func(request, *args, **kwargs)
+
+            return wrapper_async
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not puede_existir(kwargs.get('uuid_seguimiento')):
+                return respuesta_no_encontrada(formato)
+            return view_func(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorador
@@ -1,9 +1,18 @@
 from django import forms
 from .models import Donante, ArticuloDonado, Beneficiario, Donacion, Entrega
+from .catalogo import validar_nombre_unico
+from .rut import normalizar_unico
+
+
+class RutUnicoMixin:
+    """Normaliza el RUT y rechaza duplicados por cuerpo (el índice único es rut_cuerpo)"""
+
+    def clean_rut(self):
+        return normalizar_unico(self._meta.model, self.cleaned_data['rut'], self.instance)
 
 
 # 1. Formulario para Donante
-class DonanteForm(forms.ModelForm):
+class DonanteForm(RutUnicoMixin, forms.ModelForm):
     class Meta:
         model = Donante
         fields = [
@@ -45,9 +54,12 @@ class ArticuloDonadoForm(forms.ModelForm):
             'unidad_medida': forms.Select(attrs={'class': 'form-control'}),
         }
 
+    def clean_nombreObjeto(self):
+        return validar_nombre_unico(self.cleaned_data['nombreObjeto'], self.instance)
+
 
 # 3. Formulario para Beneficiario
-class BeneficiarioForm(forms.ModelForm):
+class BeneficiarioForm(RutUnicoMixin, forms.ModelForm):
     class Meta:
         model = Beneficiario
         fields = [
@@ -0,0 +1,148 @@
+from datetime import timedelta
+
+from django.db import connections, router, transaction
+from django.db.models import Count, DateField, F, Max, Min, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from gestion_donaciones.models import (
+    ArticuloDonado,
+    DetalleDonacion,
+    DetalleEntrega,
+    FotoStock,
+    FotoStockCategoria,
+)
+
+# --------------------
+# Stock histórico
+# --------------------
+# El comando foto_stock guarda cada noche el stock de cada artículo al cierre
+# del día anterior (FotoStock) y los totales por categoría
+# (FotoStockCategoria), cada tabla con un solo INSERT ... SELECT. La foto se
+# calcula como el stock actual menos los movimientos fechados después del día,
+# así no importa a qué hora corra el comando. Para conocer el stock de otra
+# fecha se parte de la foto más cercana (o del stock actual) y se suman o
+# restan los movimientos entre ambas fechas con dos consultas agrupadas, sin
+# recorrer toda la historia. Donaciones y entregas solo guardan la fecha, por
+# eso la resolución es de un día.
+
+
+def _neto_despues(Detalle, campo_fecha, fecha):
+    """Subconsulta: total del artículo en detalles con fecha posterior a 'fecha'"""
+    return Coalesce(
+        Subquery(
+            Detalle.objects.filter(articulo=OuterRef('pk'), **{f'{campo_fecha}__gt': fecha})
+            .order_by()
+            .values('articulo')
+            .annotate(total=Sum('cantidad'))
+            .values('total')
+        ),
+        0,
+    )
+
+
+def _insertar(Modelo, columnas, consulta):
+    """INSERT INTO Modelo (columnas) SELECT ...; la consulta debe seleccionar las columnas en ese orden"""
+    connection = connections[router.db_for_write(Modelo)]
+    sql, params = consulta.query.sql_with_params()
+    tabla = connection.ops.quote_name(Modelo._meta.db_table)
+    nombres = ', '.join(connection.ops.quote_name(Modelo._meta.get_field(c).column) for c in columnas)
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {tabla} ({nombres}) {sql}", params)
+        return cursor.rowcount
+
+
+def tomar_foto(fecha=None):
+    """Guarda (o reemplaza) la foto de stock al cierre de 'fecha', por defecto ayer; retorna las filas escritas"""
+    fecha = fecha or timezone.localdate() - timedelta(days=1)
+
+    articulos = ArticuloDonado.objects.order_by().annotate(
+        f_fecha=Value(fecha, output_field=DateField()),
+        f_articulo=F('id'),
+        f_categoria=F('categoria'),
+        f_cantidad=(
+            F('cantidad')
+            - _neto_despues(DetalleDonacion, 'donacion__fechaDonacion', fecha)
+            + _neto_despues(DetalleEntrega, 'entrega__fechaEntrega', fecha)
+        ),
+    ).values_list('f_fecha', 'f_articulo', 'f_categoria', 'f_cantidad')
+
+    categorias = FotoStock.objects.filter(fecha=fecha).order_by().values('categoria').annotate(
+        c_fecha=Value(fecha, output_field=DateField()),
+        c_categoria=F('categoria'),
+        c_cantidad=Sum('cantidad'),
+        c_articulos=Count('id'),
+    ).values_list('c_fecha', 'c_categoria', 'c_cantidad', 'c_articulos')
+
+    with transaction.atomic():
+        FotoStock.objects.filter(fecha=fecha).delete()
+        FotoStockCategoria.objects.filter(fecha=fecha).delete()
+        filas = _insertar(FotoStock, ['fecha', 'articulo', 'categoria', 'cantidad'], articulos)
+        _insertar(FotoStockCategoria, ['fecha', 'categoria', 'cantidad', 'articulos'], categorias)
+    return filas
+
+
+def _base(fecha):
+    """Fecha de la foto más cercana a 'fecha', o None si lo más cercano es el stock actual"""
+    hoy = timezone.localdate()
+    if fecha >= hoy:
+        return None
+    fotos = FotoStockCategoria.objects.aggregate(
+        anterior=Max('fecha', filter=Q(fecha__lte=fecha)),
+        posterior=Min('fecha', filter=Q(fecha__gt=fecha)),
+    )
+    candidatas = [f for f in (fotos['anterior'], fotos['posterior'], hoy) if f is not None]
+    base = min(candidatas, key=lambda f: (abs((f - fecha).days), f))
+    return None if base == hoy else base
+
+
+def _movimientos(desde, hasta, clave, filtros):
+    """{clave: donado - entregado} de los movimientos con fecha en (desde, hasta]"""
+    neto = {}
+    for Detalle, campo_fecha, signo in (
+        (DetalleDonacion, 'donacion__fechaDonacion', 1),
+        (DetalleEntrega, 'entrega__fechaEntrega', -1),
+    ):
+        totales = Detalle.objects.filter(
+            **filtros, **{f'{campo_fecha}__gt': desde, f'{campo_fecha}__lte': hasta}
+        ).order_by().values(clave).annotate(total=Sum('cantidad')).values_list(clave, 'total')
+        for valor, total in totales:
+            neto[valor] = neto.get(valor, 0) + signo * total
+    return neto
+
+
+def _aplicar(cantidades, fecha, base, clave, filtros):
+    origen = base or timezone.localdate()
+    if origen == fecha:
+        return cantidades
+    signo = 1 if origen < fecha else -1
+    for valor, neto in _movimientos(min(origen, fecha), max(origen, fecha), clave, filtros).items():
+        cantidades[valor] = cantidades.get(valor, 0) + signo * neto
+    return cantidades
+
+
+def stock_al(fecha, categoria=None):
+    """
+    Stock de cada artículo al cierre de 'fecha': retorna (fecha de la foto
+    usada o None si se partió del stock actual, {articulo_id: cantidad}).
+    """
+    base = _base(fecha)
+    if base is None:
+        consulta = ArticuloDonado.objects.values_list('id', 'cantidad')
+    else:
+        consulta = FotoStock.objects.filter(fecha=base).values_list('articulo_id', 'cantidad')
+    if categoria:
+        consulta = consulta.filter(categoria=categoria)
+    filtros = {'articulo__categoria': categoria} if categoria else {}
+    return base, _aplicar(dict(consulta.order_by()), fecha, base, 'articulo_id', filtros)
+
+
+def totales_al(fecha):
+    """Como stock_al, pero con los totales por categoría: (base, {categoria: cantidad})"""
+    base = _base(fecha)
+    if base is None:
+        consulta = ArticuloDonado.objects.values('categoria').annotate(total=Sum('cantidad'))
+    else:
+        consulta = FotoStockCategoria.objects.filter(fecha=base).values('categoria').annotate(total=Sum('cantidad'))
+    totales = dict(consulta.order_by().values_list('categoria', 'total'))
+    return base, _aplicar(totales, fecha, base, 'articulo__categoria', {})
@@ -0,0 +1,233 @@
+import math
+import threading
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+from rest_framework.throttling import BaseThrottle
+
+# --------------------
+# Límites de tasa y de concurrencia
+# --------------------
+# Los endpoints públicos usan un cubo de tokens por cliente (usuario autenticado
+# o IP) y por clase de endpoint, configurado en LIMITES_TASA: cada cubo admite
+# ráfagas de 'capacidad' peticiones y se rellena a 'por_minuto'. El estado vive
+# en memoria del proceso (cada worker cuenta aparte: el límite efectivo se
+# multiplica por los workers) o, con LIMITES_TASA_BACKEND='cache', el valor por
+# defecto si hay caché compartida, en esa caché (aproximado: lectura y escritura
+# no son atómicas, pero todos los workers ven el mismo cubo). Las vistas se marcan con @limitar_tasa('clase') y
+# las acciones de DRF con una subclase de TasaThrottle.
+#
+# ConcurrenciaMiddleware rechaza con 503 y Retry-After las peticiones que
+# superan CONCURRENCIA_MAXIMA en curso en el proceso, en vez de encolarlas
+# contra la base de datos.
+
+MAX_CUBOS_MEMORIA = 10000
+
+
+class _CubosMemoria:
+    def __init__(self):
+        self._cubos = {}
+        self._lock = threading.Lock()
+
+    def consumir(self, clave, capacidad, tasa, ahora):
+        with self._lock:
+            tokens, ultimo = self._cubos.get(clave, (capacidad, ahora))
+            tokens, espera = _rellenar_y_consumir(tokens, ultimo, capacidad, tasa, ahora)
+            if len(self._cubos) >= MAX_CUBOS_MEMORIA and clave not in self._cubos:
+                self._podar(capacidad, tasa, ahora)
+            self._cubos[clave] = (tokens, ahora)
+            return espera
+
+    def _podar(self, capacidad, tasa, ahora):
+        # Un cubo que ya se habría rellenado por completo equivale a no tenerlo
+        lleno = capacidad / tasa
+        self._cubos = {c: v for c, v in self._cubos.items() if ahora - v[1] < lleno}
+
+    def limpiar(self):
+        with self._lock:
+            self._cubos.clear()
+
+
+_memoria = _CubosMemoria()
+
+
+def _rellenar_y_consumir(tokens, ultimo, capacidad, tasa, ahora):
+    """Retorna (tokens restantes, segundos de espera); espera 0 significa permitido"""
+    tokens = min(capacidad, tokens + (ahora - ultimo) * tasa)
+    if tokens >= 1:
+        return tokens - 1, 0
+    return tokens, (1 - tokens) / tasa
+
+
+def _consumir_cache(clave, capacidad, tasa, ahora):
+    clave_cache = f'tasa:{clave}'
+    tokens, ultimo = cache.get(clave_cache) or (capacidad, ahora)
+    tokens, espera = _rellenar_y_consumir(tokens, ultimo, capacidad, tasa, ahora)
+    cache.set(clave_cache, (tokens, ahora), math.ceil(capacidad / tasa))
+    return espera
+
+
+def _config(clase):
+    config = getattr(settings, 'LIMITES_TASA', {})[clase]
+    return config['capacidad'], config['por_minuto'] / 60
+
+
+def _usa_cache():
+    return getattr(settings, 'LIMITES_TASA_BACKEND', 'memoria') == 'cache'
+
+
+def consumir(clase, cliente):
+    """Consume un token del cubo (clase, cliente); retorna los segundos de espera (0 si se permite)"""
+    capacidad, tasa = _config(clase)
+    clave = f'{clase}:{cliente}'
+    ahora = time.time()
+    if _usa_cache():
+        return _consumir_cache(clave, capacidad, tasa, ahora)
+    return _memoria.consumir(clave, capacidad, tasa, ahora)
+
+
+def ip_cliente(request):
+    """IP del cliente; detrás de LIMITES_NUM_PROXIES proxies se toma de X-Forwarded-For"""
+    num_proxies = getattr(settings, 'LIMITES_NUM_PROXIES', 0)
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if num_proxies and forwarded:
+        direcciones = [d.strip() for d in forwarded.split(',')]
+        return direcciones[-min(num_proxies, len(direcciones))]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _cliente(user, request):
+    if user is not None and user.is_authenticated:
+        return f'u{user.pk}'
+    return f'ip{ip_cliente(request)}'
+
+
+def _activos():
+    return getattr(settings, 'LIMITES_TASA_ACTIVOS', True)
+
+
+def respuesta_limitada(request, espera, status=429):
+    """429 (o 503) con Retry-After; JSON para la API, texto para las páginas"""
+    mensaje = 'Demasiadas solicitudes. Intente nuevamente en unos segundos.'
+    if request.path.startswith('/api/'):
+        response = JsonResponse({'detail': mensaje}, status=status)
+    else:
+        response = HttpResponse(mensaje, status=status, content_type='text/plain; charset=utf-8')
+    response['Retry-After'] = str(max(1, math.ceil(espera)))
+    return response
+
+
+def limitar_tasa(clase, metodos=None):
+    """Limita la vista con el cubo de tokens de 'clase' (solo en 'metodos', si se indican)"""
+    def aplica(request):
+        return _activos() and (metodos is None or request.method in metodos)
+
+    def _user_cargado(request):
+        # Solo se consulta la sesión si el cliente trae cookie; los anónimos no cuestan consultas
+        if settings.SESSION_COOKIE_NAME not in request.COOKIES:
+            return None
+        return request.user
+
+    def decorador(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def wrapper_async(request, *args, **kwargs):
+                if aplica(request):
+                    user = None
+                    if settings.SESSION_COOKIE_NAME in request.COOKIES:
+                        user = await request.auser()
+                    espera = await sync_to_async(consumir)(clase, _cliente(user, request))
+                    if espera:
+                        return respuesta_limitada(request, espera)
+                return await view_func(request, *args, **kwargs)
+
+            return wrapper_async
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if aplica(request):
+                espera = consumir(clase, _cliente(_user_cargado(request), request))
+                if espera:
+                    return respuesta_limitada(request, espera)
+            return view_func(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorador
+
+
+class TasaThrottle(BaseThrottle):
+    """Throttle de DRF sobre los mismos cubos; las subclases definen 'clase'"""
+
+    clase = None
+
+    def allow_request(self, request, view):
+        if not _activos():
+            return True
+        self.espera = consumir(self.clase, _cliente(request.user, request))
+        return not self.espera
+
+    def wait(self):
+        return self.espera
+
+
+class SeguimientoThrottle(TasaThrottle):
+    clase = 'seguimiento'
+
+
+class LoginThrottle(TasaThrottle):
+    clase = 'login'
+
+
+# --------------------
+# Límite de concurrencia por proceso
+# --------------------
+class ConcurrenciaMiddleware:
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.maximo = getattr(settings, 'CONCURRENCIA_MAXIMA', 0)
+        self.reintentar = getattr(settings, 'CONCURRENCIA_RETRY_AFTER', 1)
+        self.en_curso = 0
+        self._lock = threading.Lock()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _entrar(self):
+        with self._lock:
+            if self.en_curso >= self.maximo:
+                return False
+            self.en_curso += 1
+            return True
+
+    def _salir(self):
+        with self._lock:
+            self.en_curso -= 1
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.maximo:
+            return self.get_response(request)
+        if not self._entrar():
+            return respuesta_limitada(request, self.reintentar, status=503)
+        try:
+            return self.get_response(request)
+        finally:
+            self._salir()
+
+    async def __acall__(self, request):
+        if not self.maximo:
+            return await self.get_response(request)
+        if not self._entrar():
+            return respuesta_limitada(request, self.reintentar, status=503)
+        try:
+            return await self.get_response(request)
+        finally:
+            self._salir()
@@ -0,0 +1,80 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from gestion_donaciones.models import Donacion, Trazabilidad, TrazabilidadArchivada
+
+
+class Command(BaseCommand):
+    help = (
+        "Mueve a la tabla de archivo la trazabilidad de las donaciones cerradas "
+        "(entregadas o canceladas) cuyo último registro es más antiguo que el período configurado."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=settings.TRAZABILIDAD_DIAS_ARCHIVO,
+            help="Días desde el último registro para archivar (por defecto TRAZABILIDAD_DIAS_ARCHIVO).",
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=500,
+            help="Cantidad de donaciones procesadas por transacción.",
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Solo informa cuántas donaciones se archivarían.",
+        )
+
+    def handle(self, *args, **options):
+        limite = timezone.now() - timedelta(days=options['dias'])
+        lote = options['lote']
+
+        candidatas = (
+            Donacion.objects.filter(estado__in=Donacion.ESTADOS_CERRADOS)
+            .annotate(ultimo_registro=Max('trazabilidad__fecha'))
+            .filter(ultimo_registro__lt=limite)
+            .order_by('id')
+        )
+
+        if options['dry_run']:
+            self.stdout.write(f"Donaciones a archivar: {candidatas.count()}")
+            return
+
+        total_donaciones = 0
+        total_registros = 0
+        while True:
+            # Las donaciones ya archivadas dejan de tener registros vigentes,
+            # por lo que cada iteración toma el siguiente lote pendiente.
+            ids = list(candidatas.values_list('id', flat=True)[:lote])
+            if not ids:
+                break
+
+            with transaction.atomic():
+                registros = Trazabilidad.objects.filter(donacion_id__in=ids)
+                archivados = TrazabilidadArchivada.objects.bulk_create([
+                    TrazabilidadArchivada(
+                        donacion_id=registro.donacion_id,
+                        fecha=registro.fecha,
+                        descripcion=registro.descripcion,
+                        estado=registro.estado,
+                        usuario=registro.usuario,
+                    )
+                    for registro in registros.iterator()
+                ])
+                registros.delete()
+
+            total_donaciones += len(ids)
+            total_registros += len(archivados)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Archivados {total_registros} registros de {total_donaciones} donaciones."
+        ))
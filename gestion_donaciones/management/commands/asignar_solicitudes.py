@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from gestion_donaciones.asignacion import LOTE, RESPONSABLE, asignar
+
+
+class Command(BaseCommand):
+    help = (
+        "Reparte el stock disponible entre las solicitudes pendientes, por prioridad y "
+        "antigüedad, y crea una entrega en estado Pendiente (borrador) por cada solicitud "
+        "atendida. Con --simular solo informa lo que se asignaría."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--simular', action='store_true', help="Calcula la asignación sin guardar nada.")
+        parser.add_argument('--responsable', default=RESPONSABLE, help="Responsable de las entregas creadas.")
+        parser.add_argument('--lote', type=int, default=LOTE, help="Entregas creadas por lote.")
+        parser.add_argument(
+            '--mostrar', type=int, default=50, help="Cantidad máxima de solicitudes listadas (0 para ninguna)."
+        )
+
+    def handle(self, *args, **options):
+        if options['lote'] <= 0:
+            raise CommandError("--lote debe ser mayor que cero.")
+        if not options['responsable'].strip():
+            raise CommandError("--responsable no puede quedar vacío.")
+
+        asignaciones = asignar(
+            responsable=options['responsable'].strip(),
+            simular=options['simular'],
+            lote=options['lote'],
+        )
+        if not asignaciones:
+            self.stdout.write("No hay stock disponible para las solicitudes pendientes.")
+            return
+
+        for asignacion in asignaciones[:options['mostrar']]:
+            lineas = ", ".join(f"#{a}: {c}" for a, c in asignacion.lineas.items())
+            estado = "completa" if asignacion.completa else "parcial"
+            self.stdout.write(f"  Solicitud #{asignacion.solicitud_id} ({estado}): {lineas}")
+
+        completas = sum(1 for a in asignaciones if a.completa)
+        unidades = sum(sum(a.lineas.values()) for a in asignaciones)
+        resumen = (
+            f"{len(asignaciones)} solicitudes atendidas ({completas} completas), {unidades} unidades asignadas"
+        )
+        if options['simular']:
+            self.stdout.write(f"{resumen} (simulación, no se guardó nada).")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{resumen}; {len(asignaciones)} entregas borrador creadas."))
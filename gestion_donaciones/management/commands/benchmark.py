@@ -0,0 +1,226 @@
+import gzip
+import json
+import math
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from gestion_donaciones import filtro_uuid
+from gestion_donaciones.api_views import DonacionViewSet
+from gestion_donaciones.datos_sinteticos import escala, generar
+from gestion_donaciones.models import ArticuloDonado, Donacion
+from gestion_donaciones.renderers import JSONRapidoRenderer, orjson
+from gestion_donaciones.rut import formatear
+from gestion_donaciones.serializers import DonacionSerializer
+from gestion_donaciones.sql_metricas import RegistroConsultas
+
+
+def percentil(valores, p):
+    """Percentil por rango más cercano"""
+    ordenados = sorted(valores)
+    indice = max(0, math.ceil(p / 100 * len(ordenados)) - 1)
+    return ordenados[indice]
+
+
+# --------------------
+# Casos medidos: cada uno recibe el cliente y el contexto de la escala
+# --------------------
+def _registrar_donacion(client, ctx):
+    ctx['contador'] += 1
+    nombres = ctx['rnd'].sample(ctx['nombres_articulos'], 3)
+    return client.post('/donaciones/registrar/', {
+        'tipo_donante': 'INDIVIDUAL',
+        'rut_donante': formatear(5_000_000 + ctx['contador']),
+        'nombre_donante': 'Benchmark',
+        'articulo[]': nombres,
+        'categoria[]': ['OTROS'] * 3,
+        'unidad_medida[]': ['UNIDAD'] * 3,
+        'descripcion_articulo[]': [''] * 3,
+        'cantidad_donada[]': ['5'] * 3,
+        'fecha_vencimiento[]': [''] * 3,
+    })
+
+
+def _registrar_entrega(client, ctx):
+    ctx['contador'] += 1
+    articulos = ctx['rnd'].sample(ctx['articulos_con_stock'], 2)
+    return client.post('/entregas/registrar/', {
+        'rut_beneficiario': formatear(4_000_000 + ctx['contador']),
+        'nombre_beneficiario': 'Benchmark',
+        'direccion_beneficiario': 'Calle 1',
+        'nombre_responsable': 'Benchmark',
+        'articulo[]': [str(a) for a in articulos],
+        'cantidad[]': ['1', '1'],
+    })
+
+
+def _get(url):
+    return lambda client, ctx: client.get(url)
+
+
+def _seguimiento(prefijo):
+    return lambda client, ctx: client.get(f"{prefijo}{ctx['rnd'].choice(ctx['uuids'])}/")
+
+
+# --------------------
+# Serialización: página de donaciones de la API, separando el armado de los
+# datos (serializers) del render a JSON (DRF estándar vs renderer rápido)
+# --------------------
+TAMANO_PAGINA_SERIALIZACION = 1000
+
+
+def _cronometrar(funcion, repeticiones):
+    tiempos = []
+    resultado = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return resultado, {'p50_ms': round(percentil(tiempos, 50), 2), 'p95_ms': round(percentil(tiempos, 95), 2)}
+
+
+def medir_serializacion(repeticiones):
+    donaciones = list(DonacionViewSet.queryset[:TAMANO_PAGINA_SERIALIZACION])
+    datos, serializar = _cronometrar(lambda: DonacionSerializer(donaciones, many=True).data, repeticiones)
+    contenido, render_drf = _cronometrar(lambda: JSONRenderer().render(datos), repeticiones)
+    _, render_rapido = _cronometrar(lambda: JSONRapidoRenderer().render(datos), repeticiones)
+    return {
+        'donaciones': len(donaciones),
+        'serializar': serializar,
+        'render_drf': render_drf,
+        'render_rapido': render_rapido,
+        'render_rapido_backend': 'orjson' if orjson is not None else 'json',
+        'bytes': len(contenido),
+        'bytes_gzip': len(gzip.compress(contenido)),
+    }
+
+
+CASOS = {
+    'registrar_donacion': _registrar_donacion,
+    'registrar_entrega': _registrar_entrega,
+    'ver_stock': _get('/stock/'),
+    'listar_entregas': _get('/entregas/listar/'),
+    'api_donaciones': _get('/api/donaciones/'),
+    'api_entregas': _get('/api/entregas/'),
+    'api_articulos': _get('/api/articulos/'),
+    'seguimiento_publico': _seguimiento('/seguimiento/'),
+    'api_seguimiento_publico': _seguimiento('/api/seguimiento/'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide latencia (p50/p95) y cantidad de consultas de las vistas críticas sobre "
+        "datos sintéticos en una base SQLite de prueba, y guarda el resultado en JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escalas', default='1000',
+                            help="Donaciones por escala, separadas por coma (ej. 1000,100000,1000000).")
+        parser.add_argument('--repeticiones', type=int, default=20)
+        parser.add_argument('--casos', default=','.join(CASOS),
+                            help=f"Casos a medir, separados por coma. Disponibles: {', '.join(CASOS)}")
+        parser.add_argument('--salida', default='benchmark.json', help="Archivo JSON de resultados.")
+        parser.add_argument('--semilla', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("El benchmark se ejecuta sobre SQLite local (DB_SQLITE=true).")
+
+        casos = [c.strip() for c in options['casos'].split(',') if c.strip()]
+        desconocidos = set(casos) - set(CASOS)
+        if desconocidos:
+            raise CommandError(f"Casos desconocidos: {', '.join(sorted(desconocidos))}")
+        escalas = [int(e) for e in options['escalas'].split(',')]
+
+        # Base de prueba separada: nunca se tocan los datos reales
+        nombre_original = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            resultados = self.medir(escalas, casos, options)
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+
+        with open(options['salida'], 'w', encoding='utf-8') as archivo:
+            json.dump(resultados, archivo, indent=2, ensure_ascii=False)
+        self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['salida']}"))
+
+    def medir(self, escalas, casos, options):
+        """Mide los casos en cada escala sobre la base actual (la vacía antes de cada una)"""
+        resultados = {
+            'fecha': timezone.now().isoformat(),
+            'repeticiones': options['repeticiones'],
+            'escalas': {},
+        }
+        # Un solo cliente hace todas las repeticiones: con los límites de tasa y
+        # concurrencia activos el seguimiento respondería 429 tras la ráfaga
+        with override_settings(LIMITES_TASA_ACTIVOS=False, CONCURRENCIA_MAXIMA=0):
+            for donaciones in escalas:
+                resultados['escalas'][str(donaciones)] = self._medir_escala(donaciones, casos, options)
+        return resultados
+
+    def _medir_escala(self, donaciones, casos, options):
+        self.stdout.write(f"Escala {donaciones} donaciones: generando datos...")
+        call_command('flush', interactive=False, verbosity=0)
+        filas = generar(**escala(donaciones), semilla=options['semilla'])
+        # Como wsgi.py / asgi.py: el filtro de UUIDs se construye antes de atender
+        filtro_uuid.construir()
+
+        usuario = User.objects.create_superuser('benchmark', 'benchmark@example.com', 'benchmark')
+        client = Client()
+        client.force_login(usuario)
+
+        rnd = random.Random(options['semilla'])
+        ctx = {
+            'rnd': rnd,
+            'contador': 0,
+            'nombres_articulos': list(ArticuloDonado.objects.values_list('nombreObjeto', flat=True)[:500]),
+            'articulos_con_stock': list(
+                ArticuloDonado.objects.filter(cantidad__gt=options['repeticiones'] * 2)
+                .values_list('id', flat=True)[:500]
+            ),
+            'uuids': [str(u) for u in Donacion.objects.values_list('uuid_seguimiento', flat=True)[:1000]],
+        }
+
+        medidos = {}
+        for nombre in casos:
+            tiempos = []
+            consultas = []
+            for _ in range(options['repeticiones']):
+                registro = RegistroConsultas()
+                with connection.execute_wrapper(registro):
+                    inicio = time.perf_counter()
+                    response = CASOS[nombre](client, ctx)
+                    tiempos.append((time.perf_counter() - inicio) * 1000)
+                if response.status_code >= 400:
+                    raise CommandError(f"{nombre} respondió {response.status_code}")
+                consultas.append(registro.cantidad)
+
+            medidos[nombre] = {
+                'p50_ms': round(percentil(tiempos, 50), 2),
+                'p95_ms': round(percentil(tiempos, 95), 2),
+                'consultas_promedio': round(sum(consultas) / len(consultas), 1),
+                'consultas_max': max(consultas),
+            }
+            m = medidos[nombre]
+            self.stdout.write(
+                f"  {nombre:<25} p50={m['p50_ms']:>9.2f}ms  p95={m['p95_ms']:>9.2f}ms  "
+                f"consultas={m['consultas_promedio']}"
+            )
+
+        serializacion = medir_serializacion(options['repeticiones'])
+        self.stdout.write(
+            f"  serialización de {serializacion['donaciones']} donaciones: "
+            f"serializers p50={serializacion['serializar']['p50_ms']}ms  "
+            f"render DRF p50={serializacion['render_drf']['p50_ms']}ms  "
+            f"render {serializacion['render_rapido_backend']} p50={serializacion['render_rapido']['p50_ms']}ms  "
+            f"{serializacion['bytes']} bytes ({serializacion['bytes_gzip']} con gzip)"
+        )
+        return {'filas': filas, 'casos': medidos, 'serializacion': serializacion}
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from gestion_donaciones.conciliacion import LOTE, buscar_diferencias, reparar
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el stock de cada artículo con lo donado menos lo entregado según los detalles "
+        "e informa las diferencias. Con --reparar corrige el stock y registra un AjusteStock "
+        "por artículo. Pensado para ejecutarse cada noche."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reparar', action='store_true', help="Corrige las diferencias encontradas.")
+        parser.add_argument('--lote', type=int, default=LOTE, help="Artículos leídos y corregidos por lote.")
+        parser.add_argument(
+            '--mostrar', type=int, default=50, help="Cantidad máxima de diferencias listadas (0 para ninguna)."
+        )
+
+    def handle(self, *args, **options):
+        if options['lote'] <= 0:
+            raise CommandError("--lote debe ser mayor que cero.")
+
+        diferencias = []
+        for diferencia in buscar_diferencias(options['lote']):
+            if len(diferencias) < options['mostrar']:
+                self.stdout.write(
+                    f"  #{diferencia.id} {diferencia.nombre}: stock {diferencia.actual}, "
+                    f"esperado {diferencia.esperado}"
+                )
+            diferencias.append(diferencia)
+
+        if not diferencias:
+            self.stdout.write(self.style.SUCCESS("El stock coincide con donaciones y entregas."))
+            return
+
+        desvio = sum(abs(max(d.esperado, 0) - d.actual) for d in diferencias)
+        self.stdout.write(f"{len(diferencias)} artículos con diferencias (desvío total {desvio})")
+        if not options['reparar']:
+            return
+
+        corregidos = reparar(diferencias, usuario='conciliar_stock', lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f"{corregidos} artículos corregidos."))
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from gestion_donaciones.duplicados import MAX_BLOQUE, buscar_duplicados, fusionar
+from gestion_donaciones.models import Beneficiario, Donante
+
+MODELOS = {'donantes': Donante, 'beneficiarios': Beneficiario}
+
+
+class Command(BaseCommand):
+    help = (
+        "Busca donantes y beneficiarios duplicados (RUT, nombre fonético y email) y "
+        "propone fusionarlos; con --ejecutar reasigna sus donaciones / entregas y elimina los duplicados."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'modelos',
+            nargs='*',
+            help="Modelos a revisar: donantes, beneficiarios (por defecto ambos).",
+        )
+        parser.add_argument(
+            '--ejecutar',
+            action='store_true',
+            help="Ejecuta las fusiones propuestas (por defecto solo se listan).",
+        )
+        parser.add_argument(
+            '--max-bloque',
+            type=int,
+            default=MAX_BLOQUE,
+            help="Bloques con más registros que este valor se ignoran (nombres muy comunes).",
+        )
+
+    def handle(self, *args, **options):
+        desconocidos = set(options['modelos']) - set(MODELOS)
+        if desconocidos:
+            raise CommandError(f"Modelos desconocidos: {', '.join(sorted(desconocidos))}")
+
+        for nombre in options['modelos'] or list(MODELOS):
+            modelo = MODELOS[nombre]
+            grupos = buscar_duplicados(modelo, options['max_bloque'])
+            self.stdout.write(f"{nombre}: {len(grupos)} grupos de duplicados")
+            for conservado, duplicados, filas in grupos:
+                detalle = "; ".join(f"#{f['id']} {f['rut']} {f['nombre']} {f['email'] or ''}".strip() for f in filas)
+                self.stdout.write(f"  #{conservado} <- {duplicados}: {detalle}")
+
+            if options['ejecutar'] and grupos:
+                eliminados = fusionar(modelo, grupos)
+                self.stdout.write(self.style.SUCCESS(f"{nombre}: {eliminados} duplicados fusionados"))
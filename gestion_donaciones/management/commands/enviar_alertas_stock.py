@@ -0,0 +1,74 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.html import escape
+
+from gestion_donaciones.emails import enviar_correo_brevo
+from gestion_donaciones.models import AlertaStock
+from gestion_donaciones.roles import GRUPO_ADMINAPP
+
+
+def _destinatarios():
+    if settings.STOCK_ALERTAS_DESTINATARIOS:
+        return list(settings.STOCK_ALERTAS_DESTINATARIOS)
+    return sorted(set(
+        User.objects.filter(Q(is_superuser=True) | Q(groups__name=GRUPO_ADMINAPP), is_active=True)
+        .exclude(email='')
+        .values_list('email', flat=True)
+    ))
+
+
+class Command(BaseCommand):
+    help = (
+        "Envía en un solo correo las alertas de stock bajo pendientes de notificar. "
+        "Las alertas que se cerraron antes del envío se marcan sin enviarse."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Solo lista las alertas pendientes.")
+
+    def handle(self, *args, **options):
+        pendientes = list(
+            AlertaStock.objects.filter(notificada__isnull=True).select_related('articulo').order_by('articulo__nombreObjeto')
+        )
+        abiertas = [a for a in pendientes if a.resuelta is None]
+        for alerta in abiertas:
+            self.stdout.write(f"  {alerta.articulo.nombreObjeto}: {alerta.cantidad} (mínimo {alerta.minimo})")
+        if options['dry_run'] or not pendientes:
+            self.stdout.write(f"{len(abiertas)} alertas pendientes")
+            return
+
+        destinatarios = _destinatarios()
+        if abiertas and not destinatarios:
+            self.stderr.write("No hay destinatarios (STOCK_ALERTAS_DESTINATARIOS); las alertas siguen pendientes.")
+            return
+        if abiertas:
+            filas = ''.join(
+                f"<li><b>{escape(a.articulo.nombreObjeto)}</b>: {a.cantidad} "
+                f"{escape(a.articulo.get_unidad_medida_display().lower())} (mínimo {a.minimo})</li>"
+                for a in abiertas
+            )
+            mensaje_html = f"""
+            <h2>Artículos con stock bajo</h2>
+            <ul>{filas}</ul>
+            <p><b>Equipo DonaGest</b></p>
+            """
+            enviados = [
+                enviar_correo_brevo(
+                    destinatario=destinatario,
+                    asunto=f"Stock bajo en {len(abiertas)} artículo(s) - DonaGest",
+                    mensaje_html=mensaje_html,
+                )
+                for destinatario in destinatarios
+            ]
+            if not any(enviados):
+                # Quedan en cola para el próximo intento
+                self.stderr.write("No se pudo enviar ningún correo; las alertas siguen pendientes.")
+                return
+
+        AlertaStock.objects.filter(id__in=[a.id for a in pendientes]).update(notificada=timezone.now())
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(abiertas)} alertas notificadas a {len(destinatarios)} destinatario(s)."
+        ))
@@ -0,0 +1,36 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from gestion_donaciones.historico import tomar_foto
+
+
+class Command(BaseCommand):
+    help = (
+        "Guarda la foto diaria del stock (por artículo y por categoría) al cierre de un día, "
+        "por defecto ayer. Programar una vez al día; volver a ejecutarlo reemplaza la foto del día."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fecha', help="Día de la foto (AAAA-MM-DD). Por defecto ayer.")
+        parser.add_argument(
+            '--dias', type=int, default=1, help="Cantidad de días hacia atrás desde --fecha (para completar fotos)."
+        )
+
+    def handle(self, *args, **options):
+        hoy = timezone.localdate()
+        try:
+            fecha = date.fromisoformat(options['fecha']) if options['fecha'] else hoy - timedelta(days=1)
+        except ValueError:
+            raise CommandError("--fecha debe tener el formato AAAA-MM-DD.")
+        if fecha >= hoy:
+            raise CommandError("Solo se pueden fotografiar días ya cerrados.")
+        if options['dias'] <= 0:
+            raise CommandError("--dias debe ser mayor que cero.")
+
+        for atras in range(options['dias']):
+            dia = fecha - timedelta(days=atras)
+            filas = tomar_foto(dia)
+            self.stdout.write(f"  {dia}: {filas} artículos")
+        self.stdout.write(self.style.SUCCESS(f"{options['dias']} foto(s) de stock guardadas."))
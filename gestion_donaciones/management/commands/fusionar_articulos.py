@@ -0,0 +1,57 @@
+import re
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from gestion_donaciones.catalogo import fusionar_articulos
+from gestion_donaciones.models import ArticuloDonado
+
+
+def _clave_singular(clave):
+    """'fideos largos' ~ 'fideo largo': variantes que la clave exacta no une"""
+    return ' '.join(re.sub(r'(?<=[a-z])e?s$', '', palabra) for palabra in clave.split())
+
+
+class Command(BaseCommand):
+    help = (
+        "Fusiona artículos duplicados: suma su stock y reasigna sus detalles de donación y entrega "
+        "al artículo destino. Sin argumentos lista posibles duplicados (singular / plural, misma unidad)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('destino', nargs='?', type=int, help="Id del artículo que se conserva.")
+        parser.add_argument('origenes', nargs='*', type=int, help="Ids de los artículos que se fusionan en el destino.")
+
+    def handle(self, *args, **options):
+        if options['destino'] is None:
+            self._sugerir()
+            return
+        if not options['origenes']:
+            raise CommandError("Indique al menos un artículo a fusionar en el destino.")
+
+        ids = [options['destino'], *options['origenes']]
+        articulos = ArticuloDonado.objects.in_bulk(ids)
+        faltantes = [str(i) for i in ids if i not in articulos]
+        if faltantes:
+            raise CommandError(f"Artículos inexistentes: {', '.join(faltantes)}")
+        unidades = {a.unidad_medida for a in articulos.values()}
+        if len(unidades) > 1:
+            raise CommandError(f"Los artículos tienen distintas unidades de medida: {', '.join(sorted(unidades))}")
+
+        fusionados = fusionar_articulos(ArticuloDonado, options['destino'], options['origenes'])
+        destino = ArticuloDonado.objects.get(id=options['destino'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{fusionados} artículos fusionados en #{destino.id} {destino.nombreObjeto} (stock {destino.cantidad})"
+        ))
+
+    def _sugerir(self):
+        grupos = defaultdict(list)
+        for articulo in ArticuloDonado.objects.order_by('id').only('id', 'nombreObjeto', 'clave', 'unidad_medida', 'cantidad'):
+            grupos[(_clave_singular(articulo.clave), articulo.unidad_medida)].append(articulo)
+
+        sugeridos = [articulos for articulos in grupos.values() if len(articulos) > 1]
+        for articulos in sugeridos:
+            ids = ' '.join(str(a.id) for a in articulos)
+            nombres = ', '.join(f"#{a.id} {a.nombreObjeto} ({a.cantidad})" for a in articulos)
+            self.stdout.write(f"  {nombres}  ->  manage.py fusionar_articulos {ids}")
+        self.stdout.write(f"{len(sugeridos)} posibles grupos de duplicados")
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from gestion_donaciones.datos_sinteticos import escala, generar
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera datos sintéticos (donantes, beneficiarios, artículos, donaciones, "
+        "entregas y trazabilidad) usando inserciones masivas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--donaciones', type=int, default=1000,
+                            help="Cantidad de donaciones; el resto se calcula en proporción.")
+        parser.add_argument('--donantes', type=int)
+        parser.add_argument('--beneficiarios', type=int)
+        parser.add_argument('--articulos', type=int)
+        parser.add_argument('--detalles-por-donacion', type=int)
+        parser.add_argument('--entregas', type=int)
+        parser.add_argument('--detalles-por-entrega', type=int)
+        parser.add_argument('--trazabilidad-por-donacion', type=int)
+        parser.add_argument('--lote', type=int, default=5000, help="Filas por inserción masiva.")
+        parser.add_argument('--semilla', type=int, help="Semilla para obtener datos reproducibles.")
+
+    def handle(self, *args, **options):
+        cantidades = escala(options['donaciones'])
+        for clave in cantidades:
+            if options.get(clave) is not None:
+                cantidades[clave] = options[clave]
+
+        creados = generar(
+            **cantidades,
+            lote=options['lote'],
+            semilla=options['semilla'],
+            log=lambda mensaje: self.stdout.write(f"  {mensaje}"),
+        )
+
+        resumen = ", ".join(f"{modelo}: {n}" for modelo, n in creados.items())
+        self.stdout.write(self.style.SUCCESS(f"Datos generados - {resumen}"))
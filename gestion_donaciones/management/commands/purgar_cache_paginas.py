@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from gestion_donaciones.cache_paginas import purgar_paginas
+
+
+class Command(BaseCommand):
+    help = "Invalida la caché de páginas públicas (por ejemplo, tras desplegar cambios en las plantillas)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paginas',
+            nargs='*',
+            help="Páginas a purgar (por defecto todas las de CACHE_PAGINAS_TTL).",
+        )
+
+    def handle(self, *args, **options):
+        configuradas = list(getattr(settings, 'CACHE_PAGINAS_TTL', {}))
+        paginas = options['paginas'] or configuradas
+        desconocidas = set(paginas) - set(configuradas)
+        if desconocidas:
+            raise CommandError(f"Páginas desconocidas: {', '.join(sorted(desconocidas))}")
+
+        for nombre in paginas:
+            purgar_paginas(nombre)
+        self.stdout.write(self.style.SUCCESS(f"Caché purgada: {', '.join(paginas)}"))
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_donaciones', '0007_alter_trazabilidad_usuario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrazabilidadArchivada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField()),
+                ('descripcion', models.TextField()),
+                ('estado', models.CharField(max_length=50)),
+                ('usuario', models.CharField(blank=True, max_length=100, null=True)),
+                ('fecha_archivo', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Registro de Trazabilidad Archivado',
+                'verbose_name_plural': 'Registros de Trazabilidad Archivados',
+                'ordering': ['fecha'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='trazabilidad',
+            index=models.Index(fields=['donacion', 'fecha'], name='gestion_don_donacio_51378f_idx'),
+        ),
+        migrations.AddField(
+            model_name='trazabilidadarchivada',
+            name='donacion',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trazabilidad_archivada', to='gestion_donaciones.donacion'),
+        ),
+        migrations.AddIndex(
+            model_name='trazabilidadarchivada',
+            index=models.Index(fields=['donacion', 'fecha'], name='gestion_don_donacio_10a7f9_idx'),
+        ),
+    ]
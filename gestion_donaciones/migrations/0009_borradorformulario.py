@@ -0,0 +1,26 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_donaciones', '0008_trazabilidad_archivo_indices'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BorradorFormulario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=150, unique=True)),
+                ('datos', models.JSONField(default=dict)),
+                ('expira', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Borrador de Formulario',
+                'verbose_name_plural': 'Borradores de Formularios',
+            },
+        ),
+    ]
@@ -0,0 +1,99 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:22
+
+import gestion_donaciones.campos
+import uuid
+from django.db import migrations
+
+# En MySQL uuid_seguimiento pasa de char(32) a binary(16). Un ALTER directo
+# truncaría el texto hexadecimal, así que se agrega una columna binaria, se
+# llena por lotes de ids con UNHEX() y se reemplaza la original. En SQLite y
+# PostgreSQL el tipo de la columna no cambia y solo se actualiza el estado.
+# Los inserts de la versión anterior durante la copia quedan con la columna
+# nueva en NULL: con la tabla bloqueada se completan, se verifica que no quede
+# ninguno y recién entonces se reemplaza la columna, en un solo ALTER (si falla,
+# la original sigue intacta). El release del Procfile ejecuta migrate antes de
+# levantar la versión nueva.
+
+LOTE = 10000
+MODELOS = ['donacion', 'entrega']
+
+
+def _convertir_columna(apps, schema_editor, tipo, expresion):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    quote = schema_editor.quote_name
+    columna = quote('uuid_seguimiento')
+    temporal = quote('uuid_seguimiento_nuevo')
+    with schema_editor.connection.cursor() as cursor:
+        for nombre in MODELOS:
+            tabla = quote(apps.get_model('gestion_donaciones', nombre)._meta.db_table)
+            cursor.execute(f"ALTER TABLE {tabla} ADD COLUMN {temporal} {tipo} NULL")
+            cursor.execute(f"SELECT COALESCE(MIN(id), 0), COALESCE(MAX(id), 0) FROM {tabla}")
+            desde, hasta = cursor.fetchone()
+            for inicio in range(desde, hasta + 1, LOTE):
+                cursor.execute(
+                    f"UPDATE {tabla} SET {temporal} = {expresion.format(columna)} WHERE id >= %s AND id < %s",
+                    [inicio, inicio + LOTE],
+                )
+
+            cursor.execute(f"LOCK TABLES {tabla} WRITE")
+            try:
+                # Filas insertadas después de leer MAX(id)
+                cursor.execute(
+                    f"UPDATE {tabla} SET {temporal} = {expresion.format(columna)} WHERE {temporal} IS NULL"
+                )
+                cursor.execute(f"SELECT COUNT(*) FROM {tabla} WHERE {temporal} IS NULL")
+                (sin_copiar,) = cursor.fetchone()
+                if sin_copiar:
+                    raise RuntimeError(
+                        f"{tabla}: {sin_copiar} filas sin {temporal}; la columna original no se eliminó"
+                    )
+                # Al eliminar la columna MySQL elimina también sus índices (el único y el redundante)
+                cursor.execute(
+                    f"ALTER TABLE {tabla} DROP COLUMN {columna}, "
+                    f"CHANGE {temporal} {columna} {tipo} NOT NULL, ADD UNIQUE ({columna})"
+                )
+            finally:
+                cursor.execute("UNLOCK TABLES")
+
+
+def a_binario(apps, schema_editor):
+    _convertir_columna(apps, schema_editor, 'binary(16)', 'UNHEX({})')
+
+
+def a_texto(apps, schema_editor):
+    _convertir_columna(apps, schema_editor, 'char(32)', 'LOWER(HEX({}))')
+
+
+class Migration(migrations.Migration):
+
+    # Cada lote se confirma por separado
+    atomic = False
+
+    dependencies = [
+        ('gestion_donaciones', '0009_borradorformulario'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='donacion',
+            name='gestion_don_uuid_se_e72ff8_idx',
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(a_binario, a_texto),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='donacion',
+                    name='uuid_seguimiento',
+                    field=gestion_donaciones.campos.UUIDBinarioField(default=uuid.uuid4, editable=False, unique=True),
+                ),
+                migrations.AlterField(
+                    model_name='entrega',
+                    name='uuid_seguimiento',
+                    field=gestion_donaciones.campos.UUIDBinarioField(default=uuid.uuid4, editable=False, unique=True),
+                ),
+            ],
+        ),
+    ]
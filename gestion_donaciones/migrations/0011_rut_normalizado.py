@@ -0,0 +1,116 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:24
+
+import re
+
+import gestion_donaciones.rut
+from django.db import migrations, models
+
+# Normaliza los RUT existentes de donantes y beneficiarios: calcula cuerpo y
+# dígito verificador, deja el texto en forma canónica y fusiona los registros
+# que resultan ser la misma persona ("12.345.678-9" y "12345678-9"). Se
+# conserva el registro más antiguo y sus relaciones (donaciones, entregas) se
+# reasignan antes de eliminar los duplicados. Los RUT ilegibles quedan con
+# rut_cuerpo NULL. Al final se crea el índice único sobre rut_cuerpo.
+#
+# El análisis del RUT es una copia congelada de gestion_donaciones.rut: la
+# migración no debe cambiar de comportamiento si ese módulo cambia.
+
+LOTE = 2000
+_RE_RUT = re.compile(r'^(\d{1,9})([\dK])$')
+
+
+def _descomponer(texto):
+    """(cuerpo, dv) sin validar el dígito verificador; None si el formato es inválido"""
+    limpio = re.sub(r'[\s.\-]', '', str(texto or '')).upper()
+    coincidencia = _RE_RUT.match(limpio)
+    if not coincidencia or not int(coincidencia.group(1)):
+        return None
+    return int(coincidencia.group(1)), coincidencia.group(2)
+
+
+def _normalizar(Modelo):
+    por_cuerpo = {}
+    filas = Modelo.objects.order_by('id').values_list('id', 'rut').iterator(chunk_size=LOTE)
+    for id_, rut in filas:
+        partes = _descomponer(rut)
+        if partes is None:
+            continue
+        cuerpo, dv = partes
+        por_cuerpo.setdefault(cuerpo, (dv, []))[1].append(id_)
+
+    # Fusionar duplicados: las relaciones pasan al registro más antiguo
+    relaciones = [
+        rel for rel in Modelo._meta.related_objects
+        if rel.field.concrete and not rel.many_to_many
+    ]
+    for cuerpo, (dv, ids) in por_cuerpo.items():
+        if len(ids) < 2:
+            continue
+        conservado, duplicados = ids[0], ids[1:]
+        for rel in relaciones:
+            rel.related_model.objects.filter(**{f'{rel.field.name}__in': duplicados}).update(
+                **{rel.field.name: conservado}
+            )
+        Modelo.objects.filter(id__in=duplicados).delete()
+
+    pendientes = [
+        Modelo(id=ids[0], rut=f"{cuerpo}-{dv}", rut_cuerpo=cuerpo, rut_dv=dv)
+        for cuerpo, (dv, ids) in por_cuerpo.items()
+    ]
+    Modelo.objects.bulk_update(pendientes, ['rut', 'rut_cuerpo', 'rut_dv'], batch_size=LOTE)
+
+
+def normalizar_ruts(apps, schema_editor):
+    for nombre in ('Donante', 'Beneficiario'):
+        _normalizar(apps.get_model('gestion_donaciones', nombre))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_donaciones', '0010_uuid_seguimiento_binario'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='beneficiario',
+            name='rut_cuerpo',
+            field=models.PositiveIntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='beneficiario',
+            name='rut_dv',
+            field=models.CharField(blank=True, default='', editable=False, max_length=1),
+        ),
+        migrations.AddField(
+            model_name='donante',
+            name='rut_cuerpo',
+            field=models.PositiveIntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='donante',
+            name='rut_dv',
+            field=models.CharField(blank=True, default='', editable=False, max_length=1),
+        ),
+        migrations.AlterField(
+            model_name='beneficiario',
+            name='rut',
+            field=models.CharField(max_length=12, validators=[gestion_donaciones.rut.validar_rut]),
+        ),
+        migrations.AlterField(
+            model_name='donante',
+            name='rut',
+            field=models.CharField(max_length=12, validators=[gestion_donaciones.rut.validar_rut]),
+        ),
+        migrations.RunPython(normalizar_ruts, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='beneficiario',
+            name='rut_cuerpo',
+            field=models.PositiveIntegerField(editable=False, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='donante',
+            name='rut_cuerpo',
+            field=models.PositiveIntegerField(editable=False, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,132 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:41
+
+import re
+import unicodedata
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import F, Sum
+
+# Calcula la clave normalizada de los artículos existentes y resuelve los que
+# comparten clave ("Arroz", "arroz ", "ARROZ"): los de la misma unidad de
+# medida se fusionan en el más antiguo (stock y detalles incluidos); los de
+# otra unidad no se suman, se renombran como "Nombre (UNIDAD)". Al final se
+# crea el índice único sobre la clave.
+#
+# La clave y la fusión son copias congeladas de gestion_donaciones.catalogo:
+# la migración no debe cambiar de comportamiento si esas funciones cambian.
+
+LOTE = 2000
+
+
+def clave_articulo(nombre):
+    """'  Azúcar   Rubia ' -> 'azucar rubia'"""
+    texto = unicodedata.normalize('NFKD', nombre or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return re.sub(r'\s+', ' ', texto).strip().casefold()
+
+
+def fusionar_articulos(Articulo, conservado, duplicados):
+    """
+    Suma el stock de los 'duplicados' a 'conservado', reasigna sus detalles de
+    donación / entrega (sumando cantidades cuando la misma donación o entrega
+    ya tiene el artículo conservado) y los elimina.
+    """
+    duplicados = [d for d in duplicados if d != conservado]
+    if not duplicados:
+        return
+
+    stock = Articulo.objects.filter(id__in=duplicados).aggregate(total=Sum('cantidad'))['total'] or 0
+    for rel in Articulo._meta.related_objects:
+        if not rel.field.concrete or rel.many_to_many:
+            continue
+        Detalle, campo = rel.related_model, rel.field.attname
+        padres = [
+            next(c for c in unicos if c != rel.field.name)
+            for unicos in Detalle._meta.unique_together
+            if rel.field.name in unicos and len(unicos) == 2
+        ]
+        if not padres:
+            Detalle.objects.filter(**{f'{campo}__in': duplicados}).update(**{campo: conservado})
+            continue
+
+        padre = Detalle._meta.get_field(padres[0]).attname
+        existentes = dict(Detalle.objects.filter(**{campo: conservado}).values_list(padre, 'id'))
+        reasignar, eliminar = [], []
+        for detalle in Detalle.objects.filter(**{f'{campo}__in': duplicados}).values('id', padre, 'cantidad'):
+            destino = existentes.get(detalle[padre])
+            if destino is None:
+                existentes[detalle[padre]] = detalle['id']
+                reasignar.append(detalle['id'])
+            else:
+                Detalle.objects.filter(id=destino).update(cantidad=F('cantidad') + detalle['cantidad'])
+                eliminar.append(detalle['id'])
+        Detalle.objects.filter(id__in=reasignar).update(**{campo: conservado})
+        Detalle.objects.filter(id__in=eliminar).delete()
+
+    Articulo.objects.filter(id=conservado).update(cantidad=F('cantidad') + stock)
+    Articulo.objects.filter(id__in=duplicados).delete()
+
+
+def calcular_claves(apps, schema_editor):
+    ArticuloDonado = apps.get_model('gestion_donaciones', 'ArticuloDonado')
+
+    grupos = defaultdict(list)
+    filas = ArticuloDonado.objects.order_by('id').values_list('id', 'nombreObjeto', 'unidad_medida')
+    for id_, nombre, unidad in filas.iterator(chunk_size=LOTE):
+        grupos[clave_articulo(nombre)].append((id_, nombre, unidad))
+
+    usadas = set(grupos)
+    claves = {}
+    renombrados = {}
+    for clave, articulos in grupos.items():
+        por_unidad = defaultdict(list)
+        for id_, nombre, unidad in articulos:
+            por_unidad[unidad].append((id_, nombre))
+
+        principal_unidad = articulos[0][2]
+        for unidad, mismos in por_unidad.items():
+            conservado, nombre = mismos[0]
+            fusionar_articulos(ArticuloDonado, conservado, [id_ for id_, _ in mismos[1:]])
+            if unidad == principal_unidad:
+                claves[conservado] = clave
+                continue
+            nombre = f"{nombre} ({unidad})"[:100]
+            while clave_articulo(nombre) in usadas:
+                nombre = f"{nombre[:90]} #{conservado}"
+            usadas.add(clave_articulo(nombre))
+            claves[conservado] = clave_articulo(nombre)
+            renombrados[conservado] = nombre
+
+    pendientes = [
+        ArticuloDonado(id=id_, clave=clave, nombreObjeto=renombrados.get(id_, ''))
+        for id_, clave in claves.items()
+    ]
+    ArticuloDonado.objects.bulk_update(
+        [a for a in pendientes if a.id not in renombrados], ['clave'], batch_size=LOTE
+    )
+    ArticuloDonado.objects.bulk_update(
+        [a for a in pendientes if a.id in renombrados], ['clave', 'nombreObjeto'], batch_size=LOTE
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_donaciones', '0011_rut_normalizado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='articulodonado',
+            name='clave',
+            field=models.CharField(default='', editable=False, max_length=100),
+            preserve_default=False,
+        ),
+        migrations.RunPython(calcular_claves, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='articulodonado',
+            name='clave',
+            field=models.CharField(editable=False, max_length=100, unique=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_donaciones', '0012_articulo_clave'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AjusteStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad_anterior', models.PositiveIntegerField()),
+                ('cantidad_nueva', models.PositiveIntegerField()),
+                ('esperado', models.IntegerField(blank=True, null=True)),
+                ('motivo', models.CharField(choices=[('CONCILIACION', 'Conciliación con donaciones y entregas'), ('ADMIN', 'Edición manual en el admin')], default='CONCILIACION', max_length=20)),
+                ('usuario', models.CharField(blank=True, max_length=100, null=True)),
+                ('fecha', models.DateTimeField(auto_now_add=True)),
+                ('articulo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ajustes', to='gestion_donaciones.articulodonado')),
+            ],
+            options={
+                'verbose_name': 'Ajuste de Stock',
+                'verbose_name_plural': 'Ajustes de Stock',
+                'ordering': ['-fecha'],
+                'indexes': [models.Index(fields=['articulo', 'fecha'], name='gestion_don_articul_c32250_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_donaciones', '0013_ajuste_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FotoStockCategoria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('categoria', models.CharField(choices=[('ALIMENTOS', 'Alimentos'), ('ROPA', 'Ropa y Calzado'), ('HIGIENE', 'Productos de Higiene'), ('MEDICAMENTOS', 'Medicamentos'), ('EDUCACION', 'Material Educativo'), ('ELECTRODOMESTICOS', 'Electrodomésticos'), ('MUEBLES', 'Muebles'), ('JUGUETES', 'Juguetes'), ('OTROS', 'Otros')], max_length=50)),
+                ('cantidad', models.IntegerField()),
+                ('articulos', models.PositiveIntegerField()),
+            ],
+            options={
+                'verbose_name': 'Foto de Stock por Categoría',
+                'verbose_name_plural': 'Fotos de Stock por Categoría',
+                'unique_together': {('fecha', 'categoria')},
+            },
+        ),
+        migrations.CreateModel(
+            name='FotoStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('categoria', models.CharField(choices=[('ALIMENTOS', 'Alimentos'), ('ROPA', 'Ropa y Calzado'), ('HIGIENE', 'Productos de Higiene'), ('MEDICAMENTOS', 'Medicamentos'), ('EDUCACION', 'Material Educativo'), ('ELECTRODOMESTICOS', 'Electrodomésticos'), ('MUEBLES', 'Muebles'), ('JUGUETES', 'Juguetes'), ('OTROS', 'Otros')], max_length=50)),
+                ('cantidad', models.IntegerField()),
+                ('articulo', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='fotos', to='gestion_donaciones.articulodonado')),
+            ],
+            options={
+                'verbose_name': 'Foto de Stock',
+                'verbose_name_plural': 'Fotos de Stock',
+                'unique_together': {('fecha', 'articulo')},
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_donaciones', '0014_fotos_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertaStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('articulo_abierto', models.PositiveIntegerField(blank=True, editable=False, null=True, unique=True)),
+                ('cantidad', models.IntegerField()),
+                ('minimo', models.PositiveIntegerField()),
+                ('fecha', models.DateTimeField(auto_now_add=True)),
+                ('resuelta', models.DateTimeField(blank=True, null=True)),
+                ('notificada', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('articulo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alertas', to='gestion_donaciones.articulodonado')),
+            ],
+            options={
+                'verbose_name': 'Alerta de Stock',
+                'verbose_name_plural': 'Alertas de Stock',
+                'ordering': ['-fecha'],
+            },
+        ),
+        migrations.CreateModel(
+            name='UmbralStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('categoria', models.CharField(blank=True, choices=[('ALIMENTOS', 'Alimentos'), ('ROPA', 'Ropa y Calzado'), ('HIGIENE', 'Productos de Higiene'), ('MEDICAMENTOS', 'Medicamentos'), ('EDUCACION', 'Material Educativo'), ('ELECTRODOMESTICOS', 'Electrodomésticos'), ('MUEBLES', 'Muebles'), ('JUGUETES', 'Juguetes'), ('OTROS', 'Otros')], max_length=50, null=True, unique=True)),
+                ('minimo', models.PositiveIntegerField()),
+                ('articulo', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='umbral', to='gestion_donaciones.articulodonado')),
+            ],
+            options={
+                'verbose_name': 'Umbral de Stock',
+                'verbose_name_plural': 'Umbrales de Stock',
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:48
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_donaciones', '0015_alertas_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Solicitud',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prioridad', models.PositiveSmallIntegerField(choices=[(1, 'Urgente'), (2, 'Alta'), (3, 'Normal'), (4, 'Baja')], default=3)),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('PARCIAL', 'Asignada parcialmente'), ('ASIGNADA', 'Asignada'), ('CANCELADA', 'Cancelada')], default='PENDIENTE', max_length=20)),
+                ('notas', models.TextField(blank=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('beneficiario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='solicitudes', to='gestion_donaciones.beneficiario')),
+            ],
+            options={
+                'verbose_name': 'Solicitud',
+                'verbose_name_plural': 'Solicitudes',
+                'ordering': ['prioridad', 'fecha_creacion'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DetalleSolicitud',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.PositiveIntegerField(validators=[django.core.validators.MinValueValidator(1)])),
+                ('articulo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='gestion_donaciones.articulodonado')),
+                ('solicitud', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='detalles', to='gestion_donaciones.solicitud')),
+            ],
+            options={
+                'verbose_name': 'Detalle de Solicitud',
+                'verbose_name_plural': 'Detalles de Solicitudes',
+            },
+        ),
+        migrations.AddField(
+            model_name='entrega',
+            name='solicitud',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='entregas', to='gestion_donaciones.solicitud'),
+        ),
+        migrations.AddIndex(
+            model_name='solicitud',
+            index=models.Index(fields=['estado', 'prioridad', 'fecha_creacion'], name='gestion_don_estado_1c8511_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='detallesolicitud',
+            unique_together={('solicitud', 'articulo')},
+        ),
+    ]
@@ -1,19 +1,44 @@
-from django.db import models
+from django.db import models, transaction
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
 from django.utils import timezone
+from itertools import chain
+from operator import attrgetter
 import uuid
 
+from gestion_donaciones.cache_paginas import purgar_seguimiento
+from gestion_donaciones.campos import UUIDBinarioField
+from gestion_donaciones.catalogo import clave_articulo, invalidar_catalogo
+from gestion_donaciones.rut import descomponer, formatear, validar_rut
+
 # ==========================================
 # MODELOS DE DONANTES Y BENEFICIARIOS
 # ==========================================
 
+def _normalizar_rut(instancia):
+    """
+    Guarda el RUT en forma canónica junto con su cuerpo entero y dígito verificador.
+    El dígito se valida al ingresar el dato (formularios, vistas, API); aquí se
+    conservan tal cual los registros antiguos con dígito incorrecto o ilegibles.
+    """
+    try:
+        instancia.rut_cuerpo, instancia.rut_dv = descomponer(instancia.rut, validar=False)
+    except ValidationError:
+        instancia.rut_cuerpo, instancia.rut_dv = None, ''
+        return
+    instancia.rut = formatear(instancia.rut_cuerpo, instancia.rut_dv)
+
+
 class Donante(models.Model):
     TIPO_CHOICES = [
         ('INDIVIDUAL', 'Individual'),
         ('EMPRESA', 'Empresa'),
         ('ORGANIZACION', 'Organización'),
     ]
-    rut = models.CharField(max_length=12, unique=True, db_index=True)
+    rut = models.CharField(max_length=12, validators=[validar_rut])
+    # RUT normalizado: cuerpo entero (búsquedas e índice único) y dígito verificador
+    rut_cuerpo = models.PositiveIntegerField(unique=True, null=True, editable=False)
+    rut_dv = models.CharField(max_length=1, blank=True, default='', editable=False)
     nombre = models.CharField(max_length=100)
     apellido = models.CharField(max_length=100, blank=True, default="")
     tipoDonante = models.CharField(max_length=20, choices=TIPO_CHOICES, default='INDIVIDUAL')
@@ -30,9 +55,15 @@ class Donante(models.Model):
     def __str__(self):
         return f"{self.nombre} {self.apellido}".strip()
 
+    def save(self, *args, **kwargs):
+        _normalizar_rut(self)
+        super().save(*args, **kwargs)
+
 
 class Beneficiario(models.Model):
-    rut = models.CharField(max_length=12, unique=True, db_index=True)
+    rut = models.CharField(max_length=12, validators=[validar_rut])
+    rut_cuerpo = models.PositiveIntegerField(unique=True, null=True, editable=False)
+    rut_dv = models.CharField(max_length=1, blank=True, default='', editable=False)
     nombre = models.CharField(max_length=100)
     direccion = models.CharField(max_length=200, blank=True)
     telefono = models.CharField(max_length=20, blank=True, default="")
@@ -48,6 +79,10 @@ class Beneficiario(models.Model):
     def __str__(self):
         return self.nombre
 
+    def save(self, *args, **kwargs):
+        _normalizar_rut(self)
+        super().save(*args, **kwargs)
+
 
 # ==========================================
 # ARTÍCULOS DONADOS
@@ -78,6 +113,8 @@ class ArticuloDonado(models.Model):
     ]
     
     nombreObjeto = models.CharField(max_length=100)
+    # Nombre normalizado (ver catalogo.clave_articulo): un artículo por clave
+    clave = models.CharField(max_length=100, unique=True, editable=False)
     descripcion = models.TextField(blank=True, default="Sin descripción")
     cantidad = models.PositiveIntegerField(default=0, validators=[MinValueValidator(0)])
     
@@ -106,6 +143,26 @@ class ArticuloDonado(models.Model):
 
     def __str__(self):
         return f"{self.nombreObjeto} ({self.cantidad} {self.get_unidad_medida_display().lower()})"
+
+    CAMPOS_CATALOGO = ('nombreObjeto', 'unidad_medida', 'categoria')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia._catalogo_original = instancia._datos_catalogo()
+        return instancia
+
+    def _datos_catalogo(self):
+        return tuple(self.__dict__.get(campo) for campo in self.CAMPOS_CATALOGO)
+
+    def save(self, *args, **kwargs):
+        self.clave = clave_articulo(self.nombreObjeto)
+        super().save(*args, **kwargs)
+        # Los cambios de stock no afectan al catálogo; renombrar o cambiar la unidad sí
+        original = getattr(self, '_catalogo_original', None)
+        if original is not None and original != self._datos_catalogo():
+            transaction.on_commit(invalidar_catalogo)
+        self._catalogo_original = self._datos_catalogo()
     
     @property
     def cantidad_con_unidad(self):
@@ -142,16 +199,28 @@ class Donacion(models.Model):
         ('ENTREGADO', 'Entregado'),
         ('CANCELADO', 'Cancelado'),
     ]
-    
+
+    # Transiciones permitidas para los cambios de estado masivos
+    TRANSICIONES_PERMITIDAS = {
+        'RECIBIDO': ['EN_PROCESO', 'ALMACENADO', 'CANCELADO'],
+        'EN_PROCESO': ['ALMACENADO', 'CANCELADO'],
+        'ALMACENADO': ['EN_ENTREGA', 'CANCELADO'],
+        'EN_ENTREGA': ['ENTREGADO', 'ALMACENADO', 'CANCELADO'],
+        'ENTREGADO': [],
+        'CANCELADO': [],
+    }
+
+    # Estados finales: su trazabilidad puede archivarse
+    ESTADOS_CERRADOS = ['ENTREGADO', 'CANCELADO']
+
     donante = models.ForeignKey(Donante, on_delete=models.CASCADE)
     fechaDonacion = models.DateField(auto_now_add=True)
     
-    # UUID para seguimiento público
-    uuid_seguimiento = models.UUIDField(
+    # UUID para seguimiento público (binary(16) en MySQL; unique ya crea su índice)
+    uuid_seguimiento = UUIDBinarioField(
         default=uuid.uuid4,
         editable=False,
         unique=True,
-        db_index=True
     )
     
     # Estado actual de toda la donación
@@ -169,7 +238,6 @@ class Donacion(models.Model):
         verbose_name_plural = 'Donaciones'
         ordering = ['-fechaDonacion']
         indexes = [
-            models.Index(fields=['uuid_seguimiento']),
             models.Index(fields=['-fechaDonacion']),
         ]
 
@@ -179,12 +247,25 @@ class Donacion(models.Model):
     @property
     def total_productos(self):
         """Retorna el número de productos diferentes donados"""
+        if 'detalles' in getattr(self, '_prefetched_objects_cache', {}):
+            return len(self.detalles.all())
         return self.detalles.count()
     
     @property
     def total_cantidad(self):
         """Retorna la cantidad total de unidades donadas"""
         return sum(detalle.cantidad for detalle in self.detalles.all())
+
+    @property
+    def historial(self):
+        """
+        Línea de tiempo completa: une los registros vigentes y los archivados,
+        ordenados por fecha. Usa los prefetch de ambas relaciones si existen.
+        """
+        return sorted(
+            chain(self.trazabilidad_archivada.all(), self.trazabilidad.all()),
+            key=attrgetter('fecha'),
+        )
     
     def actualizar_estado(self, nuevo_estado, descripcion=""):
         """Actualiza el estado y crea un registro de trazabilidad"""
@@ -197,6 +278,86 @@ class Donacion(models.Model):
             descripcion=descripcion or f"Estado cambiado a {nuevo_estado}"
         )
 
+    def verificar_entrega_completa(self, nombre_beneficiario):
+        """Marca la donación como entregada si TODOS sus detalles tienen alguna entrega"""
+        if self.entregado:
+            return
+        if self.detalles.filter(detalleentrega__isnull=True).exists():
+            return
+        self.actualizar_estado('ENTREGADO', f"Entregado completamente a {nombre_beneficiario}")
+        self.entregado = True
+        self.save()
+
+    @classmethod
+    def transicion_permitida(cls, estado_actual, nuevo_estado):
+        return nuevo_estado in cls.TRANSICIONES_PERMITIDAS.get(estado_actual, [])
+
+    @classmethod
+    def actualizar_estado_lote(cls, ids, nuevo_estado, descripcion="", usuario=None):
+        """
+        Cambia el estado de varias donaciones a la vez.
+        Valida cada transición, hace un único UPDATE para las válidas y
+        un único bulk_create de trazabilidad. Retorna el resultado por id.
+        """
+        ids = list(dict.fromkeys(ids))
+        descripcion = descripcion or f"Estado cambiado a {nuevo_estado}"
+        resultados = []
+
+        with transaction.atomic():
+            actuales = {
+                donacion_id: (estado, uuid_seguimiento)
+                for donacion_id, estado, uuid_seguimiento in cls.objects.select_for_update()
+                .filter(id__in=ids)
+                .values_list('id', 'estado', 'uuid_seguimiento')
+            }
+            estados_actuales = {donacion_id: estado for donacion_id, (estado, _) in actuales.items()}
+
+            validos = []
+            for donacion_id in ids:
+                estado_actual = estados_actuales.get(donacion_id)
+                if estado_actual is None:
+                    resultados.append({
+                        'id': donacion_id,
+                        'resultado': 'NO_ENCONTRADA',
+                        'estado_anterior': None,
+                        'estado': None,
+                    })
+                elif not cls.transicion_permitida(estado_actual, nuevo_estado):
+                    resultados.append({
+                        'id': donacion_id,
+                        'resultado': 'TRANSICION_INVALIDA',
+                        'estado_anterior': estado_actual,
+                        'estado': estado_actual,
+                    })
+                else:
+                    validos.append(donacion_id)
+                    resultados.append({
+                        'id': donacion_id,
+                        'resultado': 'ACTUALIZADA',
+                        'estado_anterior': estado_actual,
+                        'estado': nuevo_estado,
+                    })
+
+            if validos:
+                campos = {'estado': nuevo_estado}
+                if nuevo_estado == 'ENTREGADO':
+                    # Igual que verificar_entrega_completa en el cambio individual
+                    campos['entregado'] = True
+                cls.objects.filter(id__in=validos).update(**campos)
+                Trazabilidad.objects.bulk_create([
+                    Trazabilidad(
+                        donacion_id=donacion_id,
+                        estado=nuevo_estado,
+                        descripcion=descripcion,
+                        usuario=usuario,
+                    )
+                    for donacion_id in validos
+                ])
+                # El UPDATE masivo no dispara signals: se purga la página pública aquí
+                purgar_seguimiento(*(actuales[donacion_id][1] for donacion_id in validos))
+
+        return resultados
+
 
 class DetalleDonacion(models.Model):
     """
@@ -230,11 +391,38 @@ class Trazabilidad(models.Model):
         verbose_name = 'Registro de Trazabilidad'
         verbose_name_plural = 'Registros de Trazabilidad'
         ordering = ['fecha']
+        indexes = [
+            models.Index(fields=['donacion', 'fecha']),
+        ]
 
     def __str__(self):
         return f"{self.estado} - {self.fecha.strftime('%d/%m/%Y %H:%M')}"
 
 
+class TrazabilidadArchivada(models.Model):
+    """
+    Almacenamiento frío de la trazabilidad de donaciones cerradas.
+    Los registros se mueven aquí con el comando archivar_trazabilidad.
+    """
+    donacion = models.ForeignKey(Donacion, on_delete=models.CASCADE, related_name='trazabilidad_archivada')
+    fecha = models.DateTimeField()
+    descripcion = models.TextField()
+    estado = models.CharField(max_length=50)
+    usuario = models.CharField(max_length=100, blank=True, null=True)
+    fecha_archivo = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Registro de Trazabilidad Archivado'
+        verbose_name_plural = 'Registros de Trazabilidad Archivados'
+        ordering = ['fecha']
+        indexes = [
+            models.Index(fields=['donacion', 'fecha']),
+        ]
+
+    def __str__(self):
+        return f"{self.estado} - {self.fecha.strftime('%d/%m/%Y %H:%M')} (archivado)"
+
+
 # ==========================================
 # ENTREGA Y DETALLE
 # ==========================================
@@ -256,12 +444,15 @@ class Entrega(models.Model):
     fechaEntrega = models.DateField(auto_now_add=True)
     estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='COMPLETADA')
     notas = models.TextField(blank=True)
+    # Solicitud que originó la entrega (los borradores del comando asignar_solicitudes)
+    solicitud = models.ForeignKey(
+        'Solicitud', null=True, blank=True, on_delete=models.SET_NULL, related_name='entregas'
+    )
     
-    uuid_seguimiento = models.UUIDField(
+    uuid_seguimiento = UUIDBinarioField(
         default=uuid.uuid4,
         editable=False,
         unique=True,
-        db_index=True
     )
 
     class Meta:
@@ -274,6 +465,8 @@ class Entrega(models.Model):
 
     @property
     def total_productos(self):
+        if 'detalles' in getattr(self, '_prefetched_objects_cache', {}):
+            return len(self.detalles.all())
         return self.detalles.count()
 
     @property
@@ -314,16 +507,213 @@ class DetalleEntrega(models.Model):
         super().save(*args, **kwargs)
         
         if self.detalle_donacion:
-            donacion = self.detalle_donacion.donacion
-            
-            # Verificar si TODOS los detalles de esta donación fueron entregados
-            todos_entregados = all(
-                DetalleEntrega.objects.filter(detalle_donacion=d).exists()
-                for d in donacion.detalles.all()
-            )
-            
-            if todos_entregados and not donacion.entregado:
-                donacion.actualizar_estado('ENTREGADO', 
-                    f"Entregado completamente a {self.entrega.beneficiario.nombre}")
-                donacion.entregado = True
-                donacion.save()
\ No newline at end of file
+            self.detalle_donacion.donacion.verificar_entrega_completa(self.entrega.beneficiario.nombre)
+
+# ==========================================
+# BORRADORES DE FORMULARIOS
+# ==========================================
+
+class BorradorFormulario(models.Model):
+    """
+    Respaldo en base de datos de los borradores de formularios
+    (ver gestion_donaciones/borradores.py)
+    """
+    clave = models.CharField(max_length=150, unique=True)
+    datos = models.JSONField(default=dict)
+    expira = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name = 'Borrador de Formulario'
+        verbose_name_plural = 'Borradores de Formularios'
+
+    def __str__(self):
+        return self.clave
+
+
+# ==========================================
+# AJUSTES DE STOCK
+# ==========================================
+
+class AjusteStock(models.Model):
+    """
+    Registro de auditoría de cada corrección directa del stock de un artículo
+    (conciliación con los detalles o edición manual en el admin)
+    """
+    MOTIVO_CHOICES = [
+        ('CONCILIACION', 'Conciliación con donaciones y entregas'),
+        ('ADMIN', 'Edición manual en el admin'),
+    ]
+
+    articulo = models.ForeignKey(ArticuloDonado, on_delete=models.CASCADE, related_name='ajustes')
+    cantidad_anterior = models.PositiveIntegerField()
+    cantidad_nueva = models.PositiveIntegerField()
+    # Donado - entregado según los detalles; puede ser negativo si faltan donaciones
+    esperado = models.IntegerField(null=True, blank=True)
+    motivo = models.CharField(max_length=20, choices=MOTIVO_CHOICES, default='CONCILIACION')
+    usuario = models.CharField(max_length=100, blank=True, null=True)
+    fecha = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Ajuste de Stock'
+        verbose_name_plural = 'Ajustes de Stock'
+        ordering = ['-fecha']
+        indexes = [
+            models.Index(fields=['articulo', 'fecha']),
+        ]
+
+    def __str__(self):
+        return f"{self.articulo_id}: {self.cantidad_anterior} -> {self.cantidad_nueva} ({self.motivo})"
+
+
+# ==========================================
+# FOTOS DIARIAS DE STOCK
+# ==========================================
+
+class FotoStock(models.Model):
+    """
+    Stock de cada artículo al cierre de un día (comando foto_stock).
+    Sin restricción de FK: la historia se conserva aunque el artículo se elimine.
+    """
+    fecha = models.DateField()
+    articulo = models.ForeignKey(
+        ArticuloDonado, on_delete=models.DO_NOTHING, db_constraint=False, related_name='fotos'
+    )
+    categoria = models.CharField(max_length=50, choices=ArticuloDonado.CATEGORIA_CHOICES)
+    cantidad = models.IntegerField()
+
+    class Meta:
+        verbose_name = 'Foto de Stock'
+        verbose_name_plural = 'Fotos de Stock'
+        unique_together = ['fecha', 'articulo']
+
+    def __str__(self):
+        return f"{self.fecha} #{self.articulo_id}: {self.cantidad}"
+
+
+class FotoStockCategoria(models.Model):
+    """Totales por categoría de cada foto diaria de stock"""
+    fecha = models.DateField()
+    categoria = models.CharField(max_length=50, choices=ArticuloDonado.CATEGORIA_CHOICES)
+    cantidad = models.IntegerField()
+    articulos = models.PositiveIntegerField()
+
+    class Meta:
+        verbose_name = 'Foto de Stock por Categoría'
+        verbose_name_plural = 'Fotos de Stock por Categoría'
+        unique_together = ['fecha', 'categoria']
+
+    def __str__(self):
+        return f"{self.fecha} {self.categoria}: {self.cantidad}"
+
+
+# ==========================================
+# ALERTAS DE STOCK BAJO
+# ==========================================
+
+class UmbralStock(models.Model):
+    """
+    Stock mínimo de un artículo o de una categoría completa. Sin umbral propio
+    se usa el de la categoría y, si tampoco hay, STOCK_ALERTA_MINIMO.
+    """
+    articulo = models.OneToOneField(
+        ArticuloDonado, null=True, blank=True, on_delete=models.CASCADE, related_name='umbral'
+    )
+    categoria = models.CharField(
+        max_length=50, choices=ArticuloDonado.CATEGORIA_CHOICES, null=True, blank=True, unique=True
+    )
+    minimo = models.PositiveIntegerField()
+
+    class Meta:
+        verbose_name = 'Umbral de Stock'
+        verbose_name_plural = 'Umbrales de Stock'
+
+    def clean(self):
+        if bool(self.articulo_id) == bool(self.categoria):
+            raise ValidationError("Indique un artículo o una categoría (solo uno).")
+
+    def __str__(self):
+        return f"{self.articulo or self.get_categoria_display()}: {self.minimo}"
+
+
+class AlertaStock(models.Model):
+    """
+    Aviso de que un artículo quedó en o bajo su stock mínimo. Hay a lo sumo
+    una alerta abierta por artículo: mientras sigue abierta, articulo_abierto
+    repite el id del artículo y su índice único impide duplicarla.
+    """
+    articulo = models.ForeignKey(ArticuloDonado, on_delete=models.CASCADE, related_name='alertas')
+    articulo_abierto = models.PositiveIntegerField(null=True, blank=True, unique=True, editable=False)
+    cantidad = models.IntegerField()
+    minimo = models.PositiveIntegerField()
+    fecha = models.DateTimeField(auto_now_add=True)
+    resuelta = models.DateTimeField(null=True, blank=True)
+    # Cola de notificaciones: pendiente mientras es NULL (comando enviar_alertas_stock)
+    notificada = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    class Meta:
+        verbose_name = 'Alerta de Stock'
+        verbose_name_plural = 'Alertas de Stock'
+        ordering = ['-fecha']
+
+    def __str__(self):
+        return f"{self.articulo_id}: {self.cantidad} (mínimo {self.minimo})"
+
+
+# ==========================================
+# SOLICITUDES DE BENEFICIARIOS
+# ==========================================
+
+class Solicitud(models.Model):
+    """
+    Necesidad pendiente de un beneficiario: qué artículos y cuántos pide.
+    El comando asignar_solicitudes le asigna stock por prioridad y genera
+    entregas en estado PENDIENTE (borradores) enlazadas a la solicitud.
+    """
+    PRIORIDAD_CHOICES = [
+        (1, 'Urgente'),
+        (2, 'Alta'),
+        (3, 'Normal'),
+        (4, 'Baja'),
+    ]
+    ESTADO_CHOICES = [
+        ('PENDIENTE', 'Pendiente'),
+        ('PARCIAL', 'Asignada parcialmente'),
+        ('ASIGNADA', 'Asignada'),
+        ('CANCELADA', 'Cancelada'),
+    ]
+
+    beneficiario = models.ForeignKey(Beneficiario, on_delete=models.CASCADE, related_name='solicitudes')
+    prioridad = models.PositiveSmallIntegerField(choices=PRIORIDAD_CHOICES, default=3)
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='PENDIENTE')
+    notas = models.TextField(blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Solicitud'
+        verbose_name_plural = 'Solicitudes'
+        ordering = ['prioridad', 'fecha_creacion']
+        indexes = [
+            models.Index(fields=['estado', 'prioridad', 'fecha_creacion']),
+        ]
+
+    def __str__(self):
+        return f"Solicitud #{self.id} - {self.beneficiario.nombre} ({self.get_prioridad_display()})"
+
+
+class DetalleSolicitud(models.Model):
+    """
+    Artículo y cantidad pedidos en una solicitud. Lo ya asignado no se guarda
+    aquí: es la suma de los detalles de las entregas enlazadas a la solicitud,
+    así eliminar un borrador libera la asignación junto con el stock.
+    """
+    solicitud = models.ForeignKey(Solicitud, on_delete=models.CASCADE, related_name='detalles')
+    articulo = models.ForeignKey(ArticuloDonado, on_delete=models.CASCADE)
+    cantidad = models.PositiveIntegerField(validators=[MinValueValidator(1)])
+
+    class Meta:
+        verbose_name = 'Detalle de Solicitud'
+        verbose_name_plural = 'Detalles de Solicitudes'
+        unique_together = ['solicitud', 'articulo']
+
+    def __str__(self):
+        return f"{self.articulo.nombreObjeto} - {self.cantidad} unidades"
@@ -0,0 +1,57 @@
+import logging
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# --------------------
+# Presupuestos de consultas por vista
+# --------------------
+# Cada vista declara el máximo de consultas SQL que puede ejecutar, sin importar
+# cuántos registros haya en la base. Las vistas de funciones usan el decorador
+# @presupuesto_consultas(n); los ViewSets declaran un diccionario
+# presupuestos_consultas por acción. Los tests verifican los presupuestos con
+# datos generados en dos tamaños, y en producción SQLMetricasMiddleware escribe
+# una advertencia cuando una petición los excede (PRESUPUESTOS_ADVERTIR).
+
+
+def presupuesto_consultas(maximo):
+    """Declara el máximo de consultas de una vista (aplicar como decorador externo)"""
+    def decorador(view_func):
+        view_func.presupuesto_consultas = maximo
+        return view_func
+
+    return decorador
+
+
+def presupuesto_de(request):
+    """Presupuesto de la vista resuelta para la petición, o None si no declara uno"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+
+    func = match.func
+    maximo = getattr(func, 'presupuesto_consultas', None)
+    if maximo is not None:
+        return maximo
+
+    # ViewSets de DRF: la vista generada por as_view() conserva la clase y el mapeo de acciones
+    cls = getattr(func, 'cls', None)
+    acciones = getattr(func, 'actions', None) or {}
+    presupuestos = getattr(cls, 'presupuestos_consultas', None) or {}
+    accion = acciones.get(request.method.lower())
+    if accion is None and request.method == 'HEAD':
+        accion = acciones.get('get')
+    return presupuestos.get(accion)
+
+
+def verificar_presupuesto(request, cantidad, vista):
+    """Registra una advertencia si la petición excedió el presupuesto de su vista"""
+    if not getattr(settings, 'PRESUPUESTOS_ADVERTIR', True):
+        return
+    maximo = presupuesto_de(request)
+    if maximo is not None and cantidad > maximo:
+        logger.warning(
+            "presupuesto de consultas excedido: vista=%s metodo=%s consultas=%s maximo=%s",
+            vista, request.method, cantidad, maximo,
+        )
@@ -0,0 +1,192 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+from django.db.models.functions import TruncWeek
+from django.utils import timezone
+
+try:
+    import numpy as np
+except ImportError:  # numpy es opcional: sin él se calcula lo mismo en Python puro
+    np = None
+
+from gestion_donaciones.models import ArticuloDonado, DetalleEntrega
+
+# --------------------
+# Pronóstico de demanda
+# --------------------
+# La historia de entregas de las últimas PRONOSTICO_SEMANAS semanas completas
+# se carga con una sola consulta agrupada por artículo y semana, y se arma una
+# matriz artículos x semanas. Sobre toda la matriz a la vez se calculan la
+# media móvil de las últimas PRONOSTICO_VENTANA semanas y el suavizado
+# exponencial (alfa PRONOSTICO_ALFA, como producto por un vector de pesos);
+# las categorías son la suma de las filas de sus artículos. La demanda queda
+# en la caché compartida por PRONOSTICO_TTL segundos; las semanas de
+# cobertura se calculan contra el stock actual en cada consulta. Con numpy
+# instalado todo es vectorizado; sin él se obtiene el mismo resultado en
+# Python puro.
+
+PRONOSTICO_CACHE_KEY = 'pronostico:demanda'
+
+
+def _parametros():
+    return (
+        getattr(settings, 'PRONOSTICO_SEMANAS', 12),
+        getattr(settings, 'PRONOSTICO_VENTANA', 4),
+        getattr(settings, 'PRONOSTICO_ALFA', 0.3),
+    )
+
+
+def _pesos(semanas, alfa):
+    """s_t = alfa * x_t + (1 - alfa) * s_t-1 con s_0 = x_0, escrito como pesos por semana (antigua -> reciente)"""
+    pesos = [alfa * (1 - alfa) ** (semanas - 1 - k) for k in range(semanas)]
+    pesos[0] = (1 - alfa) ** (semanas - 1)
+    return pesos
+
+
+def _historia(semanas):
+    """(ids, categorías, {(fila, columna): cantidad}, lunes de la semana siguiente a la última)"""
+    hoy = timezone.localdate()
+    hasta = hoy - timedelta(days=hoy.weekday())  # la semana en curso está incompleta
+    desde = hasta - timedelta(weeks=semanas)
+
+    articulos = list(ArticuloDonado.objects.order_by('id').values_list('id', 'categoria'))
+    fila = {id_: i for i, (id_, _) in enumerate(articulos)}
+    entregas = (
+        DetalleEntrega.objects.filter(entrega__fechaEntrega__gte=desde, entrega__fechaEntrega__lt=hasta)
+        .annotate(semana=TruncWeek('entrega__fechaEntrega'))
+        .order_by()
+        .values('articulo_id', 'semana')
+        .annotate(total=Sum('cantidad'))
+        .values_list('articulo_id', 'semana', 'total')
+    )
+    celdas = {}
+    for articulo_id, semana, total in entregas:
+        if articulo_id in fila:
+            columna = (semana - desde).days // 7
+            celdas[(fila[articulo_id], columna)] = celdas.get((fila[articulo_id], columna), 0) + total
+    return [id_ for id_, _ in articulos], [c for _, c in articulos], celdas, hasta
+
+
+def _calcular_numpy(n, categorias, celdas, semanas, ventana, alfa):
+    matriz = np.zeros((n, semanas))
+    if celdas:
+        posiciones = np.array(list(celdas), dtype=int)
+        np.add.at(matriz, (posiciones[:, 0], posiciones[:, 1]), np.array(list(celdas.values()), dtype=float))
+
+    nombres = sorted(set(categorias))
+    indice = np.array([nombres.index(c) for c in categorias], dtype=int)
+    por_categoria = np.zeros((len(nombres), semanas))
+    np.add.at(por_categoria, indice, matriz)
+
+    pesos = np.array(_pesos(semanas, alfa))
+    resultados = []
+    for m in (matriz, por_categoria):
+        media = m[:, -ventana:].mean(axis=1)
+        suavizada = m @ pesos
+        resultados.append(list(zip(media.tolist(), suavizada.tolist())))
+    return resultados[0], dict(zip(nombres, resultados[1]))
+
+
+def _calcular_python(n, categorias, celdas, semanas, ventana, alfa):
+    matriz = [[0.0] * semanas for _ in range(n)]
+    for (fila, columna), total in celdas.items():
+        matriz[fila][columna] += total
+    por_categoria = {}
+    for fila, categoria in zip(matriz, categorias):
+        suma = por_categoria.setdefault(categoria, [0.0] * semanas)
+        for k, valor in enumerate(fila):
+            suma[k] += valor
+
+    pesos = _pesos(semanas, alfa)
+
+    def calcular(fila):
+        return sum(fila[-ventana:]) / ventana, sum(v * p for v, p in zip(fila, pesos))
+
+    return [calcular(f) for f in matriz], {c: calcular(f) for c, f in sorted(por_categoria.items())}
+
+
+def demanda(forzar=False):
+    """
+    Demanda semanal estimada, desde la caché si está vigente:
+    {'hasta', 'semanas', 'articulos': {id: (media_movil, suavizada)}, 'categorias': {...}}
+    """
+    datos = None if forzar else cache.get(PRONOSTICO_CACHE_KEY)
+    if datos is not None:
+        return datos
+
+    semanas, ventana, alfa = _parametros()
+    ids, categorias, celdas, hasta = _historia(semanas)
+    calcular = _calcular_numpy if np is not None else _calcular_python
+    por_articulo, por_categoria = calcular(len(ids), categorias, celdas, semanas, min(ventana, semanas), alfa)
+    datos = {
+        'hasta': hasta,
+        'semanas': semanas,
+        'articulos': dict(zip(ids, por_articulo)),
+        'categorias': por_categoria,
+    }
+    cache.set(PRONOSTICO_CACHE_KEY, datos, getattr(settings, 'PRONOSTICO_TTL', 3600))
+    return datos
+
+
+def semanas_de_cobertura(stock, demanda_semanal):
+    """Semanas que dura el stock al ritmo de la demanda; None si no hay demanda"""
+    if not demanda_semanal:
+        return None
+    return round(stock / demanda_semanal, 1)
+
+
+def _coberturas(stock, demandas):
+    if np is None:
+        return [semanas_de_cobertura(s, d) for s, d in zip(stock, demandas)]
+    stock, demandas = np.array(stock, dtype=float), np.array(demandas, dtype=float)
+    cobertura = np.divide(stock, demandas, out=np.full(len(stock), np.nan), where=demandas > 0)
+    return [None if np.isnan(c) else round(c, 1) for c in cobertura.tolist()]
+
+
+def pronostico(categoria=None):
+    """Demanda y semanas de cobertura con el stock actual, por artículo y por categoría"""
+    datos = demanda()
+    articulos = ArticuloDonado.objects.order_by('id').values_list('id', 'nombreObjeto', 'categoria', 'cantidad')
+    if categoria:
+        articulos = articulos.filter(categoria=categoria)
+    articulos = list(articulos)
+
+    ceros = (0.0, 0.0)
+    demandas = [datos['articulos'].get(id_, ceros) for id_, _, _, _ in articulos]
+    coberturas = _coberturas([a[3] for a in articulos], [d[1] for d in demandas])
+
+    stock_categoria = {}
+    for _, _, cat, cantidad in articulos:
+        stock_categoria[cat] = stock_categoria.get(cat, 0) + cantidad
+    nombres = sorted(stock_categoria)
+    demandas_categoria = [datos['categorias'].get(c, ceros) for c in nombres]
+    coberturas_categoria = _coberturas([stock_categoria[c] for c in nombres], [d[1] for d in demandas_categoria])
+
+    return {
+        'hasta': datos['hasta'],
+        'semanas': datos['semanas'],
+        'articulos': [
+            {
+                'id': id_,
+                'nombreObjeto': nombre,
+                'categoria': cat,
+                'stock': cantidad,
+                'media_movil': round(media, 2),
+                'demanda_semanal': round(suavizada, 2),
+                'semanas_cobertura': cobertura,
+            }
+            for (id_, nombre, cat, cantidad), (media, suavizada), cobertura in zip(articulos, demandas, coberturas)
+        ],
+        'categorias': [
+            {
+                'categoria': cat,
+                'stock': stock_categoria[cat],
+                'media_movil': round(media, 2),
+                'demanda_semanal': round(suavizada, 2),
+                'semanas_cobertura': cobertura,
+            }
+            for cat, (media, suavizada), cobertura in zip(nombres, demandas_categoria, coberturas_categoria)
+        ],
+    }
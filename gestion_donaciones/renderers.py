@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional: sin él se usa el json de la librería estándar
+    orjson = None
+
+# --------------------
+# JSON rápido para la API
+# --------------------
+# Renderer y parser de DRF basados en orjson, que serializa en C los tipos que
+# devuelven los serializers (UUID, fechas, listas y diccionarios anidados). Si
+# orjson no está instalado ambos delegan en las clases estándar de DRF, así que
+# el formato de salida es el mismo con o sin la dependencia. GzipAPIMiddleware
+# comprime las respuestas de la API que superan API_GZIP_MINIMO bytes.
+
+
+_encoder_drf = JSONEncoder()
+
+
+def _por_defecto(obj):
+    """Tipos que orjson no serializa (Decimal, timedelta, textos lazy...): los convierte el encoder de DRF"""
+    return _encoder_drf.default(obj)
+
+
+class JSONRapidoRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+
+        opciones = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            opciones |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=_por_defecto, option=opciones)
+
+
+class JSONRapidoParser(JSONParser):
+    renderer_class = JSONRapidoRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
+
+
+class GzipAPIMiddleware(GZipMiddleware):
+    """Comprime con gzip las respuestas grandes de la API (las páginas HTML no, por BREACH)"""
+
+    def process_response(self, request, response):
+        if not request.path.startswith('/api/'):
+            return response
+        minimo = getattr(settings, 'API_GZIP_MINIMO', 1024)
+        if not response.streaming and len(response.content) < minimo:
+            return response
+        return super().process_response(request, response)
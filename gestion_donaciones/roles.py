@@ -0,0 +1,90 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+# --------------------
+# Resolución de roles por usuario
+# --------------------
+# Los grupos de cada usuario se consultan una sola vez: quedan guardados en el
+# propio objeto user (dura lo que dura la petición) y en la caché compartida,
+# que se invalida desde signals.py cuando cambian los grupos. Si la caché es
+# local a cada proceso (CACHE_COMPARTIDA falso) la invalidación no llegaría a
+# los demás workers y un permiso revocado seguiría vigente: en ese caso los
+# roles solo duran la petición.
+
+GRUPO_ADMINAPP = 'AdminApp'
+
+ROLES_CACHE_TIMEOUT = 60 * 60
+ROLES_VERSION_KEY = 'roles:version'
+
+
+class RolesUsuario:
+    """Roles efectivos de un usuario dentro de la aplicación"""
+
+    def __init__(self, user, grupos):
+        self.autenticado = user.is_authenticated
+        self.grupos = frozenset(grupos)
+        self.es_superuser = self.autenticado and user.is_superuser
+        self.es_adminapp = self.autenticado and GRUPO_ADMINAPP in self.grupos
+        self.es_staff = self.autenticado and user.is_staff
+
+    @property
+    def es_admin(self):
+        """Superusuario o miembro de AdminApp"""
+        return self.es_superuser or self.es_adminapp
+
+    @property
+    def es_staff_o_admin(self):
+        return self.es_admin or self.es_staff
+
+
+def _nueva_version():
+    # Basada en el tiempo para no reutilizar claves antiguas si la versión se pierde
+    return int(time.time() * 1000)
+
+
+def _cache_key(user_id):
+    version = cache.get_or_set(ROLES_VERSION_KEY, _nueva_version, None)
+    return f'roles:{version}:{user_id}'
+
+
+def obtener_roles(user):
+    """Retorna los roles del usuario, consultando sus grupos como máximo una vez"""
+    roles = getattr(user, '_roles_cache', None)
+    if roles is not None:
+        return roles
+
+    if not user.is_authenticated:
+        grupos = ()
+    elif not getattr(settings, 'CACHE_COMPARTIDA', False):
+        grupos = list(user.groups.values_list('name', flat=True))
+    else:
+        key = _cache_key(user.pk)
+        grupos = cache.get(key)
+        if grupos is None:
+            grupos = list(user.groups.values_list('name', flat=True))
+            cache.set(key, grupos, ROLES_CACHE_TIMEOUT)
+
+    roles = RolesUsuario(user, grupos)
+    user._roles_cache = roles
+    return roles
+
+
+def invalidar_roles(*user_ids):
+    """Elimina de la caché los roles de los usuarios indicados"""
+    cache.delete_many([_cache_key(user_id) for user_id in user_ids])
+
+
+def invalidar_todos_los_roles():
+    """Invalida los roles de todos los usuarios (p. ej. al renombrar un grupo)"""
+    cache.set(ROLES_VERSION_KEY, _nueva_version(), None)
+
+
+# Helpers para user_passes_test y decoradores
+def es_admin(user):
+    return obtener_roles(user).es_admin
+
+
+def es_staff_o_admin(user):
+    return obtener_roles(user).es_staff_o_admin
@@ -0,0 +1,76 @@
+import re
+
+from django.core.exceptions import ValidationError
+
+# --------------------
+# RUT chileno
+# --------------------
+# Los RUT se ingresan con o sin puntos, guion o espacios ("12.345.678-9",
+# "12345678-9", "123456789"). Se guardan en forma canónica ("12345678-9") y,
+# para las búsquedas, como cuerpo entero (rut_cuerpo, con índice único) más
+# el dígito verificador (rut_dv). Todas las búsquedas por RUT deben usar
+# filtro_rut() para ir por el índice entero.
+
+_RE_RUT = re.compile(r'^(\d{1,9})([\dK])$')
+
+
+def digito_verificador(cuerpo):
+    """Dígito verificador de un RUT chileno (módulo 11)"""
+    suma, factor = 0, 2
+    for digito in reversed(str(cuerpo)):
+        suma += int(digito) * factor
+        factor = 2 if factor == 7 else factor + 1
+    resto = 11 - suma % 11
+    return {11: '0', 10: 'K'}.get(resto, str(resto))
+
+
+def descomponer(texto, validar=True):
+    """
+    Retorna (cuerpo, dv) del RUT. Lanza ValidationError si el formato es
+    inválido o, con validar=True, si el dígito verificador no corresponde.
+    """
+    limpio = re.sub(r'[\s.\-]', '', str(texto or '')).upper()
+    coincidencia = _RE_RUT.match(limpio)
+    if not coincidencia or not int(coincidencia.group(1)):
+        raise ValidationError("RUT inválido: %(rut)s", code='rut_invalido', params={'rut': texto})
+    cuerpo, dv = int(coincidencia.group(1)), coincidencia.group(2)
+    if validar and digito_verificador(cuerpo) != dv:
+        raise ValidationError(
+            "El dígito verificador del RUT %(rut)s no es válido", code='rut_dv', params={'rut': texto}
+        )
+    return cuerpo, dv
+
+
+def formatear(cuerpo, dv=None):
+    """Forma canónica: cuerpo sin puntos, guion y dígito verificador"""
+    return f"{cuerpo}-{dv or digito_verificador(cuerpo)}"
+
+
+def normalizar(texto, validar=True):
+    return formatear(*descomponer(texto, validar))
+
+
+def filtro_rut(texto):
+    """Filtro de queryset por RUT sobre la columna entera indexada"""
+    cuerpo, _ = descomponer(texto)
+    return {'rut_cuerpo': cuerpo}
+
+
+def validar_rut(texto):
+    """Validador para campos de modelo y formularios"""
+    descomponer(texto)
+
+
+def normalizar_unico(modelo, texto, instancia=None):
+    """Normaliza el RUT y verifica que no esté registrado en otro 'modelo'"""
+    cuerpo, dv = descomponer(texto)
+    otros = modelo.objects.filter(rut_cuerpo=cuerpo)
+    if instancia is not None and instancia.pk:
+        otros = otros.exclude(pk=instancia.pk)
+    if otros.exists():
+        raise ValidationError(
+            "Ya existe un %(modelo)s con el RUT %(rut)s",
+            code='unique',
+            params={'modelo': modelo._meta.verbose_name, 'rut': formatear(cuerpo, dv)},
+        )
+    return formatear(cuerpo, dv)
@@ -9,15 +9,24 @@ from .models import (
     Entrega,
     DetalleEntrega,
 )
+from .catalogo import validar_nombre_unico
+from .rut import normalizar_unico
 
 
-class DonanteSerializer(serializers.ModelSerializer):
+class RutUnicoMixin:
+    """Normaliza el RUT y rechaza duplicados por cuerpo (el índice único es rut_cuerpo)"""
+
+    def validate_rut(self, value):
+        return normalizar_unico(self.Meta.model, value, self.instance)
+
+
+class DonanteSerializer(RutUnicoMixin, serializers.ModelSerializer):
     class Meta:
         model = Donante
         fields = ['id', 'rut', 'nombre', 'apellido', 'tipoDonante', 'email']
 
 
-class BeneficiarioSerializer(serializers.ModelSerializer):
+class BeneficiarioSerializer(RutUnicoMixin, serializers.ModelSerializer):
     class Meta:
         model = Beneficiario
         fields = ['id', 'rut', 'nombre', 'direccion', 'telefono', 'email']
@@ -36,6 +45,9 @@ class ArticuloDonadoSerializer(serializers.ModelSerializer):
             'fechaVencimiento',
         ]
 
+    def validate_nombreObjeto(self, value):
+        return validar_nombre_unico(value, self.instance)
+
 
 class DetalleDonacionSerializer(serializers.ModelSerializer):
     articulo = ArticuloDonadoSerializer(read_only=True)
@@ -63,7 +75,7 @@ class DonacionSerializer(serializers.ModelSerializer):
         source='donante', queryset=Donante.objects.all(), write_only=True, required=True
     )
     detalles = DetalleDonacionSerializer(many=True, read_only=True)
-    trazabilidad = TrazabilidadSerializer(many=True, read_only=True)
+    trazabilidad = TrazabilidadSerializer(source='historial', many=True, read_only=True)
     uuid_seguimiento = serializers.UUIDField(read_only=True)
 
     class Meta:
@@ -129,3 +141,56 @@ class EntregaSerializer(serializers.ModelSerializer):
             'uuid_seguimiento',
             'detalles',
         ]
+
+
+class TransicionDonacionesSerializer(serializers.Serializer):
+    # Todas las donaciones se bloquean en una sola transacción: el lote tiene un tope
+    MAXIMO_IDS = 1000
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=MAXIMO_IDS
+    )
+    estado = serializers.ChoiceField(choices=Donacion.ESTADO_CHOICES)
+    descripcion = serializers.CharField(required=False, allow_blank=True, default="")
+
+
+# --------------------
+# Respuestas de /api/stock/ (solo documentan el esquema OpenAPI)
+# --------------------
+class StockHistoricoArticuloSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    nombreObjeto = serializers.CharField(allow_null=True)
+    cantidad = serializers.IntegerField()
+
+
+class StockHistoricoSerializer(serializers.Serializer):
+    fecha = serializers.DateField()
+    foto = serializers.DateField(
+        allow_null=True, help_text="Fecha de la foto usada como base; null si se partió del stock actual."
+    )
+    categorias = serializers.DictField(child=serializers.IntegerField(), help_text="Stock total por categoría.")
+    articulos = StockHistoricoArticuloSerializer(
+        many=True, required=False, help_text="Solo con ?categoria=: el stock de cada artículo de la categoría."
+    )
+
+
+class PronosticoCategoriaSerializer(serializers.Serializer):
+    categoria = serializers.CharField()
+    stock = serializers.IntegerField()
+    media_movil = serializers.FloatField()
+    demanda_semanal = serializers.FloatField()
+    semanas_cobertura = serializers.FloatField(allow_null=True, help_text="null si no hay demanda.")
+
+
+class PronosticoArticuloSerializer(PronosticoCategoriaSerializer):
+    id = serializers.IntegerField()
+    nombreObjeto = serializers.CharField()
+
+
+class PronosticoSerializer(serializers.Serializer):
+    hasta = serializers.DateField(
+        help_text="Lunes de la semana en curso: la historia usa las semanas completas previas."
+    )
+    semanas = serializers.IntegerField()
+    articulos = PronosticoArticuloSerializer(many=True)
+    categorias = PronosticoCategoriaSerializer(many=True)
@@ -1,4 +1,12 @@
-from django.db.models.signals import post_save, post_delete, pre_save
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.contrib.auth.models import User, Group
+from django.db.models.signals import post_save, post_delete, pre_save, m2m_changed
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
 from django.dispatch import receiver
 from .models import (
     Donacion,
@@ -6,7 +14,50 @@ from .models import (
     DetalleEntrega,
     ArticuloDonado,
     DetalleDonacion,
+    Trazabilidad,
+    UmbralStock,
 )
+from .alertas import invalidar_umbrales, revisar as revisar_alertas
+from .cache_paginas import purgar_seguimiento
+from .catalogo import invalidar_catalogo
+from .filtro_uuid import agregar as agregar_uuid_filtro
+from .roles import invalidar_roles, invalidar_todos_los_roles
+
+
+# ==========================================
+# AJUSTE DE STOCK
+# ==========================================
+
+
+# Dentro de ajustes_de_stock_manuales() los signals no tocan el stock: quien
+# edita los detalles en bloque (edicion.py) aplica un único delta por artículo
+_stock_manual = ContextVar('stock_manual', default=False)
+
+
+@contextmanager
+def ajustes_de_stock_manuales():
+    token = _stock_manual.set(True)
+    try:
+        yield
+    finally:
+        _stock_manual.reset(token)
+
+
+def ajustar_stock(detalle, delta):
+    """
+    Suma delta al stock del artículo del detalle con un UPDATE atómico (sin
+    leer el artículo ni perder ajustes concurrentes); nunca baja de cero.
+    """
+    if _stock_manual.get():
+        return
+    ArticuloDonado.objects.filter(pk=detalle.articulo_id).update(
+        cantidad=Greatest(F('cantidad') + delta, 0),
+        fecha_actualizacion=timezone.now(),
+    )
+    # Mantiene al día el artículo si el llamador ya lo tenía cargado
+    if type(detalle).articulo.is_cached(detalle):
+        detalle.articulo.cantidad = max(0, detalle.articulo.cantidad + delta)
+    revisar_alertas(detalle.articulo_id)
 
 
 # ==========================================
@@ -33,8 +84,6 @@ def ajustar_stock_detalle_donacion(sender, instance, created, **kwargs):
     Aumenta el stock cuando se crea un detalle de donacion
     y ajusta por diferencia cuando se edita.
     """
-    articulo = instance.articulo
-
     if created:
         delta = instance.cantidad
     else:
@@ -42,8 +91,7 @@ def ajustar_stock_detalle_donacion(sender, instance, created, **kwargs):
         delta = instance.cantidad - anterior if anterior is not None else instance.cantidad
 
     if delta:
-        articulo.cantidad += delta
-        articulo.save()
+        ajustar_stock(instance, delta)
 
 
 @receiver(post_delete, sender=DetalleDonacion)
@@ -51,9 +99,7 @@ def restar_stock_al_eliminar_detalle_donacion(sender, instance, **kwargs):
     """
     Resta el stock cuando se elimina un detalle de donacion.
     """
-    articulo = instance.articulo
-    articulo.cantidad = max(0, articulo.cantidad - instance.cantidad)
-    articulo.save()
+    ajustar_stock(instance, -instance.cantidad)
 
 
 # ==========================================
@@ -79,8 +125,6 @@ def actualizar_stock_detalle_entrega(sender, instance, created, **kwargs):
     """
     Resta stock cuando se registra o edita un detalle de entrega.
     """
-    articulo = instance.articulo
-
     if created:
         delta = instance.cantidad
     else:
@@ -88,8 +132,7 @@ def actualizar_stock_detalle_entrega(sender, instance, created, **kwargs):
         delta = instance.cantidad - anterior if anterior is not None else instance.cantidad
 
     if delta:
-        articulo.cantidad = max(0, articulo.cantidad - delta)
-        articulo.save()
+        ajustar_stock(instance, -delta)
 
 
 @receiver(post_delete, sender=DetalleEntrega)
@@ -97,9 +140,31 @@ def eliminar_detalle_entrega_actualiza_stock(sender, instance, **kwargs):
     """
     Restaura stock al eliminar un detalle de entrega.
     """
-    articulo = instance.articulo
-    articulo.cantidad += instance.cantidad
-    articulo.save()
+    ajustar_stock(instance, instance.cantidad)
+
+
+def _revisar_solicitud_del_detalle(detalle):
+    """Lo asignado a la solicitud del borrador cambió: su estado se recalcula al confirmar."""
+    # Import diferido: asignacion importa este módulo
+    from .asignacion import revisar_solicitudes
+
+    if type(detalle).entrega.is_cached(detalle):
+        # Caso habitual (registrar_entrega): la entrega ya está cargada y no tiene solicitud
+        if detalle.entrega.solicitud_id:
+            revisar_solicitudes(solicitudes=[detalle.entrega.solicitud_id])
+    else:
+        revisar_solicitudes(entregas=[detalle.entrega_id])
+
+
+@receiver(post_save, sender=DetalleEntrega)
+def revisar_solicitud_al_guardar_detalle(sender, instance, created, **kwargs):
+    if created or getattr(instance, "_cantidad_anterior", None) != instance.cantidad:
+        _revisar_solicitud_del_detalle(instance)
+
+
+@receiver(post_delete, sender=DetalleEntrega)
+def revisar_solicitud_al_eliminar_detalle(sender, instance, **kwargs):
+    _revisar_solicitud_del_detalle(instance)
 
 
 # ==========================================
@@ -112,6 +177,100 @@ def eliminar_entrega_completa(sender, instance, **kwargs):
     """
     Cuando se elimina una entrega completa, los detalles se eliminan en cascada
     y sus signals restauran el stock automaticamente.
-    Este signal es solo para logging o acciones adicionales si se necesitan.
+    Si era un borrador de una solicitud, su estado se recalcula.
+    """
+    if instance.solicitud_id:
+        from .asignacion import revisar_solicitudes
+
+        revisar_solicitudes(solicitudes=[instance.solicitud_id])
+
+
+# ==========================================
+# INVALIDACION DE ROLES EN CACHE
+# ==========================================
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidar_roles_al_cambiar_grupos(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Invalida los roles cacheados cuando se agregan o quitan grupos a un usuario
+    (user.groups.add) o usuarios a un grupo (group.user_set.add).
     """
-    pass  # Los detalles se eliminan automaticamente por CASCADE
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        invalidar_roles(instance.pk)
+    elif pk_set:
+        invalidar_roles(*pk_set)
+    else:
+        invalidar_todos_los_roles()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidar_roles_al_modificar_grupo(sender, instance, **kwargs):
+    """Renombrar o eliminar un grupo afecta a todos sus usuarios."""
+    invalidar_todos_los_roles()
+
+
+# ==========================================
+# PURGA DE LA PAGINA PUBLICA DE SEGUIMIENTO
+# ==========================================
+
+
+@receiver(post_save, sender=Donacion)
+@receiver(post_delete, sender=Donacion)
+def purgar_seguimiento_donacion(sender, instance, **kwargs):
+    purgar_seguimiento(instance.uuid_seguimiento)
+
+
+@receiver(post_save, sender=Trazabilidad)
+@receiver(post_save, sender=DetalleDonacion)
+@receiver(post_delete, sender=DetalleDonacion)
+def purgar_seguimiento_detalle(sender, instance, **kwargs):
+    """La trazabilidad y los artículos se muestran en la página de seguimiento."""
+    try:
+        purgar_seguimiento(instance.donacion.uuid_seguimiento)
+    except Donacion.DoesNotExist:
+        pass
+
+
+# ==========================================
+# FILTRO DE UUIDS DE SEGUIMIENTO
+# ==========================================
+
+
+@receiver(post_save, sender=Donacion)
+@receiver(post_save, sender=Entrega)
+def agregar_uuid_al_filtro(sender, instance, created, **kwargs):
+    """Los UUIDs nuevos deben ser visibles de inmediato en el filtro del proceso."""
+    if created:
+        agregar_uuid_filtro(instance.uuid_seguimiento)
+
+
+# ==========================================
+# CATALOGO DE ARTICULOS EN MEMORIA
+# ==========================================
+
+
+@receiver(post_delete, sender=ArticuloDonado)
+def invalidar_catalogo_al_eliminar_articulo(sender, instance, **kwargs):
+    """Ningún proceso debe seguir resolviendo nombres al id eliminado."""
+    transaction.on_commit(invalidar_catalogo)
+
+
+# ==========================================
+# UMBRALES DE ALERTA DE STOCK
+# ==========================================
+
+
+@receiver(post_save, sender=UmbralStock)
+@receiver(post_delete, sender=UmbralStock)
+def reevaluar_alertas_al_cambiar_umbral(sender, instance, **kwargs):
+    """Un umbral nuevo o modificado se aplica de inmediato a los artículos que cubre."""
+    invalidar_umbrales()
+    if instance.articulo_id:
+        revisar_alertas(instance.articulo_id)
+    elif instance.categoria:
+        revisar_alertas(*ArticuloDonado.objects.filter(categoria=instance.categoria).values_list('id', flat=True))
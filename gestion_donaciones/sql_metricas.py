@@ -0,0 +1,209 @@
+import json
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from gestion_donaciones.presupuestos import verificar_presupuesto
+
+logger = logging.getLogger(__name__)
+
+# --------------------
+# Instrumentación SQL por petición
+# --------------------
+# SQLMetricasMiddleware registra, para cada petición, la cantidad de consultas,
+# el tiempo total en base de datos y las consultas repetidas. Detecta patrones
+# N+1 (la misma forma de SQL ejecutada muchas veces con distintos parámetros),
+# escribe un resumen estructurado en el log (DEBUG; WARNING si hay un N+1) y
+# acumula histogramas por vista que se consultan en /metricas/sql/.
+
+LIMITES_CONSULTAS = [1, 2, 5, 10, 20, 50, 100, 200]
+LIMITES_TIEMPO_MS = [1, 5, 10, 25, 50, 100, 250, 500, 1000]
+
+_RE_LISTA_IN = re.compile(r'IN \((?:%s, )*%s\)')
+_RE_VALUES = re.compile(r'VALUES (?:\((?:%s, )*%s\), )*\((?:%s, )*%s\)')
+
+
+def forma_sql(sql):
+    """Normaliza el SQL para agrupar consultas con la misma forma"""
+    sql = _RE_LISTA_IN.sub('IN (...)', sql)
+    return _RE_VALUES.sub('VALUES (...)', sql)
+
+
+def _umbral_n1():
+    return getattr(settings, 'SQL_N1_UMBRAL', 5)
+
+
+class RegistroConsultas:
+    """Execute wrapper que acumula las consultas de una petición"""
+
+    def __init__(self):
+        self.cantidad = 0
+        self.tiempo = 0.0
+        self.formas = Counter()
+        self.exactas = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.tiempo += time.perf_counter() - inicio
+            self.cantidad += 1
+            self.formas[forma_sql(sql)] += 1
+            try:
+                self.exactas[(sql, repr(params))] += 1
+            except Exception:  # noqa: BLE001
+                pass
+
+    def duplicadas(self):
+        """Consultas idénticas (mismo SQL y parámetros) ejecutadas más de una vez"""
+        return sum(n - 1 for n in self.exactas.values() if n > 1)
+
+    def sospechas_n1(self):
+        """Formas de SQL repetidas al menos SQL_N1_UMBRAL veces"""
+        umbral = _umbral_n1()
+        return [
+            {'sql': forma[:300], 'repeticiones': n}
+            for forma, n in self.formas.most_common()
+            if n >= umbral
+        ]
+
+
+class _Histograma:
+    def __init__(self, limites):
+        self.limites = limites
+        self.conteos = [0] * (len(limites) + 1)
+
+    def agregar(self, valor):
+        self.conteos[bisect_left(self.limites, valor)] += 1
+
+    def como_dict(self):
+        etiquetas = [f'<={limite}' for limite in self.limites] + [f'>{self.limites[-1]}']
+        return dict(zip(etiquetas, self.conteos))
+
+
+class _MetricasVista:
+    def __init__(self):
+        self.peticiones = 0
+        self.consultas = 0
+        self.tiempo_ms = 0.0
+        self.peticiones_n1 = 0
+        self.max_consultas = 0
+        self.hist_consultas = _Histograma(LIMITES_CONSULTAS)
+        self.hist_tiempo = _Histograma(LIMITES_TIEMPO_MS)
+
+    def agregar(self, cantidad, tiempo_ms, con_n1):
+        self.peticiones += 1
+        self.consultas += cantidad
+        self.tiempo_ms += tiempo_ms
+        self.peticiones_n1 += int(con_n1)
+        self.max_consultas = max(self.max_consultas, cantidad)
+        self.hist_consultas.agregar(cantidad)
+        self.hist_tiempo.agregar(tiempo_ms)
+
+    def como_dict(self):
+        return {
+            'peticiones': self.peticiones,
+            'consultas_promedio': round(self.consultas / self.peticiones, 2),
+            'consultas_max': self.max_consultas,
+            'tiempo_db_promedio_ms': round(self.tiempo_ms / self.peticiones, 2),
+            'peticiones_con_n1': self.peticiones_n1,
+            'histograma_consultas': self.hist_consultas.como_dict(),
+            'histograma_tiempo_db_ms': self.hist_tiempo.como_dict(),
+        }
+
+
+_metricas = {}
+_metricas_lock = threading.Lock()
+
+
+def registrar_metricas(vista, cantidad, tiempo_ms, con_n1):
+    with _metricas_lock:
+        _metricas.setdefault(vista, _MetricasVista()).agregar(cantidad, tiempo_ms, con_n1)
+
+
+def metricas_por_vista():
+    """Histogramas acumulados por vista en el proceso actual"""
+    with _metricas_lock:
+        return {vista: m.como_dict() for vista, m in sorted(_metricas.items())}
+
+
+def nombre_vista(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'sin_vista'
+    return match.view_name or match._func_path
+
+
+def _instalar(registro):
+    """Registra el wrapper en las conexiones del hilo actual"""
+    stack = ExitStack()
+    for conexion in connections.all():
+        stack.enter_context(conexion.execute_wrapper(registro))
+    return stack
+
+
+class SQLMetricasMiddleware:
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not getattr(settings, 'SQL_METRICAS_ACTIVAS', True):
+            return self.get_response(request)
+
+        registro = RegistroConsultas()
+        with _instalar(registro):
+            response = self.get_response(request)
+        return self._registrar(request, response, registro)
+
+    async def __acall__(self, request):
+        if not getattr(settings, 'SQL_METRICAS_ACTIVAS', True):
+            return await self.get_response(request)
+
+        # Las conexiones son por hilo: el wrapper se instala (y se retira) en el hilo
+        # sync_to_async de la petición, que es donde corre el ORM asíncrono
+        registro = RegistroConsultas()
+        stack = await sync_to_async(_instalar)(registro)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self._registrar(request, response, registro)
+
+    def _registrar(self, request, response, registro):
+        vista = nombre_vista(request)
+        tiempo_ms = registro.tiempo * 1000
+        sospechas = registro.sospechas_n1()
+        registrar_metricas(vista, registro.cantidad, tiempo_ms, bool(sospechas))
+        verificar_presupuesto(request, registro.cantidad, vista)
+
+        resumen = {
+            'vista': vista,
+            'metodo': request.method,
+            'ruta': request.path,
+            'estado': response.status_code,
+            'consultas': registro.cantidad,
+            'tiempo_db_ms': round(tiempo_ms, 2),
+            'duplicadas': registro.duplicadas(),
+        }
+        if sospechas:
+            resumen['n1'] = sospechas
+            logger.warning("sql %s", json.dumps(resumen, ensure_ascii=False))
+        else:
+            logger.debug("sql %s", json.dumps(resumen, ensure_ascii=False))
+        return response
@@ -1,3 +1,1562 @@
-from django.test import TestCase
+import base64
+import gzip
+import importlib.util
+import io
+import json
+import os
+import tempfile
+import time
+import unittest
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections, router
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from drf_spectacular.generators import SchemaGenerator
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+
+from gestion_donaciones import alertas, filtro_uuid, limites, pronostico
+from gestion_donaciones.asignacion import asignar
+from gestion_donaciones.borradores import eliminar_borrador, guardar_borrador, obtener_borrador
+from gestion_donaciones.cache_paginas import purgar_paginas
+from gestion_donaciones.catalogo import fusionar_articulos, invalidar_catalogo, resolver_articulo
+from gestion_donaciones.checks import verificar_cache_compartida
+from gestion_donaciones.conciliacion import Diferencia, buscar_diferencias, reparar, stock_esperado
+from gestion_donaciones.datos_sinteticos import escala, generar
+from gestion_donaciones.db_pool import PoolAgotado, PoolConexiones
+from gestion_donaciones.db_router import COOKIE_PIN, ReplicaMiddleware, ReplicaRouter, solo_lectura
+from gestion_donaciones.duplicados import buscar_duplicados, fusionar
+from gestion_donaciones.edicion import editar_detalles_entrega
+from gestion_donaciones.estaticos import CACHE_INMUTABLE, CACHE_SIN_HASH, EstaticosComprimidos, EstaticosMiddleware
+from gestion_donaciones.historico import stock_al, tomar_foto, totales_al
+from gestion_donaciones.management.commands.benchmark import Command as Benchmark
+from gestion_donaciones.models import (
+    AjusteStock,
+    AlertaStock,
+    ArticuloDonado,
+    Beneficiario,
+    BorradorFormulario,
+    DetalleDonacion,
+    DetalleEntrega,
+    Donacion,
+    Donante,
+    Entrega,
+    Solicitud,
+    Trazabilidad,
+    UmbralStock,
+)
+from gestion_donaciones.presupuestos import presupuesto_de
+from gestion_donaciones.renderers import GzipAPIMiddleware, JSONRapidoParser, JSONRapidoRenderer
+from gestion_donaciones.roles import GRUPO_ADMINAPP, obtener_roles
+from gestion_donaciones.rut import formatear
+from gestion_donaciones.serializers import TransicionDonacionesSerializer
+from gestion_donaciones.sql_metricas import SQLMetricasMiddleware, forma_sql, metricas_por_vista
+
+
+# --------------------
+# Cambios de estado masivos
+# --------------------
+class TransicionDonacionesTests(TestCase):
+    def setUp(self):
+        donante = Donante.objects.create(rut=formatear(7_000_000), nombre='Transicion')
+        self.en_entrega = Donacion.objects.create(donante=donante, estado='EN_ENTREGA')
+        self.recibida = Donacion.objects.create(donante=donante)
+
+    def test_resultado_por_id_y_trazabilidad_en_lote(self):
+        inexistente = self.recibida.id + 100
+        with self.assertNumQueries(5):
+            resultados = Donacion.actualizar_estado_lote(
+                [self.en_entrega.id, self.recibida.id, inexistente, self.en_entrega.id], 'ENTREGADO', usuario='lote'
+            )
+        self.assertEqual(
+            [(r['id'], r['resultado'], r['estado_anterior'], r['estado']) for r in resultados],
+            [
+                (self.en_entrega.id, 'ACTUALIZADA', 'EN_ENTREGA', 'ENTREGADO'),
+                (self.recibida.id, 'TRANSICION_INVALIDA', 'RECIBIDO', 'RECIBIDO'),
+                (inexistente, 'NO_ENCONTRADA', None, None),
+            ],
+        )
+        self.en_entrega.refresh_from_db()
+        self.assertEqual((self.en_entrega.estado, self.en_entrega.entregado), ('ENTREGADO', True))
+        self.assertEqual(
+            list(self.en_entrega.trazabilidad.values_list('estado', 'usuario')), [('ENTREGADO', 'lote')]
+        )
+        self.assertFalse(self.recibida.trazabilidad.exists())
+
+    def test_api_limita_la_cantidad_de_ids(self):
+        self.client.force_login(User.objects.create_superuser('transicion', 'transicion@example.com', 'transicion'))
+        maximo = TransicionDonacionesSerializer.MAXIMO_IDS
+        response = self.client.post(
+            '/api/donaciones/transicion/',
+            {'ids': list(range(1, maximo + 2)), 'estado': 'CANCELADO'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(
+            '/api/donaciones/transicion/',
+            {'ids': [self.recibida.id], 'estado': 'CANCELADO'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.json()['actualizadas'], 1)
+
+
+# --------------------
+# Archivo de trazabilidad
+# --------------------
+class ArchivoTrazabilidadTests(TestCase):
+    def _donacion(self, estado, dias):
+        donacion = Donacion.objects.create(donante=self.donante, estado=estado)
+        for registro in ('RECIBIDO', estado):
+            Trazabilidad.objects.create(donacion=donacion, estado=registro, descripcion=registro)
+        donacion.trazabilidad.update(fecha=timezone.now() - timedelta(days=dias))
+        return donacion
+
+    def setUp(self):
+        self.donante = Donante.objects.create(rut=formatear(7_100_000), nombre='Archivo')
+
+    def test_archiva_por_lotes_solo_las_cerradas_antiguas(self):
+        antiguas = [self._donacion('ENTREGADO', 400), self._donacion('CANCELADO', 400), self._donacion('ENTREGADO', 300)]
+        reciente = self._donacion('ENTREGADO', 10)
+        abierta = self._donacion('EN_PROCESO', 400)
+
+        salida = io.StringIO()
+        call_command('archivar_trazabilidad', '--dias', '180', '--lote', '2', stdout=salida)
+        self.assertIn("Archivados 6 registros de 3 donaciones", salida.getvalue())
+        for donacion in antiguas:
+            self.assertFalse(donacion.trazabilidad.exists())
+            self.assertEqual(donacion.trazabilidad_archivada.count(), 2)
+        for donacion in (reciente, abierta):
+            self.assertEqual(donacion.trazabilidad.count(), 2)
+            self.assertFalse(donacion.trazabilidad_archivada.exists())
+
+    def test_historial_une_archivo_y_registros_vigentes(self):
+        donacion = self._donacion('ENTREGADO', 400)
+        call_command('archivar_trazabilidad', stdout=io.StringIO())
+        nuevo = Trazabilidad.objects.create(donacion=donacion, estado='ENTREGADO', descripcion='Nota posterior')
+
+        donacion = Donacion.objects.prefetch_related('trazabilidad', 'trazabilidad_archivada').get(id=donacion.id)
+        with self.assertNumQueries(0):
+            historial = donacion.historial
+        self.assertEqual([r.descripcion for r in historial], ['RECIBIDO', 'ENTREGADO', 'Nota posterior'])
+        self.assertEqual(historial[-1].id, nuevo.id)
+
+
+# --------------------
+# Roles por usuario
+# --------------------
+@override_settings(CACHE_COMPARTIDA=True)
+class RolesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.usuario = User.objects.create_user('roles', 'roles@example.com', 'roles')
+        self.grupo = Group.objects.create(name=GRUPO_ADMINAPP)
+
+    def _roles(self):
+        # Un objeto user nuevo por "petición", como lo entrega AuthenticationMiddleware
+        return obtener_roles(User.objects.get(pk=self.usuario.pk))
+
+    def test_cambios_de_grupos_invalidan_la_cache(self):
+        self.assertFalse(self._roles().es_admin)
+        usuario = User.objects.get(pk=self.usuario.pk)
+        with self.assertNumQueries(0):
+            obtener_roles(usuario)
+
+        self.usuario.groups.add(self.grupo)
+        self.assertTrue(self._roles().es_adminapp)
+        self.grupo.user_set.remove(self.usuario)
+        self.assertFalse(self._roles().es_admin)
+        self.grupo.user_set.add(self.usuario)
+        self.assertTrue(self._roles().es_admin)
+        self.usuario.groups.clear()
+        self.assertFalse(self._roles().es_admin)
+
+    def test_cambios_del_grupo_invalidan_a_todos(self):
+        self.usuario.groups.add(self.grupo)
+        self.assertTrue(self._roles().es_adminapp)
+        self.grupo.name = 'Otro'
+        self.grupo.save()
+        self.assertFalse(self._roles().es_adminapp)
+        Group.objects.create(name=GRUPO_ADMINAPP).user_set.add(self.usuario)
+        self.assertTrue(self._roles().es_adminapp)
+        Group.objects.get(name=GRUPO_ADMINAPP).delete()
+        self.assertFalse(self._roles().es_adminapp)
+
+    @override_settings(CACHE_COMPARTIDA=False)
+    def test_sin_cache_compartida_los_roles_duran_la_peticion(self):
+        self.assertFalse(self._roles().es_admin)
+        # Cambio que este proceso no ve pasar (sin signals, como desde otro worker)
+        self.usuario.groups.through.objects.create(user=self.usuario, group=self.grupo)
+        usuario = User.objects.get(pk=self.usuario.pk)
+        with self.assertNumQueries(1):
+            self.assertTrue(obtener_roles(usuario).es_adminapp)
+        with self.assertNumQueries(0):
+            obtener_roles(usuario)
+
+    @override_settings(CACHE_COMPARTIDA=False)
+    def test_cache_local_es_aviso_salvo_que_sea_obligatoria(self):
+        self.assertEqual([m.id for m in verificar_cache_compartida(None)], ['gestion_donaciones.W001'])
+        with override_settings(CACHE_COMPARTIDA_OBLIGATORIA=True):
+            (mensaje,) = verificar_cache_compartida(None)
+        self.assertEqual((mensaje.id, mensaje.is_serious()), ('gestion_donaciones.E001', True))
+        with override_settings(CACHE_COMPARTIDA=True, CACHE_COMPARTIDA_OBLIGATORIA=True):
+            self.assertEqual(verificar_cache_compartida(None), [])
+
+
+# --------------------
+# Borradores de formularios
+# --------------------
+class BorradoresTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.request = RequestFactory().post('/')
+        self.request.user = User.objects.create_user('borrador', 'borrador@example.com', 'borrador')
+        self.request.session = SessionStore()
+
+    def _ciclo(self):
+        self.assertEqual(obtener_borrador(self.request, 'donacion'), {})
+        guardar_borrador(self.request, 'donacion', {'nombre_donante': 'Ana'})
+        guardar_borrador(self.request, 'donacion', {'nombre_donante': 'Ana María'})
+        self.assertEqual(obtener_borrador(self.request, 'donacion'), {'nombre_donante': 'Ana María'})
+        self.assertEqual(obtener_borrador(self.request, 'crear_usuario'), {})
+        eliminar_borrador(self.request, 'donacion')
+        self.assertEqual(obtener_borrador(self.request, 'donacion'), {})
+
+    @override_settings(BORRADORES_BACKEND='cache')
+    def test_guardar_leer_y_eliminar_en_cache(self):
+        self._ciclo()
+        self.assertFalse(BorradorFormulario.objects.exists())
+
+    @override_settings(BORRADORES_BACKEND='db')
+    def test_guardar_leer_y_eliminar_en_la_base(self):
+        # Sin borrador marcado en la sesión no se consulta la base
+        with self.assertNumQueries(0):
+            self.assertEqual(obtener_borrador(self.request, 'donacion'), {})
+            eliminar_borrador(self.request, 'donacion')
+        self._ciclo()
+        guardar_borrador(self.request, 'donacion', {'nombre_donante': 'Ana'})
+        self.assertEqual(BorradorFormulario.objects.get().datos, {'nombre_donante': 'Ana'})
+        # Los vencidos no se muestran y se limpian al guardar otro
+        BorradorFormulario.objects.update(expira=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(obtener_borrador(self.request, 'donacion'), {})
+        guardar_borrador(self.request, 'crear_usuario', {'username': 'ana'})
+        self.assertEqual(list(BorradorFormulario.objects.values_list('datos', flat=True)), [{'username': 'ana'}])
+
+    @override_settings(BORRADORES_BACKEND='cache')
+    def test_si_la_cache_falla_se_usa_la_base(self):
+        with mock.patch('gestion_donaciones.borradores.cache.set', side_effect=ConnectionError), \
+                self.assertLogs('gestion_donaciones.borradores', 'WARNING'):
+            guardar_borrador(self.request, 'donacion', {'nombre_donante': 'Ana'})
+        self.assertTrue(BorradorFormulario.objects.exists())
+
+    def test_sin_cache_compartida_se_usa_la_base_por_defecto(self):
+        with self.settings(CACHE_COMPARTIDA=False):
+            del settings.BORRADORES_BACKEND
+            guardar_borrador(self.request, 'donacion', {'nombre_donante': 'Ana'})
+        self.assertTrue(BorradorFormulario.objects.exists())
+
+
+# --------------------
+# Réplicas de lectura
+# --------------------
+@override_settings(DATABASE_REPLICAS=['replica_0'], REPLICA_PIN_SEGUNDOS=5)
+class ReplicaRouterTests(SimpleTestCase):
+    """El router solo decide el alias: no hace falta que la réplica exista"""
+
+    def _vista(self, escribir=False, decorada=True):
+        leidas = []
+
+        def vista(request):
+            leidas.append(router.db_for_read(Donacion))
+            if escribir:
+                router.db_for_write(Donacion)
+                leidas.append(router.db_for_read(Donacion))
+            return HttpResponse()
+
+        return (solo_lectura(vista) if decorada else vista), leidas
+
+    def _peticion(self, vista, metodo='get', cookies=None):
+        request = getattr(RequestFactory(), metodo)('/')
+        request.COOKIES.update(cookies or {})
+        return ReplicaMiddleware(vista)(request)
+
+    def test_solo_lectura_lee_de_la_replica_en_metodos_seguros(self):
+        vista, leidas = self._vista()
+        self._peticion(vista)
+        self._peticion(vista, 'post')
+        sin_marca, leidas_sin_marca = self._vista(decorada=False)
+        self._peticion(sin_marca)
+        self.assertEqual(leidas + leidas_sin_marca, ['replica_0', 'default', 'default'])
+
+        with mock.patch.object(connections['default'], 'in_atomic_block', True):
+            self._peticion(vista)
+        self.assertEqual(leidas[-1], 'default')
+
+    def test_despues_de_escribir_se_fija_al_primario(self):
+        vista, leidas = self._vista(escribir=True)
+        response = self._peticion(vista)
+        self.assertEqual(leidas, ['replica_0', 'default'])
+        pin = response.cookies[COOKIE_PIN]
+        self.assertEqual(pin['max-age'], 5)
+
+        lectura, leidas = self._vista()
+        self._peticion(lectura, cookies={COOKIE_PIN: pin.value})
+        self._peticion(lectura, cookies={COOKIE_PIN: str(time.time() - 1)})
+        self._peticion(lectura, cookies={COOKIE_PIN: 'invalida'})
+        self.assertEqual(leidas, ['default', 'replica_0', 'replica_0'])
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_sin_replicas_todo_va_al_primario(self):
+        vista, leidas = self._vista(escribir=True)
+        response = self._peticion(vista)
+        self.assertEqual(leidas, ['default', 'default'])
+        self.assertNotIn(COOKIE_PIN, response.cookies)
+        self.assertFalse(ReplicaRouter().allow_migrate('replica_0', 'gestion_donaciones'))
+
+
+@unittest.skipUnless(settings.DATABASE_REPLICAS, "sin réplicas configuradas (DB_REPLICA_URLS)")
+class ReplicaSQLiteTests(TransactionTestCase):
+    """Con DB_REPLICA_URLS=sqlite:////ruta/replica.sqlite3: las consultas llegan de verdad a la réplica"""
+    databases = '__all__'
+
+    def test_listado_lee_de_la_replica_y_la_escritura_del_primario(self):
+        self.client.force_login(User.objects.create_superuser('replica', 'replica@example.com', 'replica'))
+        replica = connections[settings.DATABASE_REPLICAS[0]]
+        with CaptureQueriesContext(replica) as en_replica:
+            self.assertEqual(self.client.get('/api/lectura/articulos/').status_code, 200)
+        self.assertTrue(any('gestion_donaciones_articulodonado' in q['sql'] for q in en_replica))
+
+        with CaptureQueriesContext(replica) as en_replica:
+            response = self.client.post('/api/articulos/', {'nombreObjeto': 'Replica', 'cantidad': 1})
+            self.assertEqual(response.status_code, 201)
+            self.client.get('/api/lectura/articulos/')
+        self.assertEqual(len(en_replica), 0)
+
+
+# --------------------
+# Pool de conexiones
+# --------------------
+class ConexionFalsa:
+    def __init__(self, viva=True):
+        self.viva = viva
+        self.cerrada = False
+
+    def ping(self):
+        if not self.viva:
+            raise OSError("conexión cortada")
+
+    def close(self):
+        self.cerrada = True
+
+
+class PoolConexionesTests(SimpleTestCase):
+    def test_reutiliza_la_ultima_devuelta(self):
+        pool = PoolConexiones(max_conexiones=2)
+        (a, creada_a), (b, creada_b) = pool.obtener(ConexionFalsa), pool.obtener(ConexionFalsa)
+        pool.devolver(a, creada_a)
+        pool.devolver(b, creada_b)
+        self.assertIs(pool.obtener(ConexionFalsa)[0], b)
+        self.assertIs(pool.obtener(ConexionFalsa)[0], a)
+        stats = pool.estadisticas()
+        self.assertEqual((stats['creadas'], stats['reutilizadas'], stats['en_uso']), (2, 2, 2))
+
+    def test_descarta_las_que_fallan_el_ping(self):
+        pool = PoolConexiones()
+        conexion, creada = pool.obtener(ConexionFalsa)
+        pool.devolver(conexion, creada)
+        conexion.viva = False
+        nueva, _ = pool.obtener(ConexionFalsa)
+        self.assertIsNot(nueva, conexion)
+        self.assertTrue(conexion.cerrada)
+        stats = pool.estadisticas()
+        self.assertEqual((stats['fallos_ping'], stats['descartadas'], stats['creadas']), (1, 1, 2))
+
+    def test_descarta_las_que_superan_la_edad_maxima(self):
+        pool = PoolConexiones(max_edad=300)
+        with mock.patch('gestion_donaciones.db_pool.time.monotonic', return_value=1000.0):
+            vieja, creada = pool.obtener(ConexionFalsa)
+            pool.devolver(vieja, creada)
+        with mock.patch('gestion_donaciones.db_pool.time.monotonic', return_value=1301.0):
+            nueva, creada = pool.obtener(ConexionFalsa)
+            self.assertTrue(vieja.cerrada)
+            # Tampoco vuelve al pool una que venció mientras estaba en uso, ni una no reutilizable
+            pool.devolver(nueva, 0.0)
+            otra, creada = pool.obtener(ConexionFalsa)
+            pool.devolver(otra, creada, reutilizable=False)
+        self.assertTrue(nueva.cerrada and otra.cerrada)
+        self.assertEqual(pool.estadisticas()['libres'], 0)
+
+    def test_el_semaforo_limita_las_conexiones_en_uso(self):
+        pool = PoolConexiones(max_conexiones=1, timeout=0.01)
+        conexion, creada = pool.obtener(ConexionFalsa)
+        with self.assertRaises(PoolAgotado):
+            pool.obtener(ConexionFalsa)
+        self.assertEqual(pool.estadisticas()['esperas_agotadas'], 1)
+        pool.devolver(conexion, creada)
+        self.assertIs(pool.obtener(ConexionFalsa)[0], conexion)
+
+    def test_un_error_al_crear_libera_el_cupo(self):
+        pool = PoolConexiones(max_conexiones=1, timeout=0.01)
+
+        def falla():
+            raise OSError("sin red")
+
+        with self.assertRaises(OSError):
+            pool.obtener(falla)
+        self.assertIsInstance(pool.obtener(ConexionFalsa)[0], ConexionFalsa)
+
+    @unittest.skipUnless(importlib.util.find_spec('MySQLdb'), "mysqlclient no está instalado")
+    def test_close_del_backend_devuelve_la_conexion_al_pool(self):
+        from gestion_donaciones.db_backends.mysql_pool.base import DatabaseWrapper
+
+        wrapper = DatabaseWrapper({**connection.settings_dict, 'POOL': {'MAX_SIZE': 1}}, alias='pool_prueba')
+        pool = wrapper._pool()
+        for errores, esperado in ((False, 1), (True, 0)):
+            conexion, wrapper._pool_creada = pool.obtener(ConexionFalsa)
+            wrapper.connection, wrapper.autocommit, wrapper.errors_occurred = conexion, True, errores
+            wrapper._close()
+            self.assertEqual(pool.estadisticas()['libres'], esperado)
+            pool._libres.clear()
+        self.assertEqual(pool.estadisticas()['en_uso'], 0)
+
+
+# --------------------
+# Instrumentación SQL
+# --------------------
+class SQLMetricasTests(TestCase):
+    def setUp(self):
+        donante = Donante.objects.create(rut=formatear(7_200_000), nombre='Metricas')
+        self.ids = [Donacion.objects.create(donante=donante).id for _ in range(6)]
+
+    def _vista(self, request):
+        # Una consulta por donación: el patrón N+1 que se quiere detectar
+        for id_ in self.ids:
+            Donacion.objects.get(id=id_)
+        return HttpResponse()
+
+    def _registros_de(self, nivel, middleware, request):
+        with self.assertLogs('gestion_donaciones.sql_metricas', nivel) as logs:
+            middleware(request)
+        return [json.loads(r.getMessage()[len('sql '):]) for r in logs.records]
+
+    def test_detecta_n1_y_registra_el_resto_en_debug(self):
+        antes = metricas_por_vista().get('sin_vista', {}).get('peticiones', 0)
+        with self.settings(SQL_N1_UMBRAL=5):
+            [resumen] = self._registros_de('WARNING', SQLMetricasMiddleware(self._vista), RequestFactory().get('/x/'))
+        self.assertEqual((resumen['consultas'], resumen['duplicadas']), (6, 0))
+        self.assertEqual(resumen['n1'][0]['repeticiones'], 6)
+        self.assertIn('IN (...)', forma_sql('SELECT 1 WHERE id IN (%s, %s, %s)'))
+
+        with self.settings(SQL_N1_UMBRAL=10), self.assertNoLogs('gestion_donaciones.sql_metricas', 'INFO'):
+            SQLMetricasMiddleware(self._vista)(RequestFactory().get('/x/'))
+        metricas = metricas_por_vista()['sin_vista']
+        self.assertEqual(metricas['peticiones'], antes + 2)
+        self.assertGreaterEqual(metricas['peticiones_con_n1'], 1)
+
+    async def test_version_asincrona_instala_el_wrapper_en_el_hilo_del_orm(self):
+        async def vista(request):
+            await sync_to_async(self._vista)(request)
+            return HttpResponse()
+
+        middleware = SQLMetricasMiddleware(vista)
+        self.assertTrue(iscoroutinefunction(middleware))
+        with self.assertLogs('gestion_donaciones.sql_metricas', 'DEBUG') as logs:
+            await middleware(RequestFactory().get('/x/'))
+        self.assertIn('"consultas": 6', logs.records[0].getMessage())
+        # Al terminar la petición el wrapper se retira de las conexiones
+        self.assertEqual(await sync_to_async(lambda: connection.execute_wrappers)(), [])
+
+
+# --------------------
+# Presupuestos de consultas
+# --------------------
+# Cada caso se ejecuta con datos generados en dos tamaños: el número de
+# consultas debe respetar el presupuesto declarado por la vista en ambos, es
+# decir, no puede crecer con la cantidad de registros.
+TAMANOS = (20, 200)
+
+
+def _registrar_donacion(test, nombres=None):
+    test.contador += 1
+    if nombres is None:
+        nombres = list(ArticuloDonado.objects.order_by('id').values_list('nombreObjeto', flat=True)[:3])
+    return test.client.post('/donaciones/registrar/', {
+        'tipo_donante': 'INDIVIDUAL',
+        'rut_donante': formatear(5_000_000 + test.contador),
+        'nombre_donante': 'Presupuesto',
+        'articulo[]': nombres,
+        'categoria[]': ['OTROS'] * len(nombres),
+        'unidad_medida[]': ['UNIDAD'] * len(nombres),
+        'descripcion_articulo[]': [''] * len(nombres),
+        'cantidad_donada[]': ['5'] * len(nombres),
+        'fecha_vencimiento[]': [''] * len(nombres),
+    })
+
+
+def _registrar_donacion_articulos_nuevos(test):
+    # Catálogo en frío y artículos que no existen: se crean todos en la misma petición
+    invalidar_catalogo()
+    return _registrar_donacion(test, [f'Nuevo {test.contador} {i}' for i in range(10)])
+
+
+def _registrar_entrega(test):
+    test.contador += 1
+    articulos = ArticuloDonado.objects.filter(cantidad__gt=2).order_by('id').values_list('id', flat=True)[:2]
+    return test.client.post('/entregas/registrar/', {
+        'rut_beneficiario': formatear(4_000_000 + test.contador),
+        'nombre_beneficiario': 'Presupuesto',
+        'direccion_beneficiario': 'Calle 1',
+        'nombre_responsable': 'Presupuesto',
+        'articulo[]': [str(a) for a in articulos],
+        'cantidad[]': ['1', '1'],
+    })
+
+
+def _get(url):
+    return lambda test: test.client.get(url() if callable(url) else url)
+
+
+# Última donación y entrega de cada tamaño, leídas antes de medir: esas
+# consultas son del test, no de la vista
+_ultimas = {}
+
+
+def _donacion():
+    return _ultimas['donacion']
+
+
+def _entrega():
+    return _ultimas['entrega']
+
+
+def _filtro_frio(url):
+    # Como la primera petición de un proceso cuyo filtro de UUIDs no se pudo precargar
+    def caso(test):
+        filtro_uuid._estado.filtro = None
+        return test.client.get(url())
+
+    return caso
+
+
+CASOS = {
+    'index': _get('/inicio/'),
+    'ver_stock': _get('/stock/'),
+    'listar_donaciones': _get('/donaciones/listar/'),
+    'ver_donacion': _get(lambda: f'/donaciones/ver/{_donacion().id}/'),
+    'registrar_donacion': _registrar_donacion,
+    'registrar_donacion_articulos_nuevos': _registrar_donacion_articulos_nuevos,
+    'listar_entregas': _get('/entregas/listar/'),
+    'ver_entrega': _get(lambda: f'/entregas/ver/{_entrega().id}/'),
+    'registrar_entrega': _registrar_entrega,
+    'seguimiento_publico': _get(lambda: f'/seguimiento/{_donacion().uuid_seguimiento}/'),
+    'seguimiento_publico_filtro_frio': _filtro_frio(lambda: f'/seguimiento/{_donacion().uuid_seguimiento}/'),
+    'api_donaciones_list': _get('/api/donaciones/'),
+    'api_donaciones_retrieve': _get(lambda: f'/api/donaciones/{_donacion().id}/'),
+    'api_donaciones_publico_uuid': _get(
+        lambda: f'/api/donaciones/publico/uuid/{_donacion().uuid_seguimiento}/'
+    ),
+    'api_entregas_list': _get('/api/entregas/'),
+    'api_entregas_retrieve': _get(lambda: f'/api/entregas/{_entrega().id}/'),
+    'api_detalle_entregas_list': _get('/api/detalle-entregas/'),
+    'api_articulos_list': _get('/api/articulos/'),
+    'api_donantes_list': _get('/api/donantes/'),
+    'api_beneficiarios_list': _get('/api/beneficiarios/'),
+    'api_seguimiento_publico': _get(lambda: f'/api/seguimiento/{_donacion().uuid_seguimiento}/'),
+    'api_seguimiento_publico_filtro_frio': _filtro_frio(
+        lambda: f'/api/seguimiento/{_donacion().uuid_seguimiento}/'
+    ),
+    'api_donaciones_publico_uuid_filtro_frio': _filtro_frio(
+        lambda: f'/api/donaciones/publico/uuid/{_donacion().uuid_seguimiento}/'
+    ),
+    'api_lectura_donaciones': _get('/api/lectura/donaciones/'),
+    'api_lectura_entregas': _get('/api/lectura/entregas/'),
+    'api_lectura_articulos': _get('/api/lectura/articulos/'),
+    'api_stock_pronostico': _get('/api/stock/pronostico/'),
+    'api_stock_historico': _get(
+        lambda: f'/api/stock/historico/?fecha={timezone.localdate() - timedelta(days=30)}&categoria=ALIMENTOS'
+    ),
+}
+
+
+class PresupuestoConsultasTests(TestCase):
+    def setUp(self):
+        invalidar_catalogo()
+        # Como wsgi.py / asgi.py: el filtro se construye al iniciar, no en la primera petición
+        filtro_uuid.construir()
+        self.contador = 0
+        usuario = User.objects.create_superuser('presupuesto', 'presupuesto@example.com', 'presupuesto')
+        self.client.force_login(usuario)
+
+    def test_presupuestos_independientes_del_tamano(self):
+        generados = 0
+        for tamano in TAMANOS:
+            generar(**escala(tamano - generados), semilla=tamano)
+            generados = tamano
+            _ultimas['donacion'] = Donacion.objects.order_by('-id').first()
+            _ultimas['entrega'] = Entrega.objects.order_by('-id').first()
+            for nombre, caso in CASOS.items():
+                with self.subTest(caso=nombre, donaciones=tamano):
+                    with CaptureQueriesContext(connection) as consultas:
+                        response = caso(self)
+                    self.assertLess(response.status_code, 400)
+                    maximo = presupuesto_de(response.wsgi_request)
+                    self.assertIsNotNone(maximo, f"{nombre} no declara presupuesto de consultas")
+                    self.assertLessEqual(
+                        len(consultas), maximo,
+                        f"{nombre}: {len(consultas)} consultas con {tamano} donaciones (máximo {maximo})",
+                    )
+
+
+# --------------------
+# Archivos estáticos precomprimidos
+# --------------------
+class EstaticosTests(SimpleTestCase):
+    def setUp(self):
+        carpeta = tempfile.TemporaryDirectory()
+        self.addCleanup(carpeta.cleanup)
+        self.raiz = carpeta.name
+        for nombre, contenido in (
+            ('app.css', b'body{}'),
+            ('app.css.gz', b'gzip'),
+            ('app.css.br', b'brotli'),
+            ('solo_gz.js', b'var a;'),
+            ('solo_gz.js.gz', b'gzip'),
+            ('logo.png', b'png'),
+        ):
+            with open(os.path.join(self.raiz, nombre), 'wb') as archivo:
+                archivo.write(contenido)
+        ajustes = override_settings(STATIC_ROOT=self.raiz, STATIC_URL='/static/')
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.middleware = EstaticosMiddleware(lambda request: HttpResponse('vista'))
+
+    def _get(self, ruta, **extra):
+        response = self.middleware(RequestFactory().get(ruta, **extra))
+        contenido = b''.join(response.streaming_content) if response.streaming else response.content
+        response.close()
+        return response, contenido
+
+    def test_variante_segun_accept_encoding(self):
+        casos = (
+            ('gzip, deflate, br', 'br', b'brotli'),
+            ('gzip', 'gzip', b'gzip'),
+            ('', None, b'body{}'),
+        )
+        for aceptadas, codificacion, esperado in casos:
+            with self.subTest(accept_encoding=aceptadas):
+                response, contenido = self._get('/static/app.css', HTTP_ACCEPT_ENCODING=aceptadas)
+                self.assertEqual(contenido, esperado)
+                self.assertEqual(response.get('Content-Encoding'), codificacion)
+                self.assertEqual(response['Content-Type'], 'text/css')
+                self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_sin_variante_br_usa_gzip(self):
+        response, contenido = self._get('/static/solo_gz.js', HTTP_ACCEPT_ENCODING='br, gzip')
+        self.assertEqual(contenido, b'gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_no_comprimibles_sin_vary(self):
+        response, contenido = self._get('/static/logo.png', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(contenido, b'png')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertFalse(response.has_header('Vary'))
+
+    def test_cache_inmutable_solo_con_hash(self):
+        response, _ = self._get('/static/app.css')
+        self.assertEqual(response['Cache-Control'], CACHE_SIN_HASH)
+        self.middleware.con_hash = {'app.css'}
+        response, _ = self._get('/static/app.css')
+        self.assertEqual(response['Cache-Control'], CACHE_INMUTABLE)
+
+    def test_collectstatic_genera_variantes_solo_si_convienen(self):
+        almacen = EstaticosComprimidos(location=self.raiz)
+        contenido = b'.fila { color: red; }\n' * 100
+        with open(os.path.join(self.raiz, 'grande.css'), 'wb') as archivo:
+            archivo.write(contenido)
+        almacen._comprimir('grande.css')
+        almacen._comprimir('solo_gz.js')
+        with open(os.path.join(self.raiz, 'grande.css.gz'), 'rb') as archivo:
+            self.assertEqual(gzip.decompress(archivo.read()), contenido)
+        # Bajo TAMANO_MINIMO no se generan variantes
+        self.assertFalse(os.path.exists(os.path.join(self.raiz, 'solo_gz.js.br')))
+
+    def test_no_modificado_y_rutas_ajenas(self):
+        response, _ = self._get('/static/app.css')
+        response, _ = self._get('/static/app.css', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+        for ruta in ('/static/no_existe.css', '/static/../settings.py', '/inicio/'):
+            with self.subTest(ruta=ruta):
+                _, contenido = self._get(ruta)
+                self.assertEqual(contenido, b'vista')
+
+
+# --------------------
+# Caché de páginas públicas
+# --------------------
+@override_settings(CACHE_PAGINAS_ACTIVA=True)
+class CachePaginasTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        filtro_uuid.construir()
+        donante = Donante.objects.create(rut=formatear(9_100_000), nombre='Pagina')
+        self.donacion = Donacion.objects.create(donante=donante)
+        self.url = f'/seguimiento/{self.donacion.uuid_seguimiento}/'
+
+    def test_anonimo_se_cachea(self):
+        self.assertEqual(self.client.get('/')['X-Cache-Pagina'], 'MISS')
+        with self.assertNumQueries(0):
+            response = self.client.get('/')
+        self.assertEqual(response['X-Cache-Pagina'], 'HIT')
+        self.assertEqual(response.status_code, 200)
+
+    def test_omitida_con_sesion_o_query_string(self):
+        self.client.get(self.url)
+        self.assertEqual(self.client.get(f'{self.url}?x=1').get('X-Cache-Pagina'), None)
+        usuario = User.objects.create_user('pagina', password='pagina')
+        self.client.force_login(usuario)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Cache-Pagina', response)
+
+    def test_cambio_de_estado_purga_el_seguimiento(self):
+        self.assertEqual(self.client.get(self.url)['X-Cache-Pagina'], 'MISS')
+        self.assertEqual(self.client.get(self.url)['X-Cache-Pagina'], 'HIT')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.donacion.actualizar_estado('EN_PROCESO', "Purga")
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Cache-Pagina'], 'MISS')
+        self.assertContains(response, "Purga")
+
+    def test_purgar_paginas_invalida_todas_las_rutas(self):
+        self.client.get('/')
+        self.client.get(self.url)
+        purgar_paginas('landing')
+        self.assertEqual(self.client.get('/')['X-Cache-Pagina'], 'MISS')
+        self.assertEqual(self.client.get(self.url)['X-Cache-Pagina'], 'HIT')
+
+    @override_settings(CACHE_PAGINAS_ACTIVA=False)
+    def test_desactivada(self):
+        self.client.get(self.url)
+        self.assertNotIn('X-Cache-Pagina', self.client.get(self.url))
+
+
+# --------------------
+# JSON rápido y gzip de la API
+# --------------------
+class RenderersTests(SimpleTestCase):
+    DATOS = {
+        'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        'fecha': timezone.localdate(),
+        'momento': timezone.now(),
+        'cantidad': Decimal('12.50'),
+        'plazo': timedelta(days=1, seconds=5),
+        'texto': gettext_lazy('Recibido'),
+        'anidado': [{1: 'clave entera', 'lista': (1, 2)}],
+        'nulo': None,
+    }
+
+    def _ida_y_vuelta(self):
+        contenido = JSONRapidoRenderer().render(self.DATOS)
+        return contenido, JSONRapidoParser().parse(io.BytesIO(contenido))
+
+    def test_mismo_resultado_que_drf(self):
+        esperado = json.loads(JSONRenderer().render(self.DATOS))
+        contenido, leido = self._ida_y_vuelta()
+        self.assertEqual(json.loads(contenido), esperado)
+        self.assertEqual(leido, esperado)
+        self.assertEqual(leido['momento'], esperado['momento'])
+        self.assertTrue(leido['momento'].endswith('Z'))
+        self.assertEqual(leido['cantidad'], 12.5)
+        self.assertEqual(leido['uuid'], str(self.DATOS['uuid']))
+
+    def test_sin_orjson_usa_drf(self):
+        esperado = json.loads(JSONRenderer().render(self.DATOS))
+        with mock.patch('gestion_donaciones.renderers.orjson', None):
+            _, leido = self._ida_y_vuelta()
+        self.assertEqual(leido, esperado)
+
+    def test_json_invalido(self):
+        with self.assertRaises(ParseError):
+            JSONRapidoParser().parse(io.BytesIO(b'{"a": '))
+
+
+class GzipAPITests(SimpleTestCase):
+    def _respuesta(self, path, tamano):
+        middleware = GzipAPIMiddleware(lambda request: HttpResponse(b'a' * tamano, content_type='application/json'))
+        return middleware(RequestFactory().get(path, HTTP_ACCEPT_ENCODING='gzip'))
+
+    @override_settings(API_GZIP_MINIMO=1024)
+    def test_umbral(self):
+        self.assertFalse(self._respuesta('/api/donaciones/', 1023).has_header('Content-Encoding'))
+        response = self._respuesta('/api/donaciones/', 1024)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), b'a' * 1024)
+
+    @override_settings(API_GZIP_MINIMO=2048)
+    def test_umbral_configurable_y_solo_api(self):
+        self.assertFalse(self._respuesta('/api/donaciones/', 1024).has_header('Content-Encoding'))
+        self.assertFalse(self._respuesta('/inicio/', 4096).has_header('Content-Encoding'))
+
+
+# --------------------
+# Listados asíncronos de solo lectura
+# --------------------
+# Hasher rápido: cada petición con Basic verifica la contraseña
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ListadosAsincronosTests(TestCase):
+    URLS = ('/api/lectura/donaciones/', '/api/lectura/entregas/', '/api/lectura/articulos/')
+
+    def setUp(self):
+        User.objects.create_user('lectura', password='lectura')
+
+    def _basic(self, clave):
+        credenciales = base64.b64encode(f'lectura:{clave}'.encode()).decode()
+        return {'HTTP_AUTHORIZATION': f'Basic {credenciales}'}
+
+    def test_mismas_credenciales_que_los_viewsets(self):
+        # El listado DRF equivalente de cada caso debe responder lo mismo
+        casos = (
+            ('basic', self._basic('lectura'), 200),
+            ('basic_invalida', self._basic('otra'), 403),
+            ('anonimo', {}, 403),
+        )
+        for nombre, cabeceras, esperado in casos:
+            for url in self.URLS:
+                with self.subTest(caso=nombre, url=url):
+                    response = self.client.get(url, **cabeceras)
+                    self.assertEqual(response.status_code, esperado)
+                    drf = self.client.get(url.replace('/lectura', ''), **cabeceras)
+                    self.assertEqual(response.status_code, drf.status_code)
+                    if esperado != 200:
+                        self.assertEqual(response.json(), drf.json())
+
+    def test_sesion(self):
+        self.client.login(username='lectura', password='lectura')
+        for url in self.URLS:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+
+# --------------------
+# Límites de tasa
+# --------------------
+class LimitesTasaTests(TestCase):
+    def setUp(self):
+        # Los cubos en memoria sobreviven al rollback: se vacían antes y después
+        limites._memoria.limpiar()
+        self.addCleanup(limites._memoria.limpiar)
+        filtro_uuid.construir()
+        donante = Donante.objects.create(rut=formatear(9_200_000), nombre='Limite')
+        self.url = f'/seguimiento/{Donacion.objects.create(donante=donante).uuid_seguimiento}/'
+
+    def _ip(self, num_proxies, **meta):
+        request = RequestFactory().get('/', REMOTE_ADDR='10.0.0.1', **meta)
+        with override_settings(LIMITES_NUM_PROXIES=num_proxies):
+            return limites.ip_cliente(request)
+
+    def test_ip_segun_proxies_de_confianza(self):
+        reenviada = {'HTTP_X_FORWARDED_FOR': '6.6.6.6, 1.2.3.4'}
+        self.assertEqual(self._ip(1, **reenviada), '1.2.3.4')
+        self.assertEqual(self._ip(2, **reenviada), '6.6.6.6')
+        self.assertEqual(self._ip(5, **reenviada), '6.6.6.6')
+        self.assertEqual(self._ip(0, **reenviada), '10.0.0.1')
+        self.assertEqual(self._ip(1), '10.0.0.1')
+
+    def test_por_defecto_un_proxy(self):
+        self.assertEqual(settings.LIMITES_NUM_PROXIES, 1)
+
+    @override_settings(LIMITES_TASA={'seguimiento': {'capacidad': 2, 'por_minuto': 1}})
+    def test_cubo_por_ip_real_y_429(self):
+        for _ in range(2):
+            self.assertEqual(self.client.get(self.url, HTTP_X_FORWARDED_FOR='1.1.1.1').status_code, 200)
+        response = self.client.get(self.url, HTTP_X_FORWARDED_FOR='1.1.1.1')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+        # Otro cliente detrás del mismo proxy tiene su propio cubo
+        self.assertEqual(self.client.get(self.url, HTTP_X_FORWARDED_FOR='2.2.2.2').status_code, 200)
+        response = self.client.get(
+            self.url.replace('/seguimiento/', '/api/seguimiento/'), HTTP_X_FORWARDED_FOR='1.1.1.1'
+        )
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('detail', response.json())
+
+    @override_settings(LIMITES_TASA={'seguimiento': {'capacidad': 1, 'por_minuto': 1}})
+    def test_usuario_autenticado_usa_su_cubo(self):
+        self.client.force_login(User.objects.create_user('limite'))
+        self.assertEqual(self.client.get(self.url, HTTP_X_FORWARDED_FOR='1.1.1.1').status_code, 200)
+        self.assertEqual(self.client.get(self.url, HTTP_X_FORWARDED_FOR='3.3.3.3').status_code, 429)
+
+
+class BenchmarkTests(TransactionTestCase):
+    @override_settings(
+        LIMITES_TASA_ACTIVOS=True, LIMITES_TASA={'seguimiento': {'capacidad': 30, 'por_minuto': 1}}
+    )
+    def test_escala_chica_sin_limites(self):
+        # 2 x 16 consultas de seguimiento del mismo cliente superan la ráfaga de 30
+        casos = ['registrar_donacion', 'seguimiento_publico', 'api_seguimiento_publico']
+        comando = Benchmark(stdout=io.StringIO())
+        resultados = comando.medir([30], casos, {'repeticiones': 16, 'semilla': 1})
+        medidos = resultados['escalas']['30']['casos']
+        self.assertEqual(set(medidos), set(casos))
+        for nombre in casos:
+            self.assertGreater(medidos[nombre]['consultas_max'], 0)
+        self.assertTrue(settings.LIMITES_TASA_ACTIVOS)
+
+
+# --------------------
+# Esquema OpenAPI
+# --------------------
+class EsquemaAPITests(SimpleTestCase):
+    def _respuesta(self, ruta):
+        esquema = SchemaGenerator().get_schema(request=None, public=True)
+        return esquema['paths'][ruta]['get']['responses']['200']['content']['application/json']['schema']
+
+    def test_stock_historico_documenta_su_respuesta(self):
+        self.assertEqual(self._respuesta('/api/stock/historico/'), {'$ref': '#/components/schemas/StockHistorico'})
+
+    def test_stock_pronostico_documenta_su_respuesta(self):
+        self.assertEqual(self._respuesta('/api/stock/pronostico/'), {'$ref': '#/components/schemas/Pronostico'})
+
+
+# --------------------
+# Filtro de UUIDs de seguimiento
+# --------------------
+@override_settings(CACHE_COMPARTIDA=True)
+class FiltroUUIDTests(TestCase):
+    URLS = ('/seguimiento/{}/', '/api/seguimiento/{}/', '/api/donaciones/publico/uuid/{}/')
+
+    def setUp(self):
+        filtro_uuid.construir()
+
+    def test_uuid_desconocido_responde_404_sin_consultas(self):
+        for url in self.URLS:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as consultas:
+                    response = self.client.get(url.format(uuid.uuid4()))
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(len(consultas), 0)
+
+    def test_uuid_nuevo_visible_de_inmediato(self):
+        donante = Donante.objects.create(rut='11111111-1', nombre='Filtro')
+        donacion = Donacion.objects.create(donante=donante)
+        for url in self.URLS:
+            with self.subTest(url=url):
+                response = self.client.get(url.format(donacion.uuid_seguimiento))
+                self.assertEqual(response.status_code, 200)
+
+    def test_recarga_ve_filas_confirmadas_fuera_de_orden(self):
+        donante = Donante.objects.create(rut='11111111-1', nombre='Filtro')
+        # Creadas por "otro worker": este proceso no recibe sus signals
+        with mock.patch('gestion_donaciones.signals.agregar_uuid_filtro'):
+            primera = Donacion.objects.create(donante=donante)
+            segunda = Donacion.objects.create(donante=donante)
+        filtro_uuid._marcar_insert()
+        # La recarga anterior ya leyó la segunda cuando la primera aún no confirmaba
+        filtro_uuid.agregar(segunda.uuid_seguimiento)
+        filtro_uuid._estado.ultimo_id['Donacion'] = segunda.id
+        filtro_uuid._estado.refrescado = 0
+        self.assertTrue(filtro_uuid.puede_existir(primera.uuid_seguimiento))
+
+    def test_uuid_insertado_por_otro_worker_no_se_descarta(self):
+        donante = Donante.objects.create(rut='11111111-1', nombre='Filtro')
+        este_worker = filtro_uuid._estado
+        with mock.patch.object(filtro_uuid, '_estado', filtro_uuid._EstadoFiltro()):
+            filtro_uuid.construir()
+            with self.captureOnCommitCallbacks(execute=True):
+                donacion = Donacion.objects.create(donante=donante)
+        self.assertNotIn(donacion.uuid_seguimiento, este_worker.filtro)
+
+        # Dentro de FILTRO_UUID_REFRESCO no se recarga, pero la versión cambió: decide la base
+        for url in self.URLS:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url.format(donacion.uuid_seguimiento)).status_code, 200)
+
+        # Pasado el intervalo se recarga y los desconocidos vuelven a descartarse sin consultas
+        este_worker.refrescado = 0
+        self.assertTrue(filtro_uuid.puede_existir(donacion.uuid_seguimiento))
+        with self.assertNumQueries(0):
+            self.assertFalse(filtro_uuid.puede_existir(uuid.uuid4()))
+
+    @override_settings(CACHE_COMPARTIDA=False)
+    def test_sin_cache_compartida_no_descarta_entre_recargas(self):
+        with self.assertNumQueries(0):
+            self.assertTrue(filtro_uuid.puede_existir(uuid.uuid4()))
+        filtro_uuid._estado.refrescado = 0
+        self.assertFalse(filtro_uuid.puede_existir(uuid.uuid4()))
+
+    def test_ventana_no_cuenta_dos_veces(self):
+        donante = Donante.objects.create(rut='11111111-1', nombre='Filtro')
+        Donacion.objects.create(donante=donante)
+        filtro_uuid.construir()
+        elementos = filtro_uuid._estado.filtro.elementos
+        filtro_uuid._refrescar()
+        filtro_uuid._refrescar()
+        self.assertEqual(filtro_uuid._estado.filtro.elementos, elementos)
+
+
+# --------------------
+# RUT normalizado
+# --------------------
+class RutTests(TestCase):
+    def setUp(self):
+        invalidar_catalogo()
+        usuario = User.objects.create_superuser('rut', 'rut@example.com', 'rut')
+        self.client.force_login(usuario)
+
+    def _donar(self, rut_donante):
+        return self.client.post('/donaciones/registrar/', {
+            'tipo_donante': 'INDIVIDUAL',
+            'rut_donante': rut_donante,
+            'nombre_donante': 'Rut',
+            'articulo[]': ['Arroz'],
+            'categoria[]': ['ALIMENTOS'],
+            'unidad_medida[]': ['KG'],
+            'descripcion_articulo[]': [''],
+            'cantidad_donada[]': ['1'],
+            'fecha_vencimiento[]': [''],
+        })
+
+    def test_variantes_del_mismo_rut_son_un_donante(self):
+        for variante in ('12.345.678-5', '12345678-5', '123456785'):
+            self._donar(variante)
+        donante = Donante.objects.get()
+        self.assertEqual((donante.rut, donante.rut_cuerpo, donante.rut_dv), ('12345678-5', 12345678, '5'))
+        self.assertEqual(Donacion.objects.filter(donante=donante).count(), 3)
+
+    def test_digito_verificador_incorrecto_se_rechaza(self):
+        self._donar('12.345.678-9')
+        self.assertFalse(Donante.objects.exists())
+
+    def test_admin_rechaza_rut_repetido(self):
+        Donante.objects.create(rut='12345678-5', nombre='Existente')
+        Beneficiario.objects.create(rut='12345678-5', nombre='Existente', direccion='Calle 1')
+        for url, datos in (
+            ('/admin/gestion_donaciones/donante/add/', {'tipoDonante': 'INDIVIDUAL', 'telefono': ''}),
+            ('/admin/gestion_donaciones/beneficiario/add/', {'direccion': 'Calle 2', 'telefono': ''}),
+        ):
+            with self.subTest(url=url):
+                response = self.client.post(url, {'rut': '12.345.678-5', 'nombre': 'Repetido', **datos})
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('rut', response.context['adminform'].form.errors)
+        self.assertEqual(Donante.objects.count(), 1)
+        self.assertEqual(Beneficiario.objects.count(), 1)
+
+    def test_admin_busca_por_rut_en_cualquier_formato(self):
+        donante = Donante.objects.create(rut='12345678-5', nombre='Buscado')
+        Donante.objects.create(rut='11111111-1', nombre='Otro')
+        for termino in ('12.345.678-5', '12345678-5', '12.345.678', 'Buscado'):
+            with self.subTest(termino=termino):
+                response = self.client.get('/admin/gestion_donaciones/donante/', {'q': termino})
+                self.assertEqual(list(response.context['cl'].result_list), [donante])
+
+
+# --------------------
+# Duplicados
+# --------------------
+class DuplicadosTests(TestCase):
+    def test_fusiona_variantes_y_reasigna_donaciones(self):
+        original = Donante.objects.create(rut='12.345.678-5', nombre='Ximena', apellido='González', email='xg@example.com')
+        # RUT ingresado sin guion: se lee como 1234567-8
+        variante = Donante.objects.create(rut='12345678', nombre='jimena', apellido='gonzales', telefono='555')
+        homonimo = Donante.objects.create(rut='7654321-6', nombre='Ximena', apellido='González')
+        Donacion.objects.create(donante=variante)
+
+        grupos = buscar_duplicados(Donante)
+        self.assertEqual([(g[0], g[1]) for g in grupos], [(original.id, [variante.id])])
+
+        self.assertEqual(fusionar(Donante, grupos), 1)
+        original.refresh_from_db()
+        self.assertEqual(original.telefono, '555')
+        self.assertEqual(Donacion.objects.get().donante_id, original.id)
+        self.assertTrue(Donante.objects.filter(id=homonimo.id).exists())
+
+
+# --------------------
+# Catálogo de artículos
+# --------------------
+class CatalogoTests(TestCase):
+    def setUp(self):
+        invalidar_catalogo()
+        usuario = User.objects.create_superuser('catalogo', 'catalogo@example.com', 'catalogo')
+        self.client.force_login(usuario)
+
+    def test_variantes_del_nombre_son_un_articulo(self):
+        self.client.post('/donaciones/registrar/', {
+            'tipo_donante': 'INDIVIDUAL',
+            'rut_donante': formatear(9_000_000),
+            'nombre_donante': 'Catalogo',
+            'articulo[]': ['Azúcar', ' azucar', 'AZÚCAR  '],
+            'categoria[]': ['ALIMENTOS'] * 3,
+            'unidad_medida[]': ['KG'] * 3,
+            'descripcion_articulo[]': [''] * 3,
+            'cantidad_donada[]': ['1', '2', '3'],
+            'fecha_vencimiento[]': [''] * 3,
+        })
+        articulo = ArticuloDonado.objects.get()
+        self.assertEqual((articulo.nombreObjeto, articulo.clave, articulo.cantidad), ('Azúcar', 'azucar', 6))
+        self.assertEqual(DetalleDonacion.objects.get().cantidad, 6)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(resolver_articulo('AZUCAR').id, articulo.id)
+
+    def test_articulo_creado_por_otro_proceso(self):
+        resolver_articulo('Arroz')
+        # Otro worker crea el artículo: este proceso aún no lo tiene en su catálogo
+        lentejas = ArticuloDonado.objects.create(nombreObjeto='Lentejas')
+        self.assertEqual(resolver_articulo('LENTEJAS').id, lentejas.id)
+        self.assertEqual(ArticuloDonado.objects.filter(clave='lentejas').count(), 1)
+
+    def test_admin_rechaza_nombre_repetido(self):
+        ArticuloDonado.objects.create(nombreObjeto='Arroz')
+        response = self.client.post('/admin/gestion_donaciones/articulodonado/add/', {
+            'nombreObjeto': 'ARROZ ',
+            'descripcion': '',
+            'cantidad': 0,
+            'categoria': 'OTROS',
+            'unidad_medida': 'UNIDAD',
+            'fechaVencimiento': '',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('nombreObjeto', response.context['adminform'].form.errors)
+        self.assertEqual(ArticuloDonado.objects.count(), 1)
+
+
+class CatalogoObsoletoTests(TransactionTestCase):
+    def test_articulo_eliminado_por_otro_proceso(self):
+        # Transacción real: SQLite verifica la clave foránea recién al confirmar
+        invalidar_catalogo()
+        self.client.force_login(User.objects.create_superuser('obsoleto', 'obsoleto@example.com', 'obsoleto'))
+        eliminado = resolver_articulo('Arroz', {'categoria': 'ALIMENTOS'}).id
+        # Otro worker lo elimina: la invalidación no llega a este catálogo
+        with mock.patch('gestion_donaciones.signals.invalidar_catalogo'):
+            ArticuloDonado.objects.filter(id=eliminado).delete()
+
+        # El reintento resuelve las líneas dos veces: excede el presupuesto a propósito
+        with self.assertLogs('gestion_donaciones', 'WARNING'):
+            response = self.client.post('/donaciones/registrar/', {
+                'tipo_donante': 'INDIVIDUAL',
+                'rut_donante': formatear(9_300_000),
+                'nombre_donante': 'Obsoleto',
+                'articulo[]': ['Arroz'],
+                'categoria[]': ['ALIMENTOS'],
+                'unidad_medida[]': ['KG'],
+                'descripcion_articulo[]': [''],
+                'cantidad_donada[]': ['4'],
+                'fecha_vencimiento[]': [''],
+            })
+        self.assertEqual(response.status_code, 302)
+        articulo = ArticuloDonado.objects.get()
+        self.assertNotEqual(articulo.id, eliminado)
+        self.assertEqual((articulo.clave, articulo.cantidad), ('arroz', 4))
+        self.assertEqual(DetalleDonacion.objects.get().articulo_id, articulo.id)
+
+
+class EdicionTests(TestCase):
+    def setUp(self):
+        invalidar_catalogo()
+        usuario = User.objects.create_superuser('edicion', 'edicion@example.com', 'edicion')
+        self.client.force_login(usuario)
+        self.client.post('/donaciones/registrar/', {
+            'tipo_donante': 'INDIVIDUAL',
+            'rut_donante': formatear(8_000_000),
+            'nombre_donante': 'Edicion',
+            'articulo[]': ['Arroz', 'Leche'],
+            'categoria[]': ['ALIMENTOS'] * 2,
+            'unidad_medida[]': ['UNIDAD'] * 2,
+            'descripcion_articulo[]': [''] * 2,
+            'cantidad_donada[]': ['10', '5'],
+            'fecha_vencimiento[]': [''] * 2,
+        })
+        self.donacion = Donacion.objects.get()
+        self.arroz = ArticuloDonado.objects.get(clave='arroz')
+        self.leche = ArticuloDonado.objects.get(clave='leche')
+        self.client.post('/entregas/registrar/', {
+            'rut_beneficiario': formatear(7_000_000),
+            'nombre_beneficiario': 'Edicion',
+            'direccion_beneficiario': 'Calle 1',
+            'nombre_responsable': 'Edicion',
+            'articulo[]': [str(self.arroz.id)],
+            'cantidad[]': ['4'],
+        })
+        self.entrega = Entrega.objects.get()
+
+    def _editar_entrega(self, articulos, cantidades):
+        return self.client.post(f'/entregas/editar/{self.entrega.id}/', {
+            'nombre_beneficiario': 'Edicion',
+            'direccion_beneficiario': 'Calle 1',
+            'nombre_responsable': 'Edicion',
+            'articulo[]': [str(a) for a in articulos],
+            'cantidad[]': [str(c) for c in cantidades],
+        })
+
+    def _stock(self):
+        return dict(ArticuloDonado.objects.values_list('clave', 'cantidad'))
+
+    def test_editar_entrega_conserva_detalles_y_aplica_delta_neto(self):
+        detalle = self.entrega.detalles.get()
+        self.assertContains(self.client.get(f'/entregas/editar/{self.entrega.id}/'), 'name="detalle_donacion_id[]"')
+        self._editar_entrega([self.arroz.id, self.leche.id], [6, 2])
+
+        self.assertEqual(self.entrega.detalles.get(articulo=self.arroz).id, detalle.id)
+        self.assertEqual(self._stock(), {'arroz': 4, 'leche': 3})
+
+        # Quitar una línea devuelve su stock; pedir más de lo disponible no cambia nada
+        self._editar_entrega([self.arroz.id, self.leche.id], [6, 0])
+        self.assertEqual(self._stock(), {'arroz': 4, 'leche': 5})
+        self._editar_entrega([self.arroz.id], [20])
+        self.assertEqual(self._stock(), {'arroz': 4, 'leche': 5})
+        self.assertEqual(self.entrega.detalles.get().cantidad, 6)
+
+    def test_editar_donacion_con_varias_lineas(self):
+        detalles = {d.articulo_id: d.id for d in self.donacion.detalles.all()}
+        self.assertContains(self.client.get(f'/donaciones/editar/{self.donacion.id}/'), 'name="detalle_id[]"', count=3)
+        self.client.post(f'/donaciones/editar/{self.donacion.id}/', {
+            'articulo[]': ['Arroz', 'Leche', 'Fideos'],
+            'cantidad[]': ['12', '0', '3'],
+            'detalle_id[]': [str(detalles[self.arroz.id]), str(detalles[self.leche.id]), ''],
+        })
+        self.assertEqual(self._stock(), {'arroz': 8, 'leche': 0, 'fideos': 3})
+        self.assertEqual(
+            dict(self.donacion.detalles.values_list('articulo__clave', 'id')),
+            {'arroz': detalles[self.arroz.id], 'fideos': DetalleDonacion.objects.get(articulo__clave='fideos').id},
+        )
+
+        # Lo donado no puede bajar por debajo de lo ya entregado
+        self.client.post(f'/donaciones/editar/{self.donacion.id}/', {
+            'articulo[]': ['Arroz'], 'cantidad[]': ['1'], 'detalle_id[]': [str(detalles[self.arroz.id])],
+        })
+        self.assertEqual(self._stock(), {'arroz': 8, 'leche': 0, 'fideos': 3})
+
+    def test_editar_donacion_rechazada_no_deja_articulos_nuevos(self):
+        detalles = {d.articulo_id: d.id for d in self.donacion.detalles.all()}
+        # Arroz baja por debajo de lo entregado: los nombres nuevos no deben quedar en el catálogo
+        self.client.post(f'/donaciones/editar/{self.donacion.id}/', {
+            'articulo[]': ['Arroz', 'Lentejas', 'Porotos'],
+            'cantidad[]': ['1', '2', '3'],
+            'detalle_id[]': [str(detalles[self.arroz.id]), '', ''],
+        })
+        self.assertEqual(self._stock(), {'arroz': 6, 'leche': 5})
+
+        # El catálogo del proceso no conserva los ids revertidos
+        self.client.post(f'/donaciones/editar/{self.donacion.id}/', {
+            'articulo[]': ['Arroz', 'Lentejas'],
+            'cantidad[]': ['10', '2'],
+            'detalle_id[]': [str(detalles[self.arroz.id]), ''],
+        })
+        self.assertEqual(self._stock(), {'arroz': 6, 'leche': 0, 'lentejas': 2})
+
+
+class ConciliacionTests(TestCase):
+    def test_repara_el_stock_desviado_y_registra_ajuste(self):
+        generar(**escala(20), semilla=1)
+        desviados = list(ArticuloDonado.objects.order_by('id')[:3])
+        for articulo in desviados:
+            ArticuloDonado.objects.filter(id=articulo.id).update(cantidad=articulo.cantidad + 7)
+
+        with CaptureQueriesContext(connection) as consultas:
+            diferencias = list(buscar_diferencias())
+        self.assertEqual([d.id for d in diferencias], [a.id for a in desviados])
+        self.assertEqual(len(consultas), 3)
+
+        call_command('conciliar_stock', '--reparar', stdout=io.StringIO())
+        self.assertEqual(list(buscar_diferencias()), [])
+        self.assertEqual(
+            sorted(AjusteStock.objects.values_list('articulo_id', 'cantidad_anterior', 'cantidad_nueva')),
+            [(d.id, d.actual, max(d.esperado, 0)) for d in diferencias],
+        )
+
+    def test_movimiento_entre_la_busqueda_y_la_reparacion_no_se_descuenta(self):
+        generar(**escala(20), semilla=1)
+        desviado, movido = ArticuloDonado.objects.order_by('id')[:2]
+        ArticuloDonado.objects.filter(id=desviado.id).update(cantidad=desviado.cantidad + 7)
+        esperado = stock_esperado()
+
+        # Donación registrada después de leer los totales y antes de leer los artículos
+        donacion = Donacion.objects.create(donante=Donante.objects.first())
+        for articulo in (desviado, movido):
+            DetalleDonacion.objects.create(donacion=donacion, articulo=articulo, cantidad=5)
+        actuales = dict(ArticuloDonado.objects.filter(id__in=[desviado.id, movido.id]).values_list('id', 'cantidad'))
+        diferencias = [
+            Diferencia(a.id, a.nombreObjeto, actuales[a.id], esperado.get(a.id, 0)) for a in (desviado, movido)
+        ]
+
+        self.assertEqual(reparar(diferencias), 1)
+        self.assertEqual(list(buscar_diferencias()), [])
+        self.assertEqual(ArticuloDonado.objects.get(id=movido.id).cantidad, actuales[movido.id])
+        self.assertEqual(
+            list(AjusteStock.objects.values_list('articulo_id', 'cantidad_anterior', 'cantidad_nueva')),
+            [(desviado.id, actuales[desviado.id], actuales[desviado.id] - 7)],
+        )
+
+
+class HistoricoTests(TestCase):
+    def _esperado(self, fecha):
+        """Stock al cierre de 'fecha' deshaciendo uno a uno los movimientos posteriores"""
+        stock = dict(ArticuloDonado.objects.values_list('id', 'cantidad'))
+        for detalle in DetalleDonacion.objects.filter(donacion__fechaDonacion__gt=fecha):
+            stock[detalle.articulo_id] -= detalle.cantidad
+        for detalle in DetalleEntrega.objects.filter(entrega__fechaEntrega__gt=fecha):
+            stock[detalle.articulo_id] += detalle.cantidad
+        return stock
+
+    def test_stock_al_con_y_sin_fotos(self):
+        generar(**escala(40), semilla=2)
+        hoy = timezone.localdate()
+        fechas = [hoy - timedelta(days=d) for d in (1, 20, 45, 90, 200)]
+
+        for fecha in fechas:
+            self.assertEqual(stock_al(fecha), (None, self._esperado(fecha)))
+
+        tomar_foto(hoy - timedelta(days=30))
+        tomar_foto(hoy - timedelta(days=100))
+        categorias = dict(ArticuloDonado.objects.values_list('id', 'categoria'))
+        for fecha in fechas:
+            esperado = self._esperado(fecha)
+            base, cantidades = stock_al(fecha)
+            self.assertEqual(cantidades, esperado)
+            totales = {}
+            for articulo_id, cantidad in esperado.items():
+                totales[categorias[articulo_id]] = totales.get(categorias[articulo_id], 0) + cantidad
+            self.assertEqual(totales_al(fecha), (base, totales))
+        self.assertEqual(stock_al(hoy - timedelta(days=45))[0], hoy - timedelta(days=30))
+
+
+class AlertasStockTests(TestCase):
+    def setUp(self):
+        invalidar_catalogo()
+        usuario = User.objects.create_superuser('alertas', 'alertas@example.com', 'alertas')
+        self.client.force_login(usuario)
+        UmbralStock.objects.create(categoria='ALIMENTOS', minimo=5)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/donaciones/registrar/', {
+                'tipo_donante': 'INDIVIDUAL',
+                'rut_donante': formatear(6_000_000),
+                'nombre_donante': 'Alertas',
+                'articulo[]': ['Arroz'],
+                'categoria[]': ['ALIMENTOS'],
+                'unidad_medida[]': ['KG'],
+                'descripcion_articulo[]': [''],
+                'cantidad_donada[]': ['8'],
+                'fecha_vencimiento[]': [''],
+            })
+        self.arroz = ArticuloDonado.objects.get(clave='arroz')
+
+    def _entregar(self, cantidad, n):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/entregas/registrar/', {
+                'rut_beneficiario': formatear(3_000_000 + n),
+                'nombre_beneficiario': 'Alertas',
+                'direccion_beneficiario': 'Calle 1',
+                'nombre_responsable': 'Alertas',
+                'articulo[]': [str(self.arroz.id)],
+                'cantidad[]': [str(cantidad)],
+            })
+
+    def test_alerta_unica_mientras_el_stock_sigue_bajo(self):
+        self.assertFalse(AlertaStock.objects.exists())
+
+        self._entregar(4, 1)
+        self._entregar(1, 2)
+        alerta = AlertaStock.objects.get()
+        self.assertEqual((alerta.cantidad, alerta.minimo, alerta.articulo_abierto), (4, 5, self.arroz.id))
+
+        # Un umbral propio del artículo reemplaza al de la categoría
+        with self.captureOnCommitCallbacks(execute=True):
+            UmbralStock.objects.create(articulo=self.arroz, minimo=2)
+        alerta.refresh_from_db()
+        self.assertIsNotNone(alerta.resuelta)
+        self.assertIsNone(alerta.articulo_abierto)
+
+        self._entregar(2, 3)
+        self.assertEqual(AlertaStock.objects.filter(resuelta__isnull=True).count(), 1)
+
+    def _duplicado(self, nombre, minimo):
+        duplicado = ArticuloDonado.objects.create(nombreObjeto=nombre, categoria='ALIMENTOS', cantidad=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            UmbralStock.objects.create(articulo=duplicado, minimo=minimo)
+        self.assertTrue(AlertaStock.objects.filter(articulo_abierto=duplicado.id).exists())
+        return duplicado
+
+    def test_fusion_conserva_un_umbral_y_cierra_las_alertas_de_los_duplicados(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            UmbralStock.objects.create(articulo=self.arroz, minimo=4)
+        duplicados = [self._duplicado('Arroz blanco', 6).id, self._duplicado('Arroz grado 1', 3).id]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            fusionar_articulos(ArticuloDonado, self.arroz.id, duplicados)
+
+        self.assertEqual(list(UmbralStock.objects.filter(articulo__isnull=False).values_list('articulo', 'minimo')),
+                         [(self.arroz.id, 4)])
+        self.assertFalse(AlertaStock.objects.filter(articulo_abierto__in=duplicados).exists())
+        # 8 + 1 + 1 sobre el mínimo 4 del conservado: ninguna alerta abierta
+        self.assertFalse(AlertaStock.objects.filter(resuelta__isnull=True).exists())
+        self.assertEqual(AlertaStock.objects.filter(articulo=self.arroz).count(), 2)
+
+    def test_fusion_sin_umbral_propio_toma_el_mayor_de_los_duplicados(self):
+        duplicados = [self._duplicado('Arroz blanco', 20).id, self._duplicado('Arroz grado 1', 3).id]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            fusionar_articulos(ArticuloDonado, self.arroz.id, duplicados)
+
+        self.assertEqual(UmbralStock.objects.get(articulo__isnull=False).articulo_id, self.arroz.id)
+        self.assertEqual(UmbralStock.objects.get(articulo=self.arroz).minimo, 20)
+        alerta = AlertaStock.objects.get(resuelta__isnull=True)
+        self.assertEqual((alerta.articulo_abierto, alerta.cantidad, alerta.minimo), (self.arroz.id, 10, 20))
+
+    def test_umbrales_se_recargan_al_vencer_el_ttl(self):
+        self.assertEqual(alertas.minimo_de(self.arroz.id, 'ALIMENTOS'), 5)
+        # Un cambio que no pasa por el signal (otro proceso sin caché compartida)
+        UmbralStock.objects.filter(categoria='ALIMENTOS').update(minimo=7)
+        self.assertEqual(alertas.minimo_de(self.arroz.id, 'ALIMENTOS'), 5)
+        with override_settings(STOCK_UMBRALES_TTL=0), mock.patch.object(alertas._umbrales, 'cargado', 0.0):
+            self.assertEqual(alertas.minimo_de(self.arroz.id, 'ALIMENTOS'), 7)
+
+
+class PronosticoTests(TestCase):
+    def test_demanda_coincide_con_el_calculo_semana_a_semana(self):
+        generar(**escala(60), semilla=3)
+        semanas, ventana, alfa = pronostico._parametros()
+        hoy = timezone.localdate()
+        hasta = hoy - timedelta(days=hoy.weekday())
+        desde = hasta - timedelta(weeks=semanas)
+
+        historia = {}
+        for detalle in DetalleEntrega.objects.select_related('entrega'):
+            fecha = detalle.entrega.fechaEntrega
+            if desde <= fecha < hasta:
+                fila = historia.setdefault(detalle.articulo_id, [0] * semanas)
+                fila[(fecha - desde).days // 7] += detalle.cantidad
+
+        with self.assertNumQueries(2):
+            datos = pronostico.demanda(forzar=True)
+        for articulo_id, fila in historia.items():
+            suavizada = fila[0]
+            for valor in fila[1:]:
+                suavizada = alfa * valor + (1 - alfa) * suavizada
+            media, obtenida = datos['articulos'][articulo_id]
+            self.assertAlmostEqual(media, sum(fila[-ventana:]) / ventana)
+            self.assertAlmostEqual(obtenida, suavizada)
+
+        with self.assertNumQueries(0):
+            pronostico.demanda()
+
+    @unittest.skipIf(pronostico.np is None, "numpy no está instalado")
+    def test_numpy_y_python_dan_el_mismo_resultado(self):
+        celdas = {(0, 0): 5, (0, 11): 3, (1, 4): 7, (2, 11): 1}
+        categorias = ['ALIMENTOS', 'ROPA', 'ALIMENTOS']
+        por_articulo, por_categoria = pronostico._calcular_numpy(3, categorias, celdas, 12, 4, 0.3)
+        esperado_articulo, esperado_categoria = pronostico._calcular_python(3, categorias, celdas, 12, 4, 0.3)
+        for obtenido, esperado in zip(por_articulo, esperado_articulo):
+            self.assertEqual([round(v, 9) for v in obtenido], [round(v, 9) for v in esperado])
+        self.assertEqual(list(por_categoria), list(esperado_categoria))
+
+
+class AsignacionTests(TestCase):
+    def setUp(self):
+        self.arroz = ArticuloDonado.objects.create(nombreObjeto='Arroz', categoria='ALIMENTOS', cantidad=10)
+        self.jabon = ArticuloDonado.objects.create(nombreObjeto='Jabón', categoria='HIGIENE', cantidad=3)
+
+    def _solicitud(self, n, prioridad, **pedido):
+        beneficiario = Beneficiario.objects.create(rut=formatear(4_000_000 + n), nombre=f'Solicitante {n}')
+        solicitud = Solicitud.objects.create(beneficiario=beneficiario, prioridad=prioridad)
+        for nombre, cantidad in pedido.items():
+            solicitud.detalles.create(articulo=getattr(self, nombre), cantidad=cantidad)
+        return solicitud
+
+    def test_asigna_por_prioridad_y_crea_borradores(self):
+        normal = self._solicitud(1, 3, arroz=6)
+        urgente = self._solicitud(2, 1, arroz=6, jabon=2)
+        baja = self._solicitud(3, 4, jabon=5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            asignaciones = asignar()
+        self.assertEqual(
+            [(a.solicitud_id, a.lineas, a.completa) for a in asignaciones],
+            [
+                (urgente.id, {self.arroz.id: 6, self.jabon.id: 2}, True),
+                (normal.id, {self.arroz.id: 4}, False),
+                (baja.id, {self.jabon.id: 1}, False),
+            ],
+        )
+        self.assertEqual(
+            dict(Solicitud.objects.values_list('id', 'estado')),
+            {urgente.id: 'ASIGNADA', normal.id: 'PARCIAL', baja.id: 'PARCIAL'},
+        )
+        self.assertEqual(
+            sorted(Entrega.objects.filter(estado='PENDIENTE').values_list('solicitud_id', flat=True)),
+            sorted([urgente.id, normal.id, baja.id]),
+        )
+        self.assertEqual(
+            list(ArticuloDonado.objects.order_by('id').values_list('cantidad', flat=True)), [0, 0]
+        )
+        self.assertEqual(AlertaStock.objects.count(), 2)
+
+        # Sin stock nuevo no se asigna nada; al eliminar un borrador su parte vuelve a repartirse
+        self.assertEqual(asignar(), [])
+        Entrega.objects.get(solicitud=urgente).delete()
+        Solicitud.objects.filter(id=urgente.id).update(estado='CANCELADA')
+        asignaciones = asignar()
+        self.assertEqual(
+            [(a.solicitud_id, a.lineas, a.completa) for a in asignaciones],
+            [(normal.id, {self.arroz.id: 2}, True), (baja.id, {self.jabon.id: 2}, False)],
+        )
+        self.assertEqual(Solicitud.objects.get(id=normal.id).estado, 'ASIGNADA')
+        self.assertEqual(
+            sorted(DetalleEntrega.objects.filter(entrega__solicitud=normal).values_list('cantidad', flat=True)), [2, 4]
+        )
+
+    def test_eliminar_o_reducir_un_borrador_reabre_la_solicitud(self):
+        completa = self._solicitud(1, 1, arroz=4)
+        reducida = self._solicitud(2, 2, arroz=6, jabon=2)
+        with self.captureOnCommitCallbacks(execute=True):
+            asignar()
+        self.assertEqual(set(Solicitud.objects.values_list('estado', flat=True)), {'ASIGNADA'})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Entrega.objects.get(solicitud=completa).delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            editar_detalles_entrega(
+                Entrega.objects.get(solicitud=reducida),
+                {self.arroz.id: {'cantidad': 6, 'detalle_donacion_id': None}},
+            )
+        self.assertEqual(
+            dict(Solicitud.objects.values_list('id', 'estado')), {completa.id: 'PENDIENTE', reducida.id: 'PARCIAL'}
+        )
+
+        # Un detalle reducido por su cuenta (admin, API) también deja faltantes
+        detalle = DetalleEntrega.objects.get(entrega__solicitud=reducida)
+        detalle.cantidad = 5
+        with self.captureOnCommitCallbacks(execute=True):
+            detalle.save()
+        self.assertEqual(ArticuloDonado.objects.get(id=self.arroz.id).cantidad, 5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            asignaciones = asignar()
+        self.assertEqual(
+            [(a.solicitud_id, a.lineas, a.completa) for a in asignaciones],
+            [(completa.id, {self.arroz.id: 4}, True), (reducida.id, {self.arroz.id: 1, self.jabon.id: 2}, True)],
+        )
+        self.assertEqual(set(Solicitud.objects.values_list('estado', flat=True)), {'ASIGNADA'})
+
+    def test_consultas_no_dependen_de_la_cantidad_de_solicitudes(self):
+        consultas = []
+        for inicio, n in ((0, 2), (10, 20)):
+            for i in range(n):
+                self._solicitud(inicio + i, 1 + i % 4, arroz=1)
+            ArticuloDonado.objects.filter(id=self.arroz.id).update(cantidad=n)
+            with CaptureQueriesContext(connection) as capturadas:
+                self.assertEqual(len(asignar()), n)
+            consultas.append(len(capturadas))
+        self.assertEqual(consultas[0], consultas[1])
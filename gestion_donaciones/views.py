@@ -5,32 +5,28 @@ from django.contrib import messages
 from django.contrib.auth.models import User, Group
 from django.db.models import Q, Count, Case, When, Value, CharField, Sum
 from django.core.paginator import Paginator
-from django.db import transaction
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
 from django.contrib.auth.hashers import make_password
 from django.urls import reverse
+from django.http import JsonResponse
 from functools import wraps
 from .models import Donante, Beneficiario, ArticuloDonado, Donacion, DetalleDonacion , Entrega, DetalleEntrega
 from gestion_donaciones.emails import enviar_correo_brevo
-
-# --------------------
-# Utilidad: Manejo de sesiones para formularios
-# --------------------
-def save_form_to_session(request, form_name, data):
-    """Guarda los datos del formulario en la sesión"""
-    request.session[f'form_{form_name}'] = data
-
-
-def get_form_from_session(request, form_name):
-    """Recupera los datos del formulario desde la sesión"""
-    return request.session.get(f'form_{form_name}', {})
-
-
-def clear_form_session(request, form_name):
-    """Limpia los datos del formulario de la sesión"""
-    session_key = f'form_{form_name}'
-    if session_key in request.session:
-        del request.session[session_key]
-
+from gestion_donaciones.roles import obtener_roles, es_admin
+from gestion_donaciones.db_router import solo_lectura
+from gestion_donaciones.db_pool import estadisticas_pools
+from gestion_donaciones.sql_metricas import metricas_por_vista
+from gestion_donaciones.presupuestos import presupuesto_consultas
+from gestion_donaciones.cache_paginas import cache_pagina_publica
+from gestion_donaciones.limites import limitar_tasa
+from gestion_donaciones.filtro_uuid import descartar_uuid_desconocido
+from gestion_donaciones.rut import descomponer, formatear
+from gestion_donaciones.catalogo import descartar_catalogo_local, invalidar_catalogo, resolver_articulos
+from gestion_donaciones.edicion import aplicar_stock, editar_detalles_donacion, editar_detalles_entrega
+from gestion_donaciones.signals import ajustes_de_stock_manuales
+from gestion_donaciones.pronostico import demanda, semanas_de_cobertura
+from gestion_donaciones.borradores import guardar_borrador, obtener_borrador, eliminar_borrador
 
 # --------------------
 # Decoradores personalizados
@@ -42,10 +38,7 @@ def adminapp_or_superuser_required(view_func):
     """
     @wraps(view_func)
     def wrapper(request, *args, **kwargs):
-        if request.user.is_superuser:
-            return view_func(request, *args, **kwargs)
-        
-        if request.user.groups.filter(name='AdminApp').exists():
+        if obtener_roles(request.user).es_admin:
             return view_func(request, *args, **kwargs)
         
         messages.error(request, "No tienes permisos para acceder a esta sección.")
@@ -60,13 +53,7 @@ def staff_or_admin_required(view_func):
     """
     @wraps(view_func)
     def wrapper(request, *args, **kwargs):
-        if request.user.is_superuser:
-            return view_func(request, *args, **kwargs)
-        
-        if request.user.groups.filter(name='AdminApp').exists():
-            return view_func(request, *args, **kwargs)
-        
-        if request.user.is_staff:
+        if obtener_roles(request.user).es_staff_o_admin:
             return view_func(request, *args, **kwargs)
         
         messages.error(request, "No tienes permisos para acceder a esta sección.")
@@ -82,6 +69,8 @@ def staff_required(user):
     return user.is_staff
 
 
+@presupuesto_consultas(2)
+@cache_pagina_publica('landing')
 def landing_page(request):
     """Página de inicio pública (landing page)"""
     # Si el usuario ya está autenticado, redirigir al index
@@ -100,17 +89,13 @@ def registro_root(request):
         return redirect('login')
 
     if request.method == 'POST':
-        # Guardar en sesión
-        save_form_to_session(request, 'registro_root', {
-            'username': request.POST.get('username'),
-            'email': request.POST.get('email'),
-        })
-
         username = request.POST.get('username')
         email = request.POST.get('email')
         password = request.POST.get('password')
 
         if not username or not password:
+            # Guardar borrador solo si la validación falla
+            guardar_borrador(request, 'registro_root', {'username': username, 'email': email})
             messages.error(request, "Todos los campos son obligatorios.")
             return redirect('registro_root')
 
@@ -138,18 +123,19 @@ def registro_root(request):
                 mensaje_html=mensaje_html
             )
 
-        clear_form_session(request, 'registro_root')
+        eliminar_borrador(request, 'registro_root')
         messages.success(request, "Cuenta raíz creada exitosamente. Ahora puedes iniciar sesión.")
         return redirect('login')
 
-    # GET - recuperar datos de sesión
-    form_data = get_form_from_session(request, 'registro_root')
+    # GET - recuperar borrador
+    form_data = obtener_borrador(request, 'registro_root')
     return render(request, 'DonacionesApp/Registro/RegistroRoot.html', {'form_data': form_data})
 
 
 # --------------------
 # Autenticación
 # --------------------
+@limitar_tasa('login', metodos=('POST',))
 def login_view(request):
     if request.method == 'POST':
         username = request.POST.get('username')
@@ -171,15 +157,22 @@ def logout_view(request):
 # --------------------
 # Vistas principales
 # --------------------
+@presupuesto_consultas(10)
 @login_required
 def index(request):
-    ultimas_donaciones = Donacion.objects.all().order_by('-fechaDonacion')[:5]
+    ultimas_donaciones = (
+        Donacion.objects.select_related('donante')
+        .prefetch_related('detalles__articulo')
+        .order_by('-fechaDonacion')[:5]
+    )
     return render(request, "DonacionesApp/Main/Index.html", {
         'ultimas_donaciones': ultimas_donaciones
     })
 
 
+@presupuesto_consultas(6)
 @login_required
+@solo_lectura
 def ver_stock(request):
     busqueda = request.GET.get('busqueda', '').strip()
     categoria = request.GET.get('categoria', '').strip()
@@ -212,10 +205,15 @@ def ver_stock(request):
     articulos = articulos.order_by('nivel_stock_calc', 'nombreObjeto')
     total_cantidad = articulos.aggregate(total=Sum('cantidad'))['total'] or 0
 
+    # Demanda semanal estimada (en caché; dos consultas al recalcularla)
+    demanda_articulos = demanda()['articulos']
+
     # Agrupar por categoría para mostrar en UI
     categorias_label = dict(ArticuloDonado.CATEGORIA_CHOICES)
     grouped = {}
     for art in articulos:
+        art.demanda_semanal = demanda_articulos.get(art.id, (0, 0))[1]
+        art.semanas_cobertura = semanas_de_cobertura(art.cantidad, art.demanda_semanal)
         key = art.categoria
         grouped.setdefault(key, {"label": categorias_label.get(key, key), "items": []})
         grouped[key]["items"].append(art)
@@ -241,10 +239,10 @@ def ver_stock(request):
 # Gestión de Usuarios - AdminApp y Superusuarios
 # --------------------
 @login_required
-@user_passes_test(lambda u: u.is_superuser or u.groups.filter(name='AdminApp').exists(), login_url='index')
+@user_passes_test(es_admin, login_url='index')
 def listar_usuarios(request):
     """Lista los usuarios activos."""
-    usuarios = User.objects.filter(is_active=True).order_by('username')
+    usuarios = User.objects.filter(is_active=True).prefetch_related('groups').order_by('username')
     return render(request, "DonacionesApp/usuarios/ListarUsuarios.html", {
         "usuarios": usuarios,
         "papelera": False
@@ -252,18 +250,18 @@ def listar_usuarios(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.is_superuser or u.groups.filter(name='AdminApp').exists(), login_url='index')
+@user_passes_test(es_admin, login_url='index')
 def crear_usuario(request):
     """Crea un nuevo usuario con rol asignado."""
     if request.method == 'POST':
-        # Guardar datos en sesión
-        save_form_to_session(request, 'crear_usuario', {
+        # Borrador que se guarda solo si la validación falla
+        borrador = {
             'username': request.POST.get('username'),
             'first_name': request.POST.get('first_name'),
             'last_name': request.POST.get('last_name'),
             'email': request.POST.get('email'),
             'rol': request.POST.get('rol'),
-        })
+        }
 
         username = request.POST.get('username')
         first_name = request.POST.get('first_name')
@@ -274,15 +272,18 @@ def crear_usuario(request):
 
         # Validaciones básicas
         if not username or not password:
+            guardar_borrador(request, 'crear_usuario', borrador)
             messages.error(request, "El nombre de usuario y la contraseña son obligatorios.")
             return redirect('crear_usuario')
 
         if User.objects.filter(username=username).exists():
+            guardar_borrador(request, 'crear_usuario', borrador)
             messages.error(request, "Ese nombre de usuario ya existe.")
             return redirect('crear_usuario')
 
         # AdminApp no puede crear superusuarios
         if not request.user.is_superuser and rol == 'admin':
+            guardar_borrador(request, 'crear_usuario', borrador)
             messages.error(request, "No tienes permisos para crear usuarios administradores.")
             return redirect('crear_usuario')
 
@@ -324,19 +325,19 @@ def crear_usuario(request):
 
         user.save()
         
-        # Limpiar sesión después del éxito
-        clear_form_session(request, 'crear_usuario')
+        # Descartar borrador después del éxito
+        eliminar_borrador(request, 'crear_usuario')
         
         messages.success(request, f"Usuario '{username}' creado exitosamente con rol '{rol or 'staff'}'.", extra_tags='usuarios')
         return redirect('listar_usuarios')
 
-    # GET - recuperar datos de sesión
-    form_data = get_form_from_session(request, 'crear_usuario')
+    # GET - recuperar borrador
+    form_data = obtener_borrador(request, 'crear_usuario')
     return render(request, "DonacionesApp/usuarios/crearUsuario.html", {'form_data': form_data})
 
 
 @login_required
-@user_passes_test(lambda u: u.is_superuser or u.groups.filter(name='AdminApp').exists(), login_url='index')
+@user_passes_test(es_admin, login_url='index')
 def eliminar_usuario(request, user_id):
     """Desactiva un usuario (lo mueve a la papelera)."""
     usuario = get_object_or_404(User, id=user_id)
@@ -356,10 +357,10 @@ def eliminar_usuario(request, user_id):
 
 
 @login_required
-@user_passes_test(lambda u: u.is_superuser or u.groups.filter(name='AdminApp').exists(), login_url='index')
+@user_passes_test(es_admin, login_url='index')
 def papelera_usuarios(request):
     """Muestra los usuarios desactivados."""
-    usuarios_inactivos = User.objects.filter(is_active=False).order_by('username')
+    usuarios_inactivos = User.objects.filter(is_active=False).prefetch_related('groups').order_by('username')
     return render(request, "DonacionesApp/usuarios/ListarUsuarios.html", {
         "usuarios": usuarios_inactivos,
         "papelera": True
@@ -367,7 +368,7 @@ def papelera_usuarios(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.is_superuser or u.groups.filter(name='AdminApp').exists(), login_url='index')
+@user_passes_test(es_admin, login_url='index')
 def restaurar_usuario(request, user_id):
     """Restaura un usuario desde la papelera."""
     usuario = get_object_or_404(User, id=user_id)
@@ -378,7 +379,7 @@ def restaurar_usuario(request, user_id):
 
 
 @login_required
-@user_passes_test(lambda u: u.is_superuser or u.groups.filter(name='AdminApp').exists(), login_url='index')
+@user_passes_test(es_admin, login_url='index')
 def eliminar_definitivo_usuario(request, user_id):
     """Elimina físicamente un usuario desde la papelera."""
     usuario = get_object_or_404(User, id=user_id)
@@ -396,15 +397,72 @@ def eliminar_definitivo_usuario(request, user_id):
     return redirect('papelera_usuarios')
 
 
+# --------------------
+# Métricas internas - Superusuarios
+# --------------------
+@login_required
+@user_passes_test(lambda u: u.is_superuser, login_url='index')
+def metricas_pool(request):
+    """Estado del pool de conexiones del worker que atiende la petición."""
+    return JsonResponse({'pools': estadisticas_pools()})
+
+
+@login_required
+@user_passes_test(lambda u: u.is_superuser, login_url='index')
+def metricas_sql(request):
+    """Histogramas de consultas y tiempo de base de datos por vista (worker actual)."""
+    return JsonResponse({'vistas': metricas_por_vista()}, json_dumps_params={'ensure_ascii': False})
+
+
 # --------------------
 # Gestión de Donaciones
 # --------------------
+@presupuesto_consultas(5)
 @login_required
+@solo_lectura
 def listar_donaciones(request):
-    donaciones = Donacion.objects.all().order_by('-fechaDonacion')
+    donaciones = (
+        Donacion.objects.select_related('donante')
+        .prefetch_related('detalles')
+        .order_by('-fechaDonacion')
+    )
     return render(request, 'DonacionesApp/donaciones/ListarDonaciones.html', {'donaciones': donaciones})
 
 
+def _lineas_donacion(pedidos, cantidades):
+    """
+    Resuelve en el catálogo los (nombre, defaults) de 'pedidos' (sin consultas
+    si ya existen; los nuevos se crean juntos) y agrupa las cantidades por
+    artículo: "Arroz" y "arroz " son el mismo (un detalle por artículo).
+    """
+    lineas = {}
+    for (nombre_art, _), cantidad, articulo in zip(pedidos, cantidades, resolver_articulos(pedidos)):
+        if articulo.id in lineas:
+            lineas[articulo.id]['cantidad'] += cantidad
+        else:
+            lineas[articulo.id] = {
+                "nombre": nombre_art,
+                "cantidad": cantidad,
+                "unidad": dict(ArticuloDonado.UNIDAD_CHOICES).get(articulo.unidad_medida, articulo.unidad_medida),
+            }
+    return lineas
+
+
+def _crear_detalles_donacion(donacion, lineas):
+    """
+    Un INSERT para todas las líneas y un UPDATE de stock con el total por
+    artículo; las alertas de stock se evalúan una vez para todas.
+    """
+    with transaction.atomic():
+        with ajustes_de_stock_manuales():
+            DetalleDonacion.objects.bulk_create([
+                DetalleDonacion(donacion=donacion, articulo_id=articulo_id, cantidad=linea['cantidad'])
+                for articulo_id, linea in lineas.items()
+            ])
+        aplicar_stock({articulo_id: linea['cantidad'] for articulo_id, linea in lineas.items()})
+
+
+@presupuesto_consultas(20)
 @login_required
 def registrar_donacion(request):
     if request.method == 'POST':
@@ -412,8 +470,8 @@ def registrar_donacion(request):
             messages.info(request, "Formulario cancelado. Tus datos se mantienen.")
             return redirect('listar_donaciones')
 
-        # Guardar en sesión
-        save_form_to_session(request, 'donacion', {
+        # Borrador que se guarda solo si la validación falla
+        borrador = {
             'tipo_donante': request.POST.get('tipo_donante', 'INDIVIDUAL'),
             'rut_donante': request.POST.get('rut_donante', ''),
             'rut_empresa': request.POST.get('rut_empresa', ''),
@@ -436,7 +494,8 @@ def registrar_donacion(request):
             'descripcion_articulo': request.POST.getlist('descripcion_articulo[]'),
             'cantidad_donada': request.POST.getlist('cantidad_donada[]'),
             'fecha_vencimiento': request.POST.getlist('fecha_vencimiento[]'),
-        })
+            'notas_donacion': request.POST.get('notas_donacion', ''),
+        }
 
         # Datos del donante
         tipo_donante = request.POST.get('tipo_donante', 'INDIVIDUAL')
@@ -472,13 +531,21 @@ def registrar_donacion(request):
 
         # Validación
         if not rut_donante:
+            guardar_borrador(request, 'donacion', borrador)
             messages.error(request, "El RUT del donante es obligatorio")
             return redirect('registrar_donacion')
+        try:
+            rut_cuerpo, rut_dv = descomponer(rut_donante)
+        except ValidationError as e:
+            guardar_borrador(request, 'donacion', borrador)
+            messages.error(request, e.messages[0])
+            return redirect('registrar_donacion')
 
-        # Crear o recuperar donante
-        donante, _ = Donante.objects.get_or_create(
-            rut=rut_donante,
+        # Crear o recuperar donante (por el cuerpo del RUT, columna entera indexada)
+        donante, creado = Donante.objects.get_or_create(
+            rut_cuerpo=rut_cuerpo,
             defaults={
+                'rut': formatear(rut_cuerpo, rut_dv),
                 'nombre': nombre_completo, 
                 'apellido': apellido, 
                 'tipoDonante': tipo_donante,
@@ -487,12 +554,16 @@ def registrar_donacion(request):
             }
         )
 
-        # Actualizar datos si el donante ya existía
+        # Actualizar datos si el donante ya existía (solo si cambiaron)
+        cambios = []
         if email and donante.email != email:
             donante.email = email
+            cambios.append('email')
         if telefono and donante.telefono != telefono:
             donante.telefono = telefono
-        donante.save()
+            cambios.append('telefono')
+        if cambios and not creado:
+            donante.save(update_fields=cambios)
 
         # Listas de artículos
         articulos_nombres = request.POST.getlist('articulo[]')
@@ -503,6 +574,7 @@ def registrar_donacion(request):
         fechas_vencimiento = request.POST.getlist('fecha_vencimiento[]')
 
         if not articulos_nombres or not cantidades or len(articulos_nombres) != len(cantidades):
+            guardar_borrador(request, 'donacion', borrador)
             messages.error(request, "Debe ingresar al menos un artículo válido")
             return redirect('registrar_donacion')
 
@@ -513,8 +585,8 @@ def registrar_donacion(request):
             notas=request.POST.get('notas_donacion', '')
         )
 
-        productos_creados = 0
-        productos_para_email = []
+        # Líneas válidas del formulario, resueltas juntas en el catálogo
+        pedidos, cantidades_validas = [], []
 
         # 🔥 CREAR LOS DETALLES DE DONACIÓN
         for i, nombre_art in enumerate(articulos_nombres):
@@ -531,36 +603,32 @@ def registrar_donacion(request):
             except (ValueError, TypeError, IndexError):
                 continue
 
-            # Buscar o crear artículo con los nuevos campos
-            articulo_obj, _ = ArticuloDonado.objects.get_or_create(
-                nombreObjeto=nombre_art,
-                defaults={
-                    'descripcion': desc,
-                    'cantidad': 0,
-                    'categoria': categoria,
-                    'unidad_medida': unidad,
-                    'fechaVencimiento': fecha_venc if fecha_venc else None
-                }
-            )
-
-            # 🔥 CREAR DETALLE DE DONACIÓN (no Donacion directamente)
-            DetalleDonacion.objects.create(
-                donacion=donacion,
-                articulo=articulo_obj,
-                cantidad=cantidad
-            )
+            pedidos.append((nombre_art, {
+                'descripcion': desc,
+                'cantidad': 0,
+                'categoria': categoria,
+                'unidad_medida': unidad,
+                'fechaVencimiento': fecha_venc if fecha_venc else None
+            }))
+            cantidades_validas.append(cantidad)
 
-            productos_creados += 1
+        lineas = _lineas_donacion(pedidos, cantidades_validas)
+        try:
+            _crear_detalles_donacion(donacion, lineas)
+        except IntegrityError:
+            # El catálogo del proceso tenía un artículo que otro worker eliminó o
+            # fusionó: se recarga y las líneas se resuelven de nuevo por clave
+            invalidar_catalogo()
+            lineas = _lineas_donacion(pedidos, cantidades_validas)
+            _crear_detalles_donacion(donacion, lineas)
 
-            productos_para_email.append({
-                "nombre": nombre_art,
-                "cantidad": cantidad,
-                "unidad": articulo_obj.get_unidad_medida_display()
-            })
+        productos_creados = len(lineas)
+        productos_para_email = list(lineas.values())
 
         if productos_creados == 0:
             # Si no se creó ningún detalle, eliminar la donación vacía
             donacion.delete()
+            guardar_borrador(request, 'donacion', borrador)
             messages.error(request, "No se pudo registrar ningún artículo. Verifica los datos.")
             return redirect('registrar_donacion')
 
@@ -599,7 +667,7 @@ def registrar_donacion(request):
         donacion.actualizar_estado('RECIBIDO', f"Donación recibida con {productos_creados} artículo(s)")
 
         # Finalizar
-        clear_form_session(request, 'donacion')
+        eliminar_borrador(request, 'donacion')
         messages.success(
             request, 
             f"✅ Donación #{donacion.id} registrada correctamente con {productos_creados} artículo(s). "
@@ -608,60 +676,105 @@ def registrar_donacion(request):
         return redirect('listar_donaciones')
 
     # GET
-    form_data = get_form_from_session(request, 'donacion')
+    form_data = obtener_borrador(request, 'donacion')
     return render(request, 'DonacionesApp/donaciones/agregarDonaciones.html', {'form_data': form_data})
 
 
 
 
+@presupuesto_consultas(8)
 @login_required
 def ver_donacion(request, id):
-    donacion = get_object_or_404(Donacion, id=id)
+    donacion = get_object_or_404(
+        Donacion.objects.select_related('donante').prefetch_related(
+            'detalles__articulo', 'trazabilidad', 'trazabilidad_archivada'
+        ),
+        id=id,
+    )
     return render(request, 'DonacionesApp/donaciones/verDonacion.html', {'donacion': donacion})
 
 
 @login_required
 @staff_or_admin_required
 def editar_donacion(request, id):
-    donacion = get_object_or_404(Donacion, id=id)
-    detalle = donacion.detalles.first()
+    donacion = get_object_or_404(Donacion.objects.select_related('donante'), id=id)
+    detalles = list(donacion.detalles.select_related('articulo').order_by('id'))
 
-    if not detalle:
+    if not detalles:
         messages.error(request, "La donacion no tiene detalles asociados.")
         return redirect('listar_donaciones')
 
     if request.method == 'POST':
-        nombre_articulo = request.POST.get('articulo', '').strip()
-        cantidad_donada = request.POST.get('cantidad_donada')
+        nombres = request.POST.getlist('articulo[]')
+        cantidades = request.POST.getlist('cantidad[]')
+        detalles_ids = request.POST.getlist('detalle_id[]')
         nombre_donante = request.POST.get('nombre_donante', '').strip()
         apellido_donante = request.POST.get('apellido_donante', '').strip()
         tipo_donante = request.POST.get('tipo_donante', '').strip() or donacion.donante.tipoDonante
 
-        donante = donacion.donante
-        if nombre_donante:
-            donante.nombre = nombre_donante
-        if apellido_donante:
-            donante.apellido = apellido_donante
-        donante.tipoDonante = tipo_donante
-        donante.save()
+        if len(nombres) != len(cantidades):
+            messages.error(request, "Error en los datos del formulario")
+            return redirect('editar_donacion', id=donacion.id)
+
+        # Cada fila se resuelve en el catálogo: cambiar el nombre de una línea
+        # la mueve a otro artículo (o crea uno nuevo con la unidad y categoría
+        # del anterior) sin renombrar el artículo que comparten otras donaciones.
+        # Las filas vacías o en cero quitan el producto de la donación.
+        anteriores = {str(d.id): d.articulo for d in detalles}
+        pedidos, cantidades_validas = [], []
+        try:
+            for idx, (nombre, cantidad) in enumerate(zip(nombres, cantidades)):
+                nombre = nombre.strip()
+                if not nombre or not cantidad or int(cantidad) <= 0:
+                    continue
+                anterior = anteriores.get(detalles_ids[idx] if idx < len(detalles_ids) else '')
+                defaults = (
+                    {'unidad_medida': anterior.unidad_medida, 'categoria': anterior.categoria}
+                    if anterior else {}
+                )
+                pedidos.append((nombre, defaults))
+                cantidades_validas.append(int(cantidad))
+        except (TypeError, ValueError):
+            messages.error(request, "Cantidades inválidas")
+            return redirect('editar_donacion', id=donacion.id)
 
-        if nombre_articulo:
-            detalle.articulo.nombreObjeto = nombre_articulo
-            detalle.articulo.save()
+        if not pedidos:
+            messages.error(request, "La donación debe tener al menos un producto")
+            return redirect('editar_donacion', id=donacion.id)
 
         try:
-            cantidad_int = int(cantidad_donada)
-            if cantidad_int > 0:
-                detalle.cantidad = cantidad_int
-                detalle.save()
-        except (TypeError, ValueError):
-            pass
+            with transaction.atomic():
+                # Los artículos nuevos se crean juntos y dentro de la transacción:
+                # si el stock no alcanza no queda ninguno en el catálogo
+                lineas = {}
+                for articulo, cantidad in zip(resolver_articulos(pedidos), cantidades_validas):
+                    lineas[articulo.id] = lineas.get(articulo.id, 0) + cantidad
+
+                donante = donacion.donante
+                if nombre_donante:
+                    donante.nombre = nombre_donante
+                if apellido_donante:
+                    donante.apellido = apellido_donante
+                donante.tipoDonante = tipo_donante
+                donante.save()
+
+                editar_detalles_donacion(donacion, lineas)
+                donacion.save()
+        except ValidationError as e:
+            # El catálogo del proceso pudo recibir artículos que el rollback deshizo
+            descartar_catalogo_local()
+            # Bajar lo donado no puede dejar en negativo un stock ya entregado
+            for error in e.messages:
+                messages.error(request, error)
+            return redirect('editar_donacion', id=donacion.id)
 
-        donacion.save()
         messages.success(request, "Donacion editada correctamente")
         return redirect('listar_donaciones')
 
-    return render(request, 'DonacionesApp/donaciones/editarDonacion.html', {'donacion': donacion, 'detalle': detalle})
+    return render(request, 'DonacionesApp/donaciones/editarDonacion.html', {
+        'donacion': donacion,
+        'detalles': detalles,
+    })
 
 
 @login_required
@@ -677,7 +790,9 @@ def eliminar_donacion(request, id):
 
 
 
+@presupuesto_consultas(8)
 @login_required
+@solo_lectura
 def listar_entregas(request):
     estado = request.GET.get('estado', '').strip()
     beneficiario = request.GET.get('beneficiario', '').strip()
@@ -685,7 +800,7 @@ def listar_entregas(request):
     fecha_hasta = request.GET.get('hasta', '').strip()
     busqueda = request.GET.get('busqueda', '').strip()
 
-    entregas_qs = Entrega.objects.all().prefetch_related('detalles__articulo', 'beneficiario')
+    entregas_qs = Entrega.objects.select_related('beneficiario').prefetch_related('detalles__articulo')
 
     if estado:
         entregas_qs = entregas_qs.filter(estado=estado)
@@ -708,6 +823,7 @@ def listar_entregas(request):
     total_unidades = entregas_qs.aggregate(total=Sum('detalles__cantidad'))['total'] or 0
 
     paginator = Paginator(entregas_qs, 10)
+    paginator.count = total_entregas  # ya contado: evita repetir el COUNT
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
 
@@ -725,6 +841,7 @@ def listar_entregas(request):
     })
 
 
+@presupuesto_consultas(18)
 @login_required
 def registrar_entrega(request):
     if request.method == 'POST':
@@ -760,9 +877,16 @@ def registrar_entrega(request):
             messages.error(request, "Cantidades inv?lidas")
             return redirect('registrar_entrega')
 
+        try:
+            rut_cuerpo, rut_dv = descomponer(rut_beneficiario)
+        except ValidationError as e:
+            messages.error(request, e.messages[0])
+            return redirect('registrar_entrega')
+
         beneficiario, _ = Beneficiario.objects.get_or_create(
-            rut=rut_beneficiario,
+            rut_cuerpo=rut_cuerpo,
             defaults={
+                'rut': formatear(rut_cuerpo, rut_dv),
                 'nombre': nombre_beneficiario,
                 'direccion': direccion_beneficiario,
                 'telefono': telefono_beneficiario,
@@ -812,14 +936,14 @@ def registrar_entrega(request):
                 )
                 productos_creados += 1
 
-        clear_form_session(request, 'entrega')
+        eliminar_borrador(request, 'entrega')
         messages.success(
             request,
             f"Entrega #{entrega.id} registrada con {productos_creados} producto(s) para {nombre_beneficiario}"
         )
         return redirect('listar_entregas')
 
-    form_data = get_form_from_session(request, 'entrega')
+    form_data = obtener_borrador(request, 'entrega')
     articulos = ArticuloDonado.objects.filter(cantidad__gt=0).order_by('nombreObjeto')
     
     return render(request, 'DonacionesApp/entregas/agregarEntregas.html', {
@@ -828,84 +952,116 @@ def registrar_entrega(request):
     })
 
 
+@presupuesto_consultas(6)
 @login_required
 def ver_entrega(request, id):
-    entrega = get_object_or_404(Entrega, id=id)
-    return render(request, 'DonacionesApp/entregas/verEntrega.html', {'entrega': entrega})
-@login_required
-def ver_entrega(request, id):
-    entrega = get_object_or_404(Entrega, id=id)
+    entrega = get_object_or_404(
+        Entrega.objects.select_related('beneficiario').prefetch_related('detalles__articulo'),
+        id=id,
+    )
     return render(request, 'DonacionesApp/entregas/verEntrega.html', {'entrega': entrega})
 
 
-def ver_seguimiento_publico(request, uuid_seguimiento):
+# Incluye las 2 consultas del filtro de UUIDs si se construye en frío
+@presupuesto_consultas(9)
+@limitar_tasa('seguimiento')
+@descartar_uuid_desconocido()
+@cache_pagina_publica('seguimiento')
+@solo_lectura
+async def ver_seguimiento_publico(request, uuid_seguimiento):
     """
     Vista pública de seguimiento por UUID para donaciones.
-    No requiere autenticación.
+    No requiere autenticación. Es asíncrona: bajo ASGI la espera de la base de
+    datos no ocupa un worker completo. La plantilla solo usa datos precargados.
+    Los UUIDs que el filtro descarta responden 404 sin llegar aquí.
     """
-    donacion = Donacion.objects.prefetch_related('trazabilidad', 'detalles__articulo', 'donante').filter(
-        uuid_seguimiento=uuid_seguimiento
-    ).first()
+    donacion = await Donacion.objects.select_related('donante').prefetch_related(
+        'trazabilidad', 'trazabilidad_archivada', 'detalles__articulo'
+    ).filter(uuid_seguimiento=uuid_seguimiento).afirst()
 
     return render(request, 'DonacionesApp/seguimiento/seguimiento.html', {
         'donacion': donacion,
         'uuid': uuid_seguimiento,
-    })
+    }, status=200 if donacion else 404)
 
 
 @login_required
 @staff_or_admin_required
 def editar_entrega(request, id):
-    entrega = get_object_or_404(Entrega, id=id)
-    
+    entrega = get_object_or_404(Entrega.objects.select_related('beneficiario'), id=id)
+
     if request.method == 'POST':
-        with transaction.atomic():
-            entrega.beneficiario.nombre = request.POST.get('nombre_beneficiario')
-            entrega.beneficiario.direccion = request.POST.get('direccion_beneficiario')
-            entrega.beneficiario.telefono = request.POST.get('telefono_beneficiario', '')
-            entrega.beneficiario.email = request.POST.get('email_beneficiario', '')
-            entrega.beneficiario.save()
-            
-            entrega.nombreResponsable = request.POST.get('nombre_responsable')
-            entrega.save()
-
-            articulos_ids = request.POST.getlist('articulo[]')
-            cantidades = request.POST.getlist('cantidad[]')
-            detalles_ids = request.POST.getlist('detalle_donacion_id[]')
-
-            if articulos_ids and cantidades and len(articulos_ids) == len(cantidades):
-                entrega.detalles.all().delete()
-                
-                for idx, (articulo_id, cantidad) in enumerate(zip(articulos_ids, cantidades)):
-                    try:
-                        cantidad = int(cantidad)
-                        if cantidad > 0:
-                            articulo = ArticuloDonado.objects.get(id=articulo_id)
-                            detalle_donacion_id = detalles_ids[idx] if idx < len(detalles_ids) else None
-                            detalle_donacion_obj = None
-                            if detalle_donacion_id:
-                                try:
-                                    detalle_donacion_obj = DetalleDonacion.objects.get(id=detalle_donacion_id)
-                                except DetalleDonacion.DoesNotExist:
-                                    detalle_donacion_obj = None
-
-                            DetalleEntrega.objects.create(
-                                entrega=entrega,
-                                articulo=articulo,
-                                cantidad=cantidad,
-                                detalle_donacion=detalle_donacion_obj,
-                            )
-                    except (ValueError, ArticuloDonado.DoesNotExist):
-                        pass
+        articulos_ids = request.POST.getlist('articulo[]')
+        cantidades = request.POST.getlist('cantidad[]')
+        detalles_ids = request.POST.getlist('detalle_donacion_id[]')
+
+        if len(articulos_ids) != len(cantidades):
+            messages.error(request, "Error en los datos del formulario")
+            return redirect('editar_entrega', id=entrega.id)
+
+        # Una línea por artículo; las filas vacías o en cero quitan el producto
+        lineas = {}
+        try:
+            for idx, (articulo_id, cantidad) in enumerate(zip(articulos_ids, cantidades)):
+                if not articulo_id or not cantidad or int(cantidad) <= 0:
+                    continue
+                detalle_donacion_id = detalles_ids[idx] if idx < len(detalles_ids) else ''
+                linea = lineas.setdefault(int(articulo_id), {
+                    'cantidad': 0,
+                    'detalle_donacion_id': int(detalle_donacion_id) if detalle_donacion_id else None,
+                })
+                linea['cantidad'] += int(cantidad)
+        except (TypeError, ValueError):
+            messages.error(request, "Cantidades inválidas")
+            return redirect('editar_entrega', id=entrega.id)
+
+        if not lineas:
+            messages.error(request, "Debe seleccionar al menos un producto")
+            return redirect('editar_entrega', id=entrega.id)
+
+        validos = set(ArticuloDonado.objects.filter(id__in=lineas).values_list('id', flat=True))
+        enlazables = set(DetalleDonacion.objects.filter(
+            id__in=[l['detalle_donacion_id'] for l in lineas.values() if l['detalle_donacion_id']]
+        ).values_list('id', flat=True))
+        for articulo_id in list(lineas):
+            if articulo_id not in validos:
+                del lineas[articulo_id]
+            elif lineas[articulo_id]['detalle_donacion_id'] not in enlazables:
+                lineas[articulo_id]['detalle_donacion_id'] = None
+
+        try:
+            with transaction.atomic():
+                beneficiario = entrega.beneficiario
+                beneficiario.nombre = request.POST.get('nombre_beneficiario')
+                beneficiario.direccion = request.POST.get('direccion_beneficiario')
+                beneficiario.telefono = request.POST.get('telefono_beneficiario', '')
+                beneficiario.email = request.POST.get('email_beneficiario', '')
+                beneficiario.save()
+
+                entrega.nombreResponsable = request.POST.get('nombre_responsable')
+                entrega.save()
+
+                editar_detalles_entrega(entrega, lineas)
+        except ValidationError as e:
+            for error in e.messages:
+                messages.error(request, error)
+            return redirect('editar_entrega', id=entrega.id)
 
         messages.success(request, "Entrega editada correctamente")
         return redirect('listar_entregas')
 
-    articulos = ArticuloDonado.objects.filter(cantidad__gt=0).order_by('nombreObjeto')
+    detalles = entrega.detalles.select_related('articulo').order_by('id')
+    # Los artículos ya entregados se ofrecen aunque su stock haya quedado en cero
+    articulos = ArticuloDonado.objects.filter(
+        Q(cantidad__gt=0) | Q(detalleentrega__entrega=entrega)
+    ).distinct().order_by('nombreObjeto')
     return render(request, 'DonacionesApp/entregas/editarEntrega.html', {
         'entrega': entrega,
+        'detalles': detalles,
         'articulos': articulos
     })
+
+
 @login_required
 @staff_or_admin_required
 def eliminar_entrega(request, id):
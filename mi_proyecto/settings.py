@@ -41,9 +41,22 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',  # por defecto la API requiere auth
     ],
+    # orjson si está instalado, json estándar si no (ver gestion_donaciones.renderers)
+    'DEFAULT_RENDERER_CLASSES': [
+        'gestion_donaciones.renderers.JSONRapidoRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'gestion_donaciones.renderers.JSONRapidoParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
 
+# Tamaño mínimo (bytes) de una respuesta de la API para comprimirla con gzip
+API_GZIP_MINIMO = env.int('API_GZIP_MINIMO', default=1024)
+
 SPECTACULAR_SETTINGS = {
     'TITLE': 'API DonaGest - Seguimiento de Donaciones',
     'DESCRIPTION': 'API para gestionar donaciones, entregas y trazabilidad. Incluye endpoint público por UUID para seguimiento.',
@@ -56,10 +69,15 @@ SPECTACULAR_SETTINGS = {
 # ========================
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'gestion_donaciones.renderers.GzipAPIMiddleware',
+    'gestion_donaciones.estaticos.EstaticosMiddleware',
+    'gestion_donaciones.limites.ConcurrenciaMiddleware',
+    'gestion_donaciones.sql_metricas.SQLMetricasMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'gestion_donaciones.db_router.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -72,13 +90,14 @@ ROOT_URLCONF = 'mi_proyecto.urls'
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [os.path.join(BASE_DIR, 'gestion_donaciones','templates')],
+        'DIRS': [os.path.join(BASE_DIR, 'gestion_donaciones', 'Templates')],
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'gestion_donaciones.context_processors.roles',
             ],
         },
     },
@@ -89,17 +108,64 @@ WSGI_APPLICATION = 'mi_proyecto.wsgi.application'
 # ========================
 # Base de datos
 # ========================
+# Pool de conexiones persistentes por worker (gestion_donaciones/db_pool.py)
+DB_POOL = env.bool('DB_POOL', default=True)
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.mysql',
+        'ENGINE': 'gestion_donaciones.db_backends.mysql_pool' if DB_POOL else 'django.db.backends.mysql',
         'NAME': env('DB_NAME', default='railway'),
         'USER': env('DB_USER', default='root'),
         'PASSWORD': env('DB_PASSWORD', default='QraOOjZWbIUevBDiNdEUBbaoaiFmwmFD'),
         'HOST': env('DB_HOST', default='hopper.proxy.rlwy.net'),
         'PORT': env('DB_PORT', default='19053'),
+        # Con pool, Django devuelve la conexión al final de cada petición y el pool
+        # controla su antigüedad; sin pool se usan conexiones persistentes de Django.
+        'CONN_MAX_AGE': 0 if DB_POOL else env.int('DB_CONN_MAX_AGE', default=60),
+        'CONN_HEALTH_CHECKS': True,
+        'POOL': {
+            'MAX_SIZE': env.int('DB_POOL_SIZE', default=5),
+            'MAX_AGE': env.int('DB_POOL_MAX_AGE', default=300),
+            'TIMEOUT': env.int('DB_POOL_TIMEOUT', default=10),
+        },
     }
 }
 
+# Base SQLite local para desarrollo y benchmarks (DB_SQLITE=true)
+if env.bool('DB_SQLITE', default=False):
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': env('DB_SQLITE_PATH', default=os.path.join(BASE_DIR, 'db.sqlite3')),
+    }
+
+# Réplicas de solo lectura, como URLs separadas por coma. Ej. para probar en local:
+# DB_REPLICA_URLS=sqlite:////ruta/replica.sqlite3
+DATABASE_REPLICAS = []
+for _i, _url in enumerate(env.list('DB_REPLICA_URLS', default=[])):
+    _alias = f'replica_{_i}'
+    DATABASES[_alias] = env.db_url_config(_url)
+    DATABASES[_alias]['TEST'] = {'MIRROR': 'default'}
+    DATABASE_REPLICAS.append(_alias)
+
+DATABASE_ROUTERS = ['gestion_donaciones.db_router.ReplicaRouter']
+
+# Segundos que un cliente lee del primario después de escribir (retraso de replicación)
+REPLICA_PIN_SEGUNDOS = env.int('REPLICA_PIN_SEGUNDOS', default=5)
+
+# ========================
+# Caché compartida
+# ========================
+# Roles, versiones del catálogo y de los umbrales, borradores, páginas públicas
+# y límites de tasa deben verse igual en todos los workers. En producción
+# CACHE_URL apunta a Redis (redis://host:6379/0) o a una tabla de la base
+# (dbcache://cache_compartida, creada con createcachetable). Sin CACHE_URL cada
+# proceso tiene su propia LocMem: sirve para desarrollo y tests, y
+# `check --deploy` lo advierte (W001); con CACHE_COMPARTIDA_OBLIGATORIA lo
+# rechaza (E001) y el release del Procfile se detiene.
+CACHES = {'default': env.cache_url('CACHE_URL', default='locmemcache://')}
+CACHE_COMPARTIDA = not CACHES['default']['BACKEND'].endswith(('.LocMemCache', '.DummyCache'))
+CACHE_COMPARTIDA_OBLIGATORIA = env.bool('CACHE_COMPARTIDA_OBLIGATORIA', default=False)
+
 # ========================
 # Validación de contraseñas
 # ========================
@@ -137,6 +203,11 @@ STATICFILES_DIRS = [
 ]
 # Ruta donde se recopilarán los estáticos en producción
 STATIC_ROOT = os.path.join(BASE_DIR, "staticfiles")
+# collectstatic genera nombres con hash y variantes .gz/.br (ver gestion_donaciones.estaticos)
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'gestion_donaciones.estaticos.EstaticosComprimidos'},
+}
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -152,3 +223,120 @@ LOGOUT_REDIRECT_URL = 'login'
 BREVO_API_KEY = env('BREVO_API_KEY')
 BREVO_SENDER_EMAIL = env('BREVO_SENDER_EMAIL')
 BREVO_SENDER_NAME = env('BREVO_SENDER_NAME', default='DonaGest')
+
+# ========================
+# Borradores de formularios
+# ========================
+# 'cache' o 'db'; si la caché falla se usa la base de datos. Un borrador guardado
+# en la LocMem de un worker no lo ve el worker que atiende el GET siguiente: sin
+# caché compartida el valor por defecto es 'db'
+BORRADORES_BACKEND = env('BORRADORES_BACKEND', default='cache' if CACHE_COMPARTIDA else 'db')
+BORRADORES_TTL = env.int('BORRADORES_TTL', default=60 * 60 * 2)
+
+# ========================
+# Instrumentación SQL
+# ========================
+SQL_METRICAS_ACTIVAS = env.bool('SQL_METRICAS_ACTIVAS', default=True)
+# Repeticiones de una misma forma de SQL en una petición para reportar un N+1
+SQL_N1_UMBRAL = env.int('SQL_N1_UMBRAL', default=5)
+# Advertir en el log cuando una vista excede su presupuesto de consultas
+PRESUPUESTOS_ADVERTIR = env.bool('PRESUPUESTOS_ADVERTIR', default=True)
+
+# ========================
+# Logging
+# ========================
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'gestion_donaciones': {
+            'handlers': ['console'],
+            'level': env('LOG_LEVEL', default='INFO'),
+        },
+    },
+}
+
+# ========================
+# Trazabilidad
+# ========================
+# Días que una donación cerrada mantiene su trazabilidad en la tabla principal
+TRAZABILIDAD_DIAS_ARCHIVO = env.int('TRAZABILIDAD_DIAS_ARCHIVO', default=180)
+
+# ========================
+# Caché de páginas públicas
+# ========================
+# Las purgas (p. ej. al cambiar una donación) solo llegan a todos los workers
+# con caché compartida; con LocMem cada worker serviría su copia vieja hasta el
+# TTL, por eso sin caché compartida viene desactivada
+CACHE_PAGINAS_ACTIVA = env.bool('CACHE_PAGINAS_ACTIVA', default=CACHE_COMPARTIDA)
+# Segundos por página; el seguimiento se purga además al cambiar la donación
+CACHE_PAGINAS_TTL = {
+    'landing': env.int('CACHE_PAGINA_LANDING_TTL', default=600),
+    'seguimiento': env.int('CACHE_PAGINA_SEGUIMIENTO_TTL', default=120),
+}
+
+# ========================
+# Límites de tasa y concurrencia
+# ========================
+LIMITES_TASA_ACTIVOS = env.bool('LIMITES_TASA_ACTIVOS', default=True)
+# 'memoria' (por proceso: cada worker tiene sus cubos y el límite efectivo se
+# multiplica por la cantidad de workers) o 'cache' (compartido vía CACHES); con
+# caché compartida el valor por defecto es 'cache'
+LIMITES_TASA_BACKEND = env('LIMITES_TASA_BACKEND', default='cache' if CACHE_COMPARTIDA else 'memoria')
+# Cubo de tokens por cliente: ráfaga máxima y recarga por minuto
+LIMITES_TASA = {
+    'seguimiento': {'capacidad': 30, 'por_minuto': env.int('LIMITE_SEGUIMIENTO_POR_MINUTO', default=60)},
+    'login': {'capacidad': 5, 'por_minuto': env.int('LIMITE_LOGIN_POR_MINUTO', default=5)},
+}
+# Proxies delante de la app (para leer la IP del cliente desde X-Forwarded-For).
+# En Railway todas las peticiones llegan por su proxy (REMOTE_ADDR es el del
+# proxy): con 0 todos los visitantes compartirían un cubo. Use 0 solo si la app
+# recibe conexiones directas, porque el último X-Forwarded-For lo pone el cliente
+LIMITES_NUM_PROXIES = env.int('LIMITES_NUM_PROXIES', default=1)
+# Peticiones simultáneas por proceso antes de responder 503 (0 = sin límite)
+CONCURRENCIA_MAXIMA = env.int('CONCURRENCIA_MAXIMA', default=0)
+CONCURRENCIA_RETRY_AFTER = env.int('CONCURRENCIA_RETRY_AFTER', default=1)
+
+# ========================
+# Filtro de UUIDs de seguimiento
+# ========================
+# Descarta UUIDs inexistentes con 404 sin consultar la base de datos
+FILTRO_UUID_ACTIVO = env.bool('FILTRO_UUID_ACTIVO', default=True)
+# Tasa de falsos positivos del filtro de Bloom (UUIDs desconocidos que sí consultan)
+FILTRO_UUID_TASA_ERROR = env.float('FILTRO_UUID_TASA_ERROR', default=0.001)
+# Segundos mínimos entre recargas de UUIDs insertados por otros procesos; entre
+# recargas, un UUID desconocido que otro worker pudo insertar se busca en la base
+FILTRO_UUID_REFRESCO = env.float('FILTRO_UUID_REFRESCO', default=2)
+# Ids ya vistos que cada recarga vuelve a leer: cubren las filas de
+# transacciones que confirmaron después de otras con id mayor
+FILTRO_UUID_VENTANA = env.int('FILTRO_UUID_VENTANA', default=1000)
+
+# ========================
+# Catálogo de artículos en memoria
+# ========================
+# Segundos máximos que un proceso usa su copia del catálogo sin recargarla
+CATALOGO_TTL = env.int('CATALOGO_TTL', default=300)
+
+# ========================
+# Alertas de stock bajo
+# ========================
+STOCK_ALERTAS_ACTIVAS = env.bool('STOCK_ALERTAS_ACTIVAS', default=True)
+# Mínimo de los artículos sin umbral propio ni de su categoría (ver UmbralStock)
+STOCK_ALERTA_MINIMO = env.int('STOCK_ALERTA_MINIMO', default=10)
+# Segundos máximos que un proceso usa su copia de los umbrales sin recargarla
+STOCK_UMBRALES_TTL = env.int('STOCK_UMBRALES_TTL', default=300)
+# Correos que reciben las alertas; vacío = superusuarios y miembros de AdminApp
+STOCK_ALERTAS_DESTINATARIOS = env.list('STOCK_ALERTAS_DESTINATARIOS', default=[])
+
+# ========================
+# Pronóstico de demanda
+# ========================
+# Semanas completas de entregas usadas, ventana de la media móvil y factor del suavizado exponencial
+PRONOSTICO_SEMANAS = env.int('PRONOSTICO_SEMANAS', default=12)
+PRONOSTICO_VENTANA = env.int('PRONOSTICO_VENTANA', default=4)
+PRONOSTICO_ALFA = env.float('PRONOSTICO_ALFA', default=0.3)
+# Segundos que la demanda calculada queda en la caché compartida
+PRONOSTICO_TTL = env.int('PRONOSTICO_TTL', default=3600)
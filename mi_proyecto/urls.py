@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.urls import path, include
 from gestion_donaciones import views
 from gestion_donaciones import api_views
+from gestion_donaciones.limites import LoginThrottle
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
@@ -65,6 +66,10 @@ urlpatterns = [
     # Stock
     path('stock/', views.ver_stock, name='ver_stock'),
 
+    # Métricas internas
+    path('metricas/pool/', views.metricas_pool, name='metricas_pool'),
+    path('metricas/sql/', views.metricas_sql, name='metricas_sql'),
+
     # === Documentación API ===
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
     path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
@@ -73,8 +78,17 @@ urlpatterns = [
     # API REST pública de seguimiento por UUID (JSON)
     path('api/seguimiento/<uuid:uuid_seguimiento>/', api_views.api_seguimiento_publico, name='api_seguimiento_publico'),
 
+    # API de solo lectura asíncrona (ASGI)
+    path('api/lectura/donaciones/', api_views.api_lectura_donaciones, name='api_lectura_donaciones'),
+    path('api/lectura/entregas/', api_views.api_lectura_entregas, name='api_lectura_entregas'),
+    path('api/lectura/articulos/', api_views.api_lectura_articulos, name='api_lectura_articulos'),
+
+    # Stock histórico (fotos diarias + movimientos)
+    path('api/stock/historico/', api_views.api_stock_historico, name='api_stock_historico'),
+    path('api/stock/pronostico/', api_views.api_stock_pronostico, name='api_stock_pronostico'),
+
     # Auth JWT (SimpleJWT)
-    path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('api/token/', TokenObtainPairView.as_view(throttle_classes=[LoginThrottle]), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
 
     # Rutas de router DRF (API interna)
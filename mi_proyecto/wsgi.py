@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mi_proyecto.settings')
 
 application = get_wsgi_application()
+
+# Filtro de UUIDs de seguimiento: se construye al iniciar el proceso
+from gestion_donaciones.filtro_uuid import precargar  # noqa: E402
+
+precargar()